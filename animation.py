@@ -0,0 +1,232 @@
+"""Анимации спрайтов: кадры в общем атласе текстур, кадр выбирает шейдер
+
+Кадры всех клипов (собираются build_assets.py) лежат в атласе окна, а
+таблица кадров - маленькая текстура, где для каждого кадра записан его
+номер в атласе. У каждого анимированного спрайта в буфере GPU хранятся
+только положение, размер, первый кадр клипа, число кадров, частота и сдвиг
+фазы. Номер кадра вершинный шейдер считает из времени, поэтому шаг
+анимации - это одна запись времени в uniform, и все спрайты набора
+рисуются одним вызовом, сколько бы их ни было. Из Python меняются только
+записи спрайтов, которые сами сдвинулись или сменили клип (игрок).
+"""
+import arcade
+import json
+from array import array
+from collections import defaultdict
+from PIL import Image
+
+ANIMATION_ATLAS = "images/animations.png"
+ANIMATION_ATLAS_INFO = "images/animations.json"
+
+# Запись спрайта в буфере: положение, размер, клип (первый кадр, кадров, кадров в секунду, сдвиг в кадрах)
+INSTANCE_FORMAT = "2f 2f 4f"
+INSTANCE_FLOATS = 8
+INSTANCE_ATTRIBUTES = ["in_pos", "in_size", "in_clip"]
+
+ANIMATED_VS = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+uniform sampler2D uv_texture;
+uniform sampler2D frame_table;
+uniform float time;
+
+in vec2 in_vert;
+in vec2 in_pos;
+in vec2 in_size;
+in vec4 in_clip;
+
+out vec2 v_uv;
+
+void main() {
+    // Кадр клипа по времени и его номер в атласе
+    int frame = int(in_clip.x) + int(mod(floor(time * in_clip.z + in_clip.w), in_clip.y));
+    int texture_id = int(texelFetch(frame_table, ivec2(frame, 0), 0).r) * 2;
+
+    // Текстурные координаты кадра в атласе (как в шейдерах спрайтов arcade)
+    ivec2 uv_size = textureSize(uv_texture, 0);
+    ivec2 uv_pos = ivec2(texture_id % uv_size.x, texture_id / uv_size.x);
+    vec4 upper = texelFetch(uv_texture, uv_pos, 0);
+    vec4 lower = texelFetch(uv_texture, uv_pos + ivec2(1, 0), 0);
+    v_uv = mix(mix(lower.xy, lower.zw, in_vert.x), mix(upper.xy, upper.zw, in_vert.x), in_vert.y);
+
+    gl_Position = window.projection * window.view * vec4(in_pos + (in_vert - 0.5) * in_size, 0.0, 1.0);
+}
+"""
+
+ANIMATED_FS = """
+#version 330
+
+uniform sampler2D sprite_texture;
+
+in vec2 v_uv;
+out vec4 out_color;
+
+void main() {
+    vec4 color = texture(sprite_texture, v_uv);
+    if (color.a == 0.0) {
+        discard;
+    }
+    out_color = color;
+}
+"""
+
+def read_animation_atlas(path=ANIMATION_ATLAS, info_path=ANIMATION_ATLAS_INFO):
+    """Чтение атласа анимаций с диска: изображение и описание клипов; None, если он не собран"""
+    try:
+        with open(info_path, encoding="utf-8") as file:
+            info = json.load(file)
+        image = Image.open(path).convert("RGBA")
+    except FileNotFoundError:
+        return None
+    return image, info
+
+class AnimationClip:
+    """Клип: count кадров подряд в таблице кадров, начиная с first
+
+    scale - масштаб, в котором нарисованы кадры, width и height - их размер.
+    """
+    def __init__(self, first, count, fps, scale, width, height):
+        self.first = first
+        self.count = count
+        self.fps = fps
+        self.scale = scale
+        self.width = width
+        self.height = height
+
+class Animations:
+    """Все клипы: (имя, клип, вправо) -> клипы в разных масштабах, и таблица кадров"""
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.clips = defaultdict(list)
+        self.textures = []  # кадры в порядке таблицы
+        self.frame_table = None
+        self.program = None
+        self.quad = None
+
+    @property
+    def ready(self):
+        return self.frame_table is not None
+
+    def load(self, atlas):
+        """Нарезка кадров и выгрузка их в атлас окна (в главном потоке); atlas - из read_animation_atlas"""
+        if atlas is None:
+            print(f"Атлас анимаций {ANIMATION_ATLAS} не собран (python build_assets.py), анимаций не будет")
+            return
+        image, info = atlas
+        for entry in info["clips"]:
+            frames = [
+                arcade.Texture(image.crop((x, y, x + width, y + height)), hit_box_algorithm=arcade.hitbox.algo_bounding_box)
+                for x, y, width, height in entry["rects"]
+            ]
+            # Кадры влево - отражения кадров вправо
+            for facing_right, textures in ((True, frames), (False, [texture.flip_left_right() for texture in frames])):
+                width, height = textures[0].size
+                self.clips[(entry["name"], entry["clip"], facing_right)].append(AnimationClip(
+                    len(self.textures), len(textures), entry["fps"], entry["scale"], width, height
+                ))
+                self.textures.extend(textures)
+
+        ctx = self.ctx
+        atlas = ctx.default_atlas
+        for texture in self.textures:
+            atlas.add(texture)
+        table = array("f", (atlas.get_texture_id(texture) for texture in self.textures))
+        self.frame_table = ctx.texture((len(table), 1), components=1, dtype="f4", data=table)
+        self.frame_table.filter = ctx.NEAREST, ctx.NEAREST
+
+        self.program = ctx.program(vertex_shader=ANIMATED_VS, fragment_shader=ANIMATED_FS)
+        self.program["sprite_texture"] = 0
+        self.program["uv_texture"] = 1
+        self.program["frame_table"] = 2
+        self.quad = ctx.buffer(data=array("f", [0, 0, 1, 0, 0, 1, 1, 1]))
+
+    def find(self, name, clip, scale, facing_right=True):
+        """Клип, нарисованный в масштабе, ближайшем к нужному; None, если такого нет"""
+        clips = self.clips.get((name, clip, facing_right))
+        if not clips:
+            return None
+        return min(clips, key=lambda candidate: abs(candidate.scale - scale))
+
+class AnimatedSprites:
+    """Набор анимированных спрайтов, которые рисуются одним вызовом"""
+    def __init__(self, animations, capacity=16):
+        self.animations = animations
+        self.data = array("f")
+        self.capacity = capacity
+        self.buffer = None  # создается при первой отрисовке
+        self.geometry = None
+        self.dirty = None  # (первая, последняя) запись, которую нужно выгрузить
+
+    def __len__(self):
+        return len(self.data) // INSTANCE_FLOATS
+
+    def reserve(self, capacity):
+        ctx = self.animations.ctx
+        self.capacity = capacity
+        self.buffer = ctx.buffer(reserve=capacity * INSTANCE_FLOATS * 4)
+        self.geometry = ctx.geometry(
+            [
+                arcade.gl.BufferDescription(self.animations.quad, "2f", ["in_vert"]),
+                arcade.gl.BufferDescription(self.buffer, INSTANCE_FORMAT, INSTANCE_ATTRIBUTES, instanced=True)
+            ],
+            mode=ctx.TRIANGLE_STRIP
+        )
+        self.dirty = (0, len(self) - 1) if len(self) else None
+
+    def clear(self):
+        self.data = array("f")
+        self.dirty = None
+
+    def instance(self, x, y, clip, scale, phase):
+        factor = scale / clip.scale
+        return (x, y, clip.width * factor, clip.height * factor, clip.first, clip.count, clip.fps, phase)
+
+    def add(self, x, y, clip, scale=None, phase=0):
+        """Новый спрайт; scale - масштаб спрайта (по умолчанию масштаб кадров), phase - сдвиг в кадрах"""
+        index = len(self)
+        self.data.extend(self.instance(x, y, clip, clip.scale if scale is None else scale, phase))
+        self.mark(index)
+        return index
+
+    def set(self, index, x, y, clip, scale=None, phase=0):
+        """Перезапись спрайта (он сдвинулся или сменил клип)"""
+        start = index * INSTANCE_FLOATS
+        self.data[start:start + INSTANCE_FLOATS] = array("f", self.instance(x, y, clip, clip.scale if scale is None else scale, phase))
+        self.mark(index)
+
+    def mark(self, index):
+        first, last = self.dirty or (index, index)
+        self.dirty = (min(first, index), max(last, index))
+
+    def draw(self, time):
+        """Отрисовка всех спрайтов набора в текущую камеру; time - секунды для выбора кадров"""
+        count = len(self)
+        if not count:
+            return
+        if self.geometry is None:
+            self.reserve(max(count, self.capacity))
+        elif count > self.capacity:
+            self.reserve(max(count, self.capacity * 2))
+        if self.dirty:
+            first, last = self.dirty
+            self.buffer.write(
+                self.data[first * INSTANCE_FLOATS:(last + 1) * INSTANCE_FLOATS],
+                offset=first * INSTANCE_FLOATS * 4
+            )
+            self.dirty = None
+
+        animations = self.animations
+        ctx = animations.ctx
+        atlas = ctx.default_atlas
+        atlas.texture.use(0)
+        atlas.use_uv_texture(1)
+        animations.frame_table.use(2)
+        animations.program["time"] = time
+        ctx.enable(ctx.BLEND)
+        ctx.blend_func = ctx.BLEND_DEFAULT
+        self.geometry.render(animations.program, instances=count)
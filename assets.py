@@ -0,0 +1,110 @@
+import arcade
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+ASSET_WORKERS = 4
+ASSET_UPLOAD_BUDGET = 0.004  # секунды на выгрузку текстур в GPU за один кадр
+
+# Приоритеты загрузки: меньше - раньше
+PRIORITY_MENU = 0
+PRIORITY_LEVEL_1 = 1
+PRIORITY_REST = 2
+
+def timed_decode(decoder, path):
+    """Декодирование с замером его времени (для отчета о запуске)"""
+    start = time.perf_counter()
+    asset = decoder(path)
+    return asset, time.perf_counter() - start
+
+def decode_image(path):
+    """Декодирование изображения (выполняется в фоновом потоке)"""
+    with Image.open(path) as image:
+        return image.convert("RGBA")
+
+class AssetLoader:
+    """Фоновая загрузка ресурсов
+
+    Файлы декодируются в пуле потоков в порядке приоритета, а текстуры
+    создаются и выгружаются в GPU в главном потоке в update() по мере готовности.
+    """
+    def __init__(self, ctx=None, workers=ASSET_WORKERS):
+        self.ctx = ctx
+        self.workers = workers
+        self.executor = None
+        self.requests = []
+        self.pending = []
+        self.remaining = {}
+        self.total = 0
+        self.loaded = 0
+        self.timings = []  # (путь, приоритет, секунды декодирования, perf_counter() готовности)
+
+    def add(self, path, on_ready, decoder=decode_image, priority=PRIORITY_REST):
+        """Добавить ресурс в очередь; on_ready вызывается в главном потоке"""
+        self.requests.append((priority, len(self.requests), path, decoder, on_ready))
+
+    def start(self):
+        """Запуск декодирования: сначала ресурсы с меньшим приоритетом"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="assets")
+
+        for priority, _, path, decoder, on_ready in sorted(self.requests, key=lambda request: request[:2]):
+            future = self.executor.submit(timed_decode, decoder, path)
+            self.pending.append((priority, path, future, on_ready))
+            self.remaining[priority] = self.remaining.get(priority, 0) + 1
+        self.total += len(self.requests)
+        self.requests = []
+
+    def update(self):
+        """Обработка готовых ресурсов (вызывается из главного потока каждый кадр)"""
+        start = time.perf_counter()
+        still_pending = []
+
+        for item in self.pending:
+            priority, path, future, on_ready = item
+            if not future.done() or time.perf_counter() - start > ASSET_UPLOAD_BUDGET:
+                still_pending.append(item)
+                continue
+
+            try:
+                asset, decode_time = future.result()
+                if isinstance(asset, Image.Image):
+                    asset = arcade.Texture(asset)
+                    if self.ctx:
+                        self.ctx.default_atlas.add(asset)
+                on_ready(asset)
+                self.timings.append((path, priority, decode_time, time.perf_counter()))
+            except FileNotFoundError as e:
+                # Необязательные файлы могут отсутствовать, но не должны быть битыми
+                if path and os.path.exists(path):
+                    print(f"Ошибка загрузки {path}: {e}")
+            except Exception as e:
+                print(f"Ошибка загрузки {path}: {e}")
+
+            self.loaded += 1
+            self.remaining[priority] -= 1
+
+        self.pending = still_pending
+        if not self.pending and self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def is_ready(self, priority):
+        """Загружены ли все ресурсы с приоритетом не ниже заданного"""
+        return all(count == 0 for p, count in self.remaining.items() if p <= priority)
+
+    @property
+    def is_done(self):
+        return not self.pending and not self.requests
+
+    @property
+    def progress(self):
+        return self.loaded / self.total if self.total else 1.0
+
+    def shutdown(self):
+        """Остановка загрузки (при закрытии окна)"""
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.pending = []
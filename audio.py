@@ -0,0 +1,122 @@
+"""Звук: пулы голосов для эффектов и потоковая музыка
+
+Короткие эффекты декодируются заранее целиком, и у каждого есть свой
+постоянный набор плееров (голосов), в которых этот эффект стоит всегда.
+Новое проигрывание берет следующий голос по кругу и запускает его с начала;
+если он еще звучит, это самый давний голос эффекта. Поэтому событие ничего
+не создает и не декодирует, сколько бы раз подряд ни нажимали прыжок.
+Музыка не держится в памяти целиком, а читается с диска потоком.
+"""
+import pyglet
+
+MAX_VOICES = 8  # всего одновременно звучащих эффектов
+
+def decode_effect(path):
+    """Декодирование короткого эффекта целиком в память (выполняется в фоновом потоке)"""
+    return pyglet.media.load(path, streaming=False)
+
+def decode_music(path):
+    """Открытие длинной дорожки для потокового чтения"""
+    return pyglet.media.load(path, streaming=True)
+
+class Voice(pyglet.media.Player):
+    """Плеер, который не отпускает источник в конце, а останавливается в начале"""
+    def on_eos(self):
+        self.pause()
+        self.seek(0)
+
+class SoundEffect:
+    """Эффект с фиксированным числом голосов; voices - предел одновременных проигрываний"""
+    def __init__(self, source, voices, volume, priority):
+        self.source = source
+        self.volume = volume
+        self.priority = priority
+        self.players = []
+        for _ in range(voices):
+            player = Voice()
+            player.queue(source)
+            self.players.append(player)
+        self.next = 0  # голос, запущенный раньше остальных
+
+    @property
+    def active(self):
+        return sum(player.playing for player in self.players)
+
+    def play(self, volume):
+        player = self.players[self.next]
+        self.next = (self.next + 1) % len(self.players)
+        player.volume = self.volume * volume
+        player.seek(0)
+        player.play()
+
+    def stop_oldest(self):
+        """Остановка самого давнего звучащего голоса (его забирает эффект важнее)"""
+        for i in range(len(self.players)):
+            player = self.players[(self.next + i) % len(self.players)]
+            if player.playing:
+                player.pause()
+                return
+
+    def delete(self):
+        for player in self.players:
+            player.delete()
+        self.players = []
+
+class Mixer:
+    """Эффекты по именам, общий предел голосов и музыка
+
+    Когда звучит max_voices эффектов, новый эффект забирает голос у звучащего
+    эффекта с меньшим или равным приоритетом, иначе не играет.
+    """
+    def __init__(self, max_voices=MAX_VOICES, effects_volume=1.0, music_volume=1.0):
+        self.max_voices = max_voices
+        self.effects_volume = effects_volume
+        self.music_volume = music_volume
+        self.enabled = True
+        self.effects = {}
+        self.music_player = None
+
+    def add_effect(self, name, source, voices=2, volume=1.0, priority=0):
+        if name in self.effects:
+            self.effects[name].delete()
+        self.effects[name] = SoundEffect(source, voices, volume, priority)
+
+    def play(self, name):
+        """Проигрывание эффекта (если он загружен)"""
+        effect = self.effects.get(name)
+        if effect is None or not self.enabled:
+            return
+
+        # Свой занятый голос эффект просто перезапускает, новый голос - в пределах общего лимита
+        if not effect.players[effect.next].playing:
+            playing = [other for other in self.effects.values() if other.active]
+            if sum(other.active for other in playing) >= self.max_voices:
+                victim = min(playing, key=lambda other: other.priority)
+                if victim.priority > effect.priority:
+                    return
+                victim.stop_oldest()
+        effect.play(self.effects_volume)
+
+    def set_music(self, source):
+        """Дорожка, которая будет играть по кругу; потоковый источник ставится в плеер один раз"""
+        self.stop_music()
+        self.music_player = pyglet.media.Player()
+        self.music_player.queue(source)
+        self.music_player.loop = True
+        self.music_player.volume = self.music_volume
+
+    def play_music(self):
+        if self.music_player and self.enabled and not self.music_player.playing:
+            self.music_player.play()
+
+    def stop_music(self):
+        if self.music_player:
+            self.music_player.delete()
+            self.music_player = None
+
+    def shutdown(self):
+        """Освобождение плееров (при закрытии окна)"""
+        self.stop_music()
+        for effect in self.effects.values():
+            effect.delete()
+        self.effects.clear()
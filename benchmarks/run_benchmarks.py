@@ -0,0 +1,280 @@
+"""Замеры производительности: загрузка уровней, шаги симуляции, отрисовка (и частиц)
+
+Отрисовка идет во внеэкранном контексте OpenGL (ARCADE_HEADLESS), подойдет
+и программный llvmpipe. Результаты пишутся в JSON; с --baseline они
+сравниваются с сохраненными, и код выхода 1 означает регрессию.
+
+Запуск: python benchmarks/run_benchmarks.py [--out results.json] [--baseline baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import wait
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+LAUNCH_DIR = os.getcwd()
+
+LOAD_REPEATS = 5
+TICKS = 3000  # шагов симуляции на уровень
+DRAW_FRAMES = 300
+PARTICLE_TICKS = 9  # шагов с появления частиц до замера их отрисовки
+WARM_FRAMES = 60  # кадров игры на предыдущем уровне перед переходом через портал
+SCALE_FACTORS = (10, 100)
+SCALE_MAP = "maps/map1.json"
+REGRESSION_THRESHOLD = 10  # процентов
+
+class Results:
+    """Метрики: имя -> значение, единица и что лучше (меньше/больше)"""
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better):
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "better": better}
+        print(f"{name:<36} {value:12.3f} {unit}")
+
+    def time_ms(self, name, seconds):
+        self.add(name, seconds * 1000, "ms", "lower")
+
+    def rate(self, name, count, seconds):
+        self.add(name, count / seconds if seconds else 0, "1/s", "higher")
+
+def median_time(action, repeats=LOAD_REPEATS, prepare=None):
+    """Медиана времени выполнения action (prepare вызывается перед каждым замером и не считается)"""
+    samples = []
+    for _ in range(repeats):
+        if prepare:
+            prepare()
+        start = time.perf_counter()
+        action()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def scripted_input(tick):
+    """Ввод, похожий на игрока: бег вправо с прыжками и короткими отступлениями влево"""
+    from simulation import INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP
+    phase = tick % 200
+    input_mask = INPUT_LEFT if 150 <= phase < 170 else INPUT_RIGHT
+    if tick % 37 == 0:
+        input_mask |= INPUT_JUMP
+    return input_mask
+
+def settle(sim):
+    """Ожидание фонового разбора следующего уровня, чтобы он не мешал замерам"""
+    wait(list(sim.level_cache.pending.values()))
+
+def run_ticks(sim, level_num, ticks=TICKS):
+    """Шаги симуляции с заданным вводом; после смерти или перехода уровень перезапускается"""
+    sim.load_level(level_num, reset_coins=True)
+    settle(sim)
+    elapsed = 0
+    for tick in range(ticks):
+        input_mask = scripted_input(tick)
+        start = time.perf_counter()
+        sim.step(input_mask)
+        elapsed += time.perf_counter() - start
+        sim.pop_events()
+        if sim.game_state != "GAME" or sim.current_level != level_num:
+            sim.death_count = 0
+            sim.load_level(level_num, reset_coins=True)
+    return elapsed
+
+def draw_frame(game):
+    """Кадр, как его рисует окно: сначала текущая сцена, затем само окно"""
+    game.current_view.on_draw()
+    game.on_draw()
+
+def draw_frames(game, frames=DRAW_FRAMES):
+    """Отрисовка кадров с ожиданием GPU, чтобы мерить весь кадр"""
+    draw_frame(game)
+    game.ctx.finish()
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw_frame(game)
+        game.ctx.finish()
+    return time.perf_counter() - start
+
+def set_level_loader(sim, paths):
+    """Уровни симуляции из заданных файлов карт (номер -> путь)"""
+    from simulation import CHUNK_SIZE, LevelCache, LevelData
+    from tilemap import open_tilemap
+    sim.level_cache = LevelCache(lambda level_num: LevelData(level_num, open_tilemap(paths[level_num], CHUNK_SIZE)))
+
+def bench_levels(results, game):
+    """Загрузка, шаги и отрисовка обычных уровней"""
+    from simulation import CHUNK_SIZE, LevelData, find_levels
+    from tilemap import StreamedTileMap
+
+    sim = game.sim
+    levels = find_levels()
+    for level_num in levels:
+        name = f"map{level_num}"
+
+        # Холодная загрузка: уровня нет в кэше (карта из .lvl, если он собран)
+        results.time_ms(f"load.{name}.cold", median_time(
+            lambda: sim.load_level(level_num, reset_coins=True), prepare=sim.level_cache.clear
+        ))
+        results.time_ms(f"load.{name}.warm", median_time(
+            lambda: sim.load_level(level_num, reset_coins=True), prepare=lambda: settle(sim)
+        ))
+        if level_num - 1 in levels:
+            # Переход через портал: уровень разобран в фоне и прогрет, пока играли предыдущий
+            def play_previous():
+                sim.level_cache.clear()
+                sim.load_level(level_num - 1, reset_coins=True)
+                settle(sim)
+                for _ in range(WARM_FRAMES):
+                    game.warm_levels()
+            results.time_ms(f"load.{name}.prefetched", median_time(
+                lambda: sim.load_level(level_num), prepare=play_previous
+            ))
+        results.time_ms(f"load.{name}.json", median_time(
+            lambda: LevelData(level_num, StreamedTileMap(f"maps/{name}.json", CHUNK_SIZE)).stream(0, 0)
+        ))
+
+        results.rate(f"tick.{name}", TICKS, run_ticks(sim, level_num))
+
+        sim.load_level(level_num, reset_coins=True)
+        game.process_events()
+        results.rate(f"draw.{name}", DRAW_FRAMES, draw_frames(game))
+
+def bench_particles(results, game):
+    """Отрисовка уровня, когда буферы всех видов частиц заполнены целиком"""
+    import random
+    from particles import PARTICLE_CAPACITY
+    from simulation import SCREEN_WIDTH, SCREEN_HEIGHT, TICK_TIME
+
+    sim = game.sim
+    sim.load_level(1, reset_coins=True)
+    game.process_events()
+    draw_frame(game)
+    particles = game.scenes.get("GAME").particles
+    # Вспышки по всему экрану вокруг игрока; замер - когда частицы уже разлетелись
+    random.seed(0)
+    player = sim.player_list[0]
+    for name, emitter in particles.emitters.items():
+        for _ in range(PARTICLE_CAPACITY // emitter.effect["count"] + 1):
+            x = player.center_x + random.uniform(-0.5, 0.5) * SCREEN_WIDTH
+            y = player.center_y + random.uniform(-0.5, 0.5) * SCREEN_HEIGHT
+            particles.emit(name, x, y, sim.tick * TICK_TIME)
+    sim.tick += PARTICLE_TICKS
+    results.rate("draw.particles", DRAW_FRAMES, draw_frames(game))
+    particles.clear(sim.tick * TICK_TIME)
+
+def bench_scale(results, game, factors):
+    """Те же замеры на увеличенных картах: из JSON и собранных в .lvl"""
+    from compile_maps import compile_map
+    from synthetic import enlarge_map
+
+    sim = game.sim
+    saved_cache = sim.level_cache
+    with tempfile.TemporaryDirectory(prefix="bench_maps_") as out_dir:
+        for factor in factors:
+            json_path = enlarge_map(SCALE_MAP, factor, out_dir)
+            set_level_loader(sim, {1: json_path})
+
+            # Пока .lvl не собран, карта читается из JSON
+            results.time_ms(f"scale.x{factor}.load.json", median_time(
+                lambda: sim.load_level(1, reset_coins=True), repeats=3, prepare=sim.level_cache.clear
+            ))
+
+            start = time.perf_counter()
+            compiled_path = compile_map(json_path)
+            results.time_ms(f"scale.x{factor}.compile", time.perf_counter() - start)
+            results.add(f"scale.x{factor}.lvl_size", os.path.getsize(compiled_path) / 1024, "KB", "lower")
+            results.time_ms(f"scale.x{factor}.load.lvl", median_time(
+                lambda: sim.load_level(1, reset_coins=True), repeats=3, prepare=sim.level_cache.clear
+            ))
+
+            results.rate(f"scale.x{factor}.tick", TICKS, run_ticks(sim, 1))
+            sim.load_level(1, reset_coins=True)
+            game.process_events()
+            results.rate(f"scale.x{factor}.draw", DRAW_FRAMES, draw_frames(game))
+
+    sim.level_cache = saved_cache
+
+def compare(current, baseline, threshold):
+    """Таблица изменений относительно базовых результатов; возвращает число регрессий"""
+    regressions = 0
+    print(f"\n{'метрика':<36} {'база':>12} {'сейчас':>12} {'изменение':>10}")
+    for name, metric in current.items():
+        base = baseline.get(name)
+        if not base or not base["value"]:
+            print(f"{name:<36} {'-':>12} {metric['value']:12.3f}")
+            continue
+        change = (metric["value"] - base["value"]) / base["value"] * 100
+        worse = -change if metric["better"] == "higher" else change
+        mark = ""
+        if worse > threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions += 1
+        print(f"{name:<36} {base['value']:12.3f} {metric['value']:12.3f} {change:+9.1f}%{mark}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности игры")
+    parser.add_argument("--out", default="benchmark_results.json", help="файл результатов (JSON)")
+    parser.add_argument("--baseline", help="сравнить с сохраненными результатами")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="допустимое ухудшение в процентах")
+    parser.add_argument("--scale", type=int, nargs="*", default=list(SCALE_FACTORS),
+                        help="во сколько раз увеличивать карту (пусто - не мерить)")
+    parser.add_argument("--window", action="store_true", help="рисовать в обычном окне, а не вне экрана")
+    args = parser.parse_args()
+
+    out_path = os.path.join(LAUNCH_DIR, args.out)
+    baseline_path = os.path.join(LAUNCH_DIR, args.baseline) if args.baseline else None
+
+    if not args.window:
+        os.environ["ARCADE_HEADLESS"] = "1"
+    sys.path.insert(0, ROOT_DIR)
+    os.chdir(ROOT_DIR)
+
+    import arcade
+    import main as game_main
+
+    game = game_main.MyGame(game_main.SCREEN_WIDTH, game_main.SCREEN_HEIGHT, game_main.SCREEN_TITLE)
+    while not game.assets.is_done:
+        game.assets.update()
+        time.sleep(0.001)
+    # Звуки во время замеров не нужны
+    game.mixer.enabled = False
+
+    results = Results()
+    bench_levels(results, game)
+    bench_particles(results, game)
+    if args.scale:
+        bench_scale(results, game, args.scale)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "arcade": arcade.version.VERSION,
+            "renderer": game.ctx.info.RENDERER
+        },
+        "metrics": results.metrics
+    }
+    with open(out_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=1, ensure_ascii=False)
+    print(f"\nРезультаты: {out_path}")
+
+    regressions = 0
+    if baseline_path:
+        try:
+            with open(baseline_path, encoding="utf-8") as file:
+                baseline = json.load(file)["metrics"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ошибка чтения базовых результатов {baseline_path}: {e}")
+            return 1
+        regressions = compare(results.metrics, baseline, args.threshold)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Отчет о запуске игры: время импорта модулей, создания окна, первого
+кадра меню и загрузки ресурсов, с проверкой бюджета
+
+Игра запускается несколько раз в отдельном процессе с переменной
+GAME_STARTUP (отметки пишет startup.py) и ключом -X importtime; после
+отчета процесс завершается. Можно мерить и собранную игру (--exe), если
+она собрана с ключом отчета: pyinstaller main.spec -- --startup --report.
+Код выхода 1 означает, что медиана первого кадра или загрузки первого
+уровня не уложилась в бюджет.
+
+Запуск: python benchmarks/startup_report.py [--runs 3] [--exe dist/main/main.exe] [--out startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+LAUNCH_DIR = os.getcwd()
+
+RUNS = 3
+STARTUP_TIMEOUT = 60  # секунды ожидания отчета от игры
+FIRST_FRAME_BUDGET = 2.5  # секунды от запуска процесса до первого кадра меню
+LEVEL_BUDGET = 4.0  # секунды до загрузки ресурсов первого уровня
+TOP_IMPORTS = 12
+TOP_ASSETS = 8
+
+# arcade.run() вне экрана вызывает только обработчики сцены, но не окна (ни
+# загрузки, ни шагов симуляции), поэтому без окна цикл игры ведет сам отчет
+HEADLESS_LOOP = """
+import main
+game = main.MyGame(main.SCREEN_WIDTH, main.SCREEN_HEIGHT, main.SCREEN_TITLE)
+while True:
+    game.current_view.on_update(1 / main.RENDER_RATE)
+    game.on_update(1 / main.RENDER_RATE)
+    game.current_view.on_draw()
+    game.on_draw()
+    game.flip()
+"""
+
+# Отметки startup.py в порядке запуска
+MARKS = (
+    ("main", "до main.py (интерпретатор, распаковка)"),
+    ("imports", "импорт модулей"),
+    ("window", "окно и контекст OpenGL"),
+    ("first_frame", "первый кадр меню"),
+    ("assets_menu", "ресурсы меню"),
+    ("assets_level_1", "ресурсы первого уровня"),
+    ("assets_all", "все ресурсы")
+)
+
+def parse_importtime(lines):
+    """Строки -X importtime -> список (модуль, собственное время, с вложенными, кто импортировал) в секундах
+
+    Вложенный импорт печатается перед импортирующим модулем и с большим
+    отступом, поэтому родителя ищем, читая строки с конца.
+    """
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        own, cumulative, name = fields
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((name.strip(), int(own) / 1e6, int(cumulative) / 1e6, depth))
+
+    imports = []
+    parents = []  # модули на пути от верхнего уровня: (глубина, имя)
+    for name, own, cumulative, depth in reversed(entries):
+        while parents and parents[-1][0] >= depth:
+            parents.pop()
+        imports.append((name, own, cumulative, parents[-1][1] if parents else None))
+        parents.append((depth, name))
+    imports.reverse()
+    return imports
+
+def top_level(imports):
+    """Импорты верхнего уровня; модуль игры main раскрывается в свои импорты"""
+    return [
+        (name, cumulative) for name, _, cumulative, parent in imports
+        if (parent is None and name != "main") or parent == "main"
+    ]
+
+def launch(command, headless):
+    """Один запуск игры; возвращает отчет startup.py с отметками от старта процесса и импорты"""
+    with tempfile.TemporaryDirectory(prefix="startup_") as temp_dir:
+        report_path = os.path.join(temp_dir, "startup.json")
+        log_path = os.path.join(temp_dir, "log.txt")
+        env = dict(os.environ, GAME_STARTUP=report_path, PYTHONIOENCODING="utf-8")
+        if headless:
+            env["ARCADE_HEADLESS"] = "1"
+
+        with open(log_path, "w", encoding="utf-8") as log:
+            launched = time.time()
+            process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                deadline = time.perf_counter() + STARTUP_TIMEOUT
+                while not os.path.exists(report_path):
+                    if process.poll() is not None or time.perf_counter() > deadline:
+                        break
+                    time.sleep(0.01)
+                # Файл мог быть еще не дописан
+                time.sleep(0.1)
+            finally:
+                process.kill()
+                process.wait()
+
+        with open(log_path, encoding="utf-8", errors="replace") as log:
+            lines = log.read().splitlines()
+        if not os.path.exists(report_path):
+            tail = "\n".join(line for line in lines if not line.startswith("import time:"))[-2000:]
+            print(f"Ошибка запуска: отчета нет (код {process.returncode})\n{tail}")
+            return None
+        with open(report_path, encoding="utf-8") as file:
+            report = json.load(file)
+
+    # Время до main.py снаружи процесса, остальное - от main.py
+    offset = report["started_epoch"] - launched
+    report["marks"] = {"main": offset, **{name: offset + value for name, value in report["marks"].items()}}
+    for asset in report["assets"]:
+        asset["ready"] += offset
+    report["imports"] = parse_importtime(lines)
+    return report
+
+def summarize(reports):
+    """Медианы отметок, самые долгие импорты верхнего уровня и ресурсы по медиане"""
+    marks = {
+        name: statistics.median(report["marks"][name] for report in reports)
+        for name, _ in MARKS if all(name in report["marks"] for report in reports)
+    }
+    imports = {}
+    for report in reports:
+        for name, cumulative in top_level(report["imports"]):
+            imports.setdefault(name, []).append(cumulative)
+    assets = {}
+    for report in reports:
+        for asset in report["assets"]:
+            assets.setdefault(asset["path"], []).append((asset["decode"], asset["ready"], asset["priority"]))
+    return {
+        "runs": len(reports),
+        "marks": marks,
+        "import_total": statistics.median(
+            sum(cumulative for _, _, cumulative, parent in report["imports"] if parent is None) for report in reports
+        ),
+        "imports": sorted(
+            ((name, statistics.median(times)) for name, times in imports.items()),
+            key=lambda item: item[1], reverse=True
+        ),
+        "assets": sorted(
+            (
+                (path, statistics.median(decode for decode, _, _ in values),
+                 statistics.median(ready for _, ready, _ in values), values[0][2])
+                for path, values in assets.items()
+            ),
+            key=lambda item: item[1], reverse=True
+        ),
+        "modules": statistics.median(report["modules"] for report in reports),
+        "frozen": reports[0]["frozen"]
+    }
+
+def print_summary(summary, budgets):
+    """Таблица отчета; возвращает число превышенных бюджетов"""
+    over = 0
+    kind = "собранная игра" if summary["frozen"] else "из исходников"
+    print(f"Запуск ({kind}), медиана {summary['runs']} запусков, секунды от старта процесса:")
+    for name, title in MARKS:
+        if name not in summary["marks"]:
+            continue
+        value = summary["marks"][name]
+        line = f"  {title:<40} {value:7.3f}"
+        if name in budgets:
+            line += f"  (бюджет {budgets[name]:.1f})"
+            if value > budgets[name]:
+                line += "  ПРЕВЫШЕН"
+                over += 1
+        print(line)
+
+    if summary["imports"]:
+        print(f"\nИмпорт: {summary['import_total']:.3f} с, модулей загружено {summary['modules']:.0f}; самые долгие:")
+        for name, seconds in summary["imports"][:TOP_IMPORTS]:
+            print(f"  {name:<40} {seconds * 1000:7.1f} мс")
+    else:
+        print("\nВремени импорта нет (игра собрана без ключа --report)")
+
+    print("\nРесурсы: декодирование / готовность от старта процесса")
+    for path, decode, ready, priority in summary["assets"][:TOP_ASSETS]:
+        print(f"  {path:<40} {decode * 1000:7.1f} мс  {ready:7.3f} с  (приоритет {priority})")
+    return over
+
+def main():
+    parser = argparse.ArgumentParser(description="Отчет о времени запуска игры")
+    parser.add_argument("--runs", type=int, default=RUNS, help="запусков (берется медиана)")
+    parser.add_argument("--exe", help="собранная игра вместо запуска из исходников")
+    parser.add_argument("--budget", type=float, default=FIRST_FRAME_BUDGET, help="бюджет первого кадра меню, с")
+    parser.add_argument("--level-budget", type=float, default=LEVEL_BUDGET, help="бюджет загрузки первого уровня, с")
+    parser.add_argument("--window", action="store_true", help="в обычном окне, а не вне экрана (собранная игра - всегда в окне)")
+    parser.add_argument("--out", help="записать отчет в JSON")
+    args = parser.parse_args()
+
+    headless = not args.window and not args.exe
+    if args.exe:
+        command = [os.path.join(LAUNCH_DIR, args.exe)]
+    elif headless:
+        command = [sys.executable, "-X", "importtime", "-c", HEADLESS_LOOP]
+    else:
+        command = [sys.executable, "-X", "importtime", os.path.join(ROOT_DIR, "main.py")]
+
+    reports = []
+    for run in range(args.runs):
+        print(f"\rзапуск {run + 1}/{args.runs}", end="", flush=True)
+        report = launch(command, headless)
+        if report is None:
+            return 1
+        reports.append(report)
+    print("\r", end="")
+
+    summary = summarize(reports)
+    over = print_summary(summary, {"first_frame": args.budget, "assets_level_1": args.level_budget})
+    if args.out:
+        out_path = os.path.join(LAUNCH_DIR, args.out)
+        with open(out_path, "w", encoding="utf-8") as file:
+            json.dump({"summary": summary, "runs": reports}, file, indent=1, ensure_ascii=False)
+        print(f"\nОтчет: {out_path}")
+    return 1 if over else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Синтетически увеличенные карты для замеров масштабирования
+
+Карта повторяется по горизонтали factor раз вместе с объектами, поэтому
+тайлов, монеток и опасностей становится в factor раз больше.
+"""
+import json
+import os
+from tilemap import decode_layer_data, iter_layers
+
+def absolute_tilesets(raw_map, directory):
+    """Пути наборов тайлов и картинок относительно исходной папки карты"""
+    for raw_tileset in raw_map["tilesets"]:
+        for key in ("source", "image"):
+            if key in raw_tileset:
+                raw_tileset[key] = os.path.abspath(os.path.join(directory, raw_tileset[key]))
+
+def enlarge_map(path, factor, out_dir):
+    """Запись карты, повторенной factor раз по горизонтали; возвращает путь"""
+    with open(path, encoding="utf-8") as file:
+        raw_map = json.load(file)
+    if raw_map.get("infinite"):
+        raise ValueError(f"{path}: увеличиваются только конечные карты")
+
+    width, height = raw_map["width"], raw_map["height"]
+    shift = width * raw_map["tilewidth"]
+    next_id = raw_map.get("nextobjectid", 1)
+
+    for raw_layer in iter_layers(raw_map["layers"]):
+        if raw_layer["type"] == "tilelayer":
+            gids = decode_layer_data(raw_layer["data"], raw_layer.get("encoding"), raw_layer.get("compression"))
+            raw_layer["data"] = [
+                gid for row in range(height) for gid in gids[row * width:(row + 1) * width].tolist() * factor
+            ]
+            raw_layer["width"] = width * factor
+            raw_layer.pop("encoding", None)
+            raw_layer.pop("compression", None)
+        elif raw_layer["type"] == "objectgroup":
+            copies = []
+            for copy in range(1, factor):
+                for raw_object in raw_layer["objects"]:
+                    copies.append(dict(raw_object, id=next_id, x=raw_object["x"] + shift * copy))
+                    next_id += 1
+            raw_layer["objects"] += copies
+
+    raw_map["width"] = width * factor
+    raw_map["nextobjectid"] = next_id
+    absolute_tilesets(raw_map, os.path.dirname(path))
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    out_path = os.path.join(out_dir, f"{name}_x{factor}.json")
+    with open(out_path, "w", encoding="utf-8") as file:
+        json.dump(raw_map, file)
+    return out_path
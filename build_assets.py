@@ -0,0 +1,180 @@
+"""Сборка ресурсов: кадры игрока в реальном экранном размере в одном атласе
+и кадры анимаций (игрок, монетка) в атласе анимаций
+
+Запуск: python build_assets.py
+"""
+import arcade
+import json
+import math
+import os
+from PIL import Image, ImageEnhance
+
+PLAYER_SOURCE = "images/big2.png"
+PLAYER_ATLAS = "images/player_atlas.png"
+PLAYER_ATLAS_INFO = "images/player_atlas.json"
+
+# Масштабы, в которых игрок реально рисуется: интро и весь диапазон 0.005-0.02
+PLAYER_FRAME_SCALES = {
+    "intro": [0.1],
+    "player": [0.02, 0.015, 0.01, 0.005]
+}
+ATLAS_PADDING = 2
+
+ANIMATION_ATLAS = "images/animations.png"
+ANIMATION_ATLAS_INFO = "images/animations.json"
+COIN_SOURCE = "images/coin.png"
+COIN_SCALE = 0.05
+ANIMATION_SUPERSAMPLE = 4  # кадры искажаются в большем размере и потом уменьшаются
+
+def idle_pose(t):
+    """Дыхание: чуть ниже и шире в середине цикла"""
+    breath = (1 - math.cos(2 * math.pi * t)) / 2
+    return 1 + 0.01 * breath, 1 - 0.025 * breath, 0
+
+def walk_pose(t):
+    """Шаг: покачивание из стороны в сторону и приседание на каждом шаге"""
+    step = abs(math.sin(2 * math.pi * t))
+    return 1 + 0.015 * step, 1 - 0.035 * step, 0.05 * math.sin(2 * math.pi * t)
+
+# Клипы игрока: кадров в секунду, число кадров, поза (сжатие по x, по y, наклон верха) по фазе 0..1
+PLAYER_CLIPS = {
+    "idle": (4, 4, idle_pose),
+    "walk": (10, 6, walk_pose),
+    "jump": (1, 1, lambda t: (0.94, 1.0, 0)),
+    "fall": (1, 1, lambda t: (1.02, 0.97, -0.02))
+}
+COIN_SPIN = (10, 8)  # кадров в секунду, кадров на оборот
+
+def build_player_atlas():
+    """Уменьшение исходного изображения игрока и упаковка кадров в атлас"""
+    source = Image.open(PLAYER_SOURCE).convert("RGBA")
+    source_width, source_height = source.size
+
+    # Каждый масштаб уменьшается из оригинала, а не из предыдущего уровня
+    frames = []
+    for name, scales in PLAYER_FRAME_SCALES.items():
+        for scale in scales:
+            size = (max(1, round(source_width * scale)), max(1, round(source_height * scale)))
+            frames.append((name, size[0] / source_width, source.resize(size, Image.LANCZOS)))
+
+    # Кадры в один ряд
+    atlas_width = sum(image.width for _, _, image in frames) + ATLAS_PADDING * (len(frames) - 1)
+    atlas_height = max(image.height for _, _, image in frames)
+    atlas = Image.new("RGBA", (atlas_width, atlas_height))
+
+    # Хитбокс считается по оригиналу, чтобы столкновения не зависели от уменьшения
+    hit_box = arcade.hitbox.algo_default.calculate(source)
+
+    info = {
+        "source_size": [source_width, source_height],
+        "hit_box": [list(point) for point in hit_box],
+        "frames": []
+    }
+    x = 0
+    for name, scale, image in frames:
+        atlas.paste(image, (x, 0))
+        info["frames"].append({
+            "name": name,
+            "scale": scale,
+            "rect": [x, 0, image.width, image.height]
+        })
+        x += image.width + ATLAS_PADDING
+
+    atlas.save(PLAYER_ATLAS, optimize=True)
+    with open(PLAYER_ATLAS_INFO, "w", encoding="utf-8") as file:
+        json.dump(info, file, indent=1)
+
+    print(f"{PLAYER_ATLAS}: {atlas_width}x{atlas_height}, {len(frames)} кадров, "
+          f"{os.path.getsize(PLAYER_ATLAS) // 1024} КБ")
+
+def pose_frame(image, size, scale_x, scale_y, lean):
+    """Кадр позы: изображение сжато относительно середины низа, верх сдвинут на lean высоты"""
+    width, height = image.size
+    center = width / 2
+    # Для каждой точки кадра - точка исходного изображения (обратное аффинное преобразование)
+    frame = image.transform(
+        image.size, Image.AFFINE,
+        (
+            1 / scale_x, lean / scale_x, center - center / scale_x - lean * height / scale_x,
+            0, 1 / scale_y, height - height / scale_y
+        ),
+        resample=Image.BICUBIC
+    )
+    return frame.resize(size, Image.LANCZOS)
+
+def spin_frame(image, size, turn):
+    """Кадр вращения монетки вокруг вертикальной оси; turn - доля оборота"""
+    width, height = image.size
+    factor = math.cos(2 * math.pi * turn)
+    squeezed = image.resize((max(1, round(width * max(abs(factor), 0.06))), height), Image.LANCZOS)
+    # Ребро и обратная сторона немного темнее
+    squeezed = ImageEnhance.Brightness(squeezed).enhance(0.75 + 0.25 * abs(factor))
+    frame = Image.new("RGBA", image.size)
+    frame.paste(squeezed, ((width - squeezed.width) // 2, 0))
+    return frame.resize(size, Image.LANCZOS)
+
+def build_animation_atlas():
+    """Кадры анимаций: клипы игрока во всех масштабах и вращение монетки, каждый клип - ряд кадров"""
+    supersample = ANIMATION_SUPERSAMPLE
+    clips = []  # (имя, клип, масштаб кадра, кадров в секунду, кадры)
+
+    source = Image.open(PLAYER_SOURCE).convert("RGBA")
+    source_width, source_height = source.size
+    for name, scales in PLAYER_FRAME_SCALES.items():
+        for scale in scales:
+            size = (max(1, round(source_width * scale)), max(1, round(source_height * scale)))
+            large = source.resize((size[0] * supersample, size[1] * supersample), Image.LANCZOS)
+            for clip, (fps, count, pose) in PLAYER_CLIPS.items():
+                # Во вступлении игрок только стоит
+                if name == "intro" and clip != "idle":
+                    continue
+                frames = [pose_frame(large, size, *pose(i / count)) for i in range(count)]
+                clips.append((name, clip, size[0] / source_width, fps, frames))
+
+    coin = Image.open(COIN_SOURCE).convert("RGBA")
+    size = (max(1, round(coin.width * COIN_SCALE)), max(1, round(coin.height * COIN_SCALE)))
+    large = coin.resize((size[0] * supersample, size[1] * supersample), Image.LANCZOS)
+    fps, count = COIN_SPIN
+    frames = [spin_frame(large, size, i / count) for i in range(count)]
+    clips.append(("coin", "spin", size[0] / coin.width, fps, frames))
+
+    # Ряды клипов раскладываются по полкам: ширина атласа - самый длинный ряд
+    rows = [
+        (sum(frame.width for frame in frames) + ATLAS_PADDING * (len(frames) - 1), clip)
+        for clip in clips for frames in [clip[4]]
+    ]
+    atlas_width = max(width for width, _ in rows)
+    placed = []
+    x = y = shelf_height = 0
+    for width, clip in sorted(rows, key=lambda row: -row[1][4][0].height):
+        if x and x + width > atlas_width:
+            x = 0
+            y += shelf_height + ATLAS_PADDING
+            shelf_height = 0
+        placed.append((x, y, clip))
+        shelf_height = max(shelf_height, clip[4][0].height)
+        x += width + ATLAS_PADDING
+    atlas_height = y + shelf_height
+    atlas = Image.new("RGBA", (atlas_width, atlas_height))
+
+    info = {"clips": []}
+    for x, y, (name, clip, scale, fps, frames) in placed:
+        rects = []
+        for frame in frames:
+            atlas.paste(frame, (x, y))
+            rects.append([x, y, frame.width, frame.height])
+            x += frame.width + ATLAS_PADDING
+        info["clips"].append({"name": name, "clip": clip, "scale": scale, "fps": fps, "rects": rects})
+
+    atlas.save(ANIMATION_ATLAS, optimize=True)
+    with open(ANIMATION_ATLAS_INFO, "w", encoding="utf-8") as file:
+        json.dump(info, file, indent=1)
+
+    frame_count = sum(len(clip["rects"]) for clip in info["clips"])
+    print(f"{ANIMATION_ATLAS}: {atlas_width}x{atlas_height}, {len(clips)} клипов, {frame_count} кадров, "
+          f"{os.path.getsize(ANIMATION_ATLAS) // 1024} КБ")
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    build_player_atlas()
+    build_animation_atlas()
@@ -0,0 +1,124 @@
+"""Сборка карт: maps/mapN.json -> maps/mapN.lvl
+
+В собранном файле номера тайлов лежат упакованными массивами uint16/uint32,
+картинки используемых тайлов вырезаны из наборов и лежат рядом с хитбоксами,
+прямоугольники физики посчитаны, поэтому игре не нужно разбирать JSON, .tsx
+и декодировать картинки наборов тайлов.
+
+Запуск: python compile_maps.py [карты...]
+"""
+import arcade
+import glob
+import os
+import struct
+import sys
+from array import array
+from tilemap import (
+    StreamedTileMap, GID_MASK, LEVEL_EXTENSION, LEVEL_MAGIC, LEVEL_VERSION,
+    LEVEL_HEADER, LEVEL_TILE, LEVEL_PIECE, LEVEL_RECT, LEVEL_OBJECT, file_crc32
+)
+from simulation import CHUNK_SIZE, layer_kind, is_solid_tile, merge_solid_cells
+
+class LevelWriter:
+    """Последовательная запись собранного файла уровня"""
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, layout, *values):
+        self.data += layout.pack(*values)
+
+    def write_string(self, text):
+        encoded = text.encode("utf-8")
+        self.write(struct.Struct("<H"), len(encoded))
+        self.data += encoded
+
+    def write_array(self, values):
+        self.data += bytes(-len(self.data) % 4)  # выравнивание для чтения без копирования
+        if sys.byteorder == "big":
+            values = array(values.typecode, values)
+            values.byteswap()
+        self.data += values.tobytes()
+
+def compile_map(path):
+    """Сборка одной карты, возвращает путь к собранному файлу"""
+    tilemap = StreamedTileMap(path, CHUNK_SIZE)
+    writer = LevelWriter()
+
+    writer.write(
+        LEVEL_HEADER, LEVEL_MAGIC, LEVEL_VERSION, tilemap.tile_width, tilemap.tile_height,
+        CHUNK_SIZE, file_crc32(path), tilemap.first_col, tilemap.first_row, tilemap.last_col, tilemap.last_row
+    )
+
+    # Таблица тайлов, которые встречаются на карте (без отражений): пиксели, хитбокс, сплошной ли
+    tile_gids = sorted({
+        gid & GID_MASK for layer in tilemap.layers for *_, gids in layer.pieces for gid in set(gids) if gid
+    })
+    writer.write(struct.Struct("<I"), len(tile_gids))
+    for tile_gid in tile_gids:
+        texture = tilemap.make_tile_texture(tile_gid)
+        probe = arcade.Sprite(texture, center_x=texture.width / 2, center_y=texture.height / 2)
+        solid = is_solid_tile(probe, tilemap.tile_width, tilemap.tile_height)
+        points = texture.hit_box_points
+        writer.write(LEVEL_TILE, tile_gid, texture.width, texture.height, solid, len(points))
+        writer.write_array(array("f", [value for point in points for value in point]))
+        writer.write_array(array("B", texture.image.tobytes()))
+
+    # Слои: uint16, если все номера тайлов (с битами отражений) в него помещаются
+    writer.write(struct.Struct("<H"), len(tilemap.layers))
+    for layer in tilemap.layers:
+        writer.write_string(layer.name)
+        writer.write(struct.Struct("<I"), len(layer.pieces))
+        for x, y, width, height, gids in layer.pieces:
+            gid_size = 2 if max(gids, default=0) <= 0xFFFF else 4
+            writer.write(LEVEL_PIECE, x, y, width, height, gid_size)
+            writer.write_array(array("H" if gid_size == 2 else "I", gids))
+
+    # Прямоугольники физики по чанкам - так же, как их строит LevelData
+    platform_layers = [layer for layer in tilemap.layers if layer_kind(layer.name) == "platforms"]
+    keys = sorted({key for layer in platform_layers for key in layer.index})
+    chunk_rects = []
+    for key in keys:
+        rows = {}
+        for layer in platform_layers:
+            for tile in tilemap.get_sprites(layer, key):
+                if is_solid_tile(tile, tilemap.tile_width, tilemap.tile_height):
+                    rows.setdefault(int(tile.center_y // tilemap.tile_height), set()).add(
+                        int(tile.center_x // tilemap.tile_width)
+                    )
+        if rows:
+            chunk_rects.append((key, merge_solid_cells(rows)))
+
+    writer.write(struct.Struct("<I"), len(chunk_rects))
+    for (cx, cy), rects in chunk_rects:
+        writer.write(struct.Struct("<iiI"), cx, cy, len(rects))
+        for rect in rects:
+            writer.write(LEVEL_RECT, *rect)
+
+    # Свойства карты
+    writer.write(struct.Struct("<H"), len(tilemap.properties))
+    for name, value in tilemap.properties.items():
+        writer.write_string(name)
+        if isinstance(value, bool):
+            writer.write_string("bool")
+            writer.write_string("true" if value else "false")
+        else:
+            writer.write_string({int: "int", float: "float"}.get(type(value), "string"))
+            writer.write_string(str(value))
+
+    # Объекты уже в координатах мира (вместе с тайлами слоев-сущностей)
+    writer.write(struct.Struct("<I"), len(tilemap.objects))
+    for map_object in tilemap.objects:
+        writer.write_string(map_object.kind)
+        writer.write_string(map_object.name)
+        writer.write(LEVEL_OBJECT, map_object.x, map_object.y, map_object.width, map_object.height)
+
+    compiled_path = os.path.splitext(path)[0] + LEVEL_EXTENSION
+    with open(compiled_path, "wb") as file:
+        file.write(writer.data)
+    return compiled_path
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    for path in sys.argv[1:] or sorted(glob.glob("maps/map*.json")):
+        compiled_path = compile_map(path)
+        print(f"{path} -> {compiled_path}: {os.path.getsize(compiled_path) // 1024} КБ")
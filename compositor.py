@@ -0,0 +1,277 @@
+"""Запекание неподвижных слоев уровня в текстуры по чанкам
+
+Тайлы неподвижных слоев видимого чанка один раз рисуются в свою текстуру,
+а в кадре каждый чанк выводится одним прямоугольником. Текстура
+перерисовывается, только если у чанка подгрузились или выгрузились соседи
+(крупные тайлы могут заходить на соседний чанк) или сменился уровень.
+Прямоугольник чанка покрывает только ту часть текстуры, где есть тайлы, -
+пустые места не обходятся ни в один пиксель заливки.
+Чанки следующего уровня можно запечь заранее, по одному за кадр (prefetch).
+Группу можно вывести с волной (вода): строки текстуры сдвигаются по синусу
+от времени, сама текстура при этом не перерисовывается.
+"""
+import arcade
+from array import array
+
+# Смешивание при запекании: цвет в текстуре получается умноженным на альфу,
+# поэтому на экран текстура выводится как (ONE, ONE_MINUS_SRC_ALPHA)
+BLEND_BAKE = (
+    arcade.gl.Context.SRC_ALPHA, arcade.gl.Context.ONE_MINUS_SRC_ALPHA,
+    arcade.gl.Context.ONE, arcade.gl.Context.ONE_MINUS_SRC_ALPHA
+)
+BLEND_COMPOSITE = (arcade.gl.Context.ONE, arcade.gl.Context.ONE_MINUS_SRC_ALPHA)
+
+WAVE_AMPLITUDE = 2.0  # пиксели
+WAVE_LENGTH = 48.0  # пиксели по вертикали на период
+WAVE_SPEED = 3.0  # радиан в секунду
+
+CHUNK_QUAD_VS = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+uniform vec2 origin;
+uniform float size;
+uniform vec4 bounds;  // занятая часть текстуры: левый нижний и правый верхний угол в долях
+
+in vec2 in_vert;
+out vec2 v_uv;
+out vec2 v_world;
+
+void main() {
+    v_uv = mix(bounds.xy, bounds.zw, in_vert);
+    v_world = origin + v_uv * size;
+    gl_Position = window.projection * window.view * vec4(v_world, 0.0, 1.0);
+}
+"""
+
+CHUNK_QUAD_FS = """
+#version 330
+
+uniform sampler2D texture0;
+
+in vec2 v_uv;
+out vec4 out_color;
+
+void main() {
+    vec4 color = texture(texture0, v_uv);
+    if (color.a == 0.0) {
+        discard;
+    }
+    out_color = color;
+}
+"""
+
+CHUNK_WAVE_FS = """
+#version 330
+
+uniform sampler2D texture0;
+uniform float size;
+uniform float time;
+uniform vec3 wave;  // амплитуда, длина, скорость
+
+in vec2 v_uv;
+in vec2 v_world;
+out vec4 out_color;
+
+void main() {
+    // Фаза зависит от мировой высоты, поэтому волна непрерывна на границах чанков
+    float shift = sin(v_world.y * 6.2831853 / wave.y + time * wave.z) * wave.x / size;
+    vec4 color = texture(texture0, vec2(v_uv.x + shift, v_uv.y));
+    if (color.a == 0.0) {
+        discard;
+    }
+    out_color = color;
+}
+"""
+
+def neighbour_keys(key):
+    cx, cy = key
+    return [(cx + dx, cy + dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+
+class StaticLayers:
+    """Запеченные группы неподвижных слоев: группа -> виды слоев в порядке отрисовки"""
+    def __init__(self, ctx, groups, chunk_size):
+        self.ctx = ctx
+        self.groups = groups
+        self.chunk_size = chunk_size
+        self.level = None
+        self.version = None
+        self.visible = []
+        self.baked = {}  # (группа, чанк) -> (framebuffer, загруженные соседи, занятая часть)
+        self.pool = []  # свободные framebuffer для повторного использования
+        self.next_level = None  # уровень, чанки которого запекаются заранее
+        self.next_baked = {}
+
+        self.program = ctx.program(vertex_shader=CHUNK_QUAD_VS, fragment_shader=CHUNK_QUAD_FS)
+        self.program["size"] = chunk_size
+        self.wave_program = ctx.program(vertex_shader=CHUNK_QUAD_VS, fragment_shader=CHUNK_WAVE_FS)
+        self.wave_program["size"] = chunk_size
+        self.wave_program["wave"] = (WAVE_AMPLITUDE, WAVE_LENGTH, WAVE_SPEED)
+        self.quad = ctx.geometry(
+            [arcade.gl.BufferDescription(ctx.buffer(data=array("f", [0, 0, 1, 0, 0, 1, 1, 1])), "2f", ["in_vert"])],
+            mode=ctx.TRIANGLE_STRIP
+        )
+        self.bake_camera = arcade.Camera2D(viewport=arcade.LBWH(0, 0, chunk_size, chunk_size))
+
+    def release(self, baked):
+        for framebuffer, *_ in baked.values():
+            self.pool.append(framebuffer)
+        baked.clear()
+
+    def clear(self):
+        """Сброс запеченных чанков (при смене уровня)"""
+        self.release(self.baked)
+        self.visible = []
+        self.level = None
+        self.version = None
+
+    def memory_size(self):
+        """Байт видеопамяти в текстурах чанков, включая запас для повторного использования"""
+        count = len(self.baked) + len(self.next_baked) + len(self.pool)
+        return count * self.chunk_size * self.chunk_size * 4
+
+    def delete(self):
+        """Удаление всех текстур и шейдера (ресурсы больше не нужны)"""
+        self.clear()
+        self.release(self.next_baked)
+        self.next_level = None
+        for framebuffer in self.pool:
+            for texture in framebuffer.color_attachments:
+                texture.delete()
+            framebuffer.delete()
+        self.pool = []
+        self.program.delete()
+        self.wave_program.delete()
+
+    def get_framebuffer(self):
+        if self.pool:
+            return self.pool.pop()
+        texture = self.ctx.texture(
+            (self.chunk_size, self.chunk_size), components=4,
+            wrap_x=self.ctx.CLAMP_TO_EDGE, wrap_y=self.ctx.CLAMP_TO_EDGE
+        )
+        return self.ctx.framebuffer(color_attachments=[texture])
+
+    def update(self, level, keys):
+        """Запекание видимых чанков; вызывается до камеры кадра, так как меняет цель отрисовки"""
+        if level is not self.level:
+            self.clear()
+            if level is self.next_level:
+                self.baked, self.next_baked = self.next_baked, self.baked
+                self.next_level = None
+            self.level = level
+
+        keys = [key for key in keys if key in level.loaded]
+        if keys == self.visible and level.version == self.version:
+            return
+        self.visible = keys
+        self.version = level.version
+
+        # Чанки, ушедшие с экрана, освобождают текстуры
+        wanted = set(keys)
+        for baked_key in [baked_key for baked_key in self.baked if baked_key[1] not in wanted]:
+            self.pool.append(self.baked.pop(baked_key)[0])
+
+        for key in keys:
+            for group in self.groups:
+                self.refresh(self.baked, level, group, key)
+
+    def prefetch(self, level, keys):
+        """Запекание одного чанка уровня, который скоро станет текущим; False, если все готово"""
+        if level is self.level:
+            return False
+        if level is not self.next_level:
+            self.release(self.next_baked)
+            self.next_level = level
+
+        for key in keys:
+            if key in level.loaded:
+                for group in self.groups:
+                    if self.refresh(self.next_baked, level, group, key):
+                        return True
+        return False
+
+    def refresh(self, baked, level, group, key):
+        """Запекание чанка группы, если изменились его загруженные соседи; True, если запекали"""
+        neighbours = [neighbour for neighbour in neighbour_keys(key) if neighbour in level.loaded]
+        entry = baked.get((group, key))
+        if entry and entry[1] == neighbours:
+            return False
+
+        sprite_lists = [
+            level.chunks[kind][neighbour]
+            for kind in self.groups[group] for neighbour in neighbours
+            if neighbour in level.chunks[kind]
+        ]
+        if not sprite_lists:
+            if entry:
+                self.pool.append(baked.pop((group, key))[0])
+            return False
+
+        bounds = self.content_bounds(key, sprite_lists)
+        if bounds is None:
+            if entry:
+                self.pool.append(baked.pop((group, key))[0])
+            return False
+
+        framebuffer = entry[0] if entry else self.get_framebuffer()
+        self.bake(framebuffer, key, sprite_lists)
+        baked[(group, key)] = (framebuffer, neighbours, bounds)
+        return True
+
+    def content_bounds(self, key, sprite_lists):
+        """Часть чанка, которую закрывают тайлы, в долях стороны; None, если чанк пуст
+
+        Берется прямоугольник текстуры (хитбокс тайла может быть меньше картинки),
+        с запасом на сглаживание и амплитуду волны.
+        """
+        size = self.chunk_size
+        margin = WAVE_AMPLITUDE + 1
+        left = key[0] * size
+        bottom = key[1] * size
+        sprites = [sprite for sprite_list in sprite_lists for sprite in sprite_list]
+        if not sprites:
+            return None
+        bounds = (
+            max(min(sprite.center_x - sprite.width / 2 for sprite in sprites) - margin - left, 0) / size,
+            max(min(sprite.center_y - sprite.height / 2 for sprite in sprites) - margin - bottom, 0) / size,
+            min(max(sprite.center_x + sprite.width / 2 for sprite in sprites) + margin - left, size) / size,
+            min(max(sprite.center_y + sprite.height / 2 for sprite in sprites) + margin - bottom, size) / size
+        )
+        if bounds[0] >= bounds[2] or bounds[1] >= bounds[3]:
+            return None
+        return bounds
+
+    def bake(self, framebuffer, key, sprite_lists):
+        size = self.chunk_size
+        camera = self.bake_camera
+        camera.render_target = framebuffer
+        camera.position = ((key[0] + 0.5) * size, (key[1] + 0.5) * size)
+        with framebuffer.activate():
+            framebuffer.clear()
+            camera.use()
+            for sprite_list in sprite_lists:
+                sprite_list.draw(blend_function=BLEND_BAKE)
+
+    def draw(self, group, wave_time=None):
+        """Вывод запеченных чанков группы в текущую камеру; с wave_time (секунды) - с волной"""
+        ctx = self.ctx
+        program = self.program
+        if wave_time is not None:
+            program = self.wave_program
+            program["time"] = wave_time
+        size = self.chunk_size
+        ctx.enable(ctx.BLEND)
+        ctx.blend_func = BLEND_COMPOSITE
+        for key in self.visible:
+            baked = self.baked.get((group, key))
+            if baked:
+                program["origin"] = (key[0] * size, key[1] * size)
+                program["bounds"] = baked[2]
+                baked[0].color_attachments[0].use(0)
+                self.quad.render(program)
+        ctx.blend_func = ctx.BLEND_DEFAULT
@@ -1,690 +1,312 @@
+import time
+STARTED_AT = time.perf_counter()  # начало запуска для отчета (startup.py)
+
+import argparse
 import arcade
-import math
 import os
-import time
+from functools import partial
 from typing import Dict, List, Set, Optional
 
+# Установка рабочей директории до загрузки ресурсов симуляцией
+LAUNCH_DIR = os.getcwd()  # пути из командной строки считаются от нее
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from profiler import FrameProfiler, ProfilerOverlay
+from startup import StartupTimer
+from save import GameSave, SaveWriter, load_save
+from scenes import SceneManager, MenuScene, IntroScene, GameScene, VictoryScene
+from assets import AssetLoader, PRIORITY_MENU, PRIORITY_LEVEL_1, PRIORITY_REST
+from audio import Mixer, decode_effect, decode_music
+from animation import Animations, ANIMATION_ATLAS, read_animation_atlas
+from simulation import (
+    GameSimulation, SCREEN_WIDTH, SCREEN_HEIGHT, TICK_RATE, TICK_TIME,
+    INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, INPUT_START, TEXTURE_FILES, PLAYER_ATLAS,
+    find_levels, read_player_atlas
+)
+
 # Константы
-SCREEN_WIDTH = 1280
-SCREEN_HEIGHT = 768
 SCREEN_TITLE = "Mini Adventure"
-PLAYER_SPEED = 5
-JUMP_FORCE = 21
-GRAVITY = 0.9
-PLAYER_SCALE = 0.02
-COIN_SCALE = 0.05
-LILYPAD_SCALE = 0.1
-PORTAL_SCALE = 0.5
-
-class Lilypad(arcade.Sprite):
-    def __init__(self, texture, scale=1.0):
-        super().__init__(texture, scale)
-        self.stand_time = 0
-        self.disappear_start = 0
-        self.is_disappearing = False
-        self.original_y = self.center_y
-        self.current_state = "normal"  # normal, shaking, disappearing, reappearing
-        
-    def update(self):
-        # Обновление состояния кувшинки
-        if self.current_state == "normal" and self.stand_time > 1.0:
-            self.current_state = "shaking"
-            
-        elif self.current_state == "shaking" and self.stand_time > 2.0:
-            self.current_state = "disappearing"
-            self.disappear_start = time.time()
-            
-        elif self.current_state == "disappearing":
-            # Полное исчезновение через 1 секунду
-            if time.time() - self.disappear_start > 1.0:
-                self.current_state = "reappearing"
-                self.disappear_start = time.time()
-                self.stand_time = 0
-                self.alpha = 0  # Полностью прозрачная
-            else:
-                # Плавное исчезновение
-                self.alpha = int(255 * (1 - (time.time() - self.disappear_start)))
-                
-        elif self.current_state == "reappearing":
-            # Появление через 1 секунду
-            if time.time() - self.disappear_start > 1.0:
-                self.current_state = "normal"
-                self.alpha = 255  # Полностью видимая
-                self.center_y = self.original_y
-            else:
-                # Плавное появление
-                self.alpha = int(255 * ((time.time() - self.disappear_start)))
-                
-        # Анимация покачивания
-        if self.current_state == "shaking":
-            self.center_y = self.original_y + math.sin(time.time() * 10) * 3
+MAX_CATCHUP_STEPS = 5  # максимум шагов симуляции за один кадр
+RENDER_RATE = 60
+SAVE_PATH = "save.dat"
+AUTOSAVE_TICKS = 10 * TICK_RATE  # автосохранение во время игры не реже, чем раз в столько шагов
+# События симуляции, после которых прогресс сохраняется сразу
+AUTOSAVE_EVENTS = ("coin", "checkpoint", "level", "death", "restart")
+MUSIC_PATH = "sounds/menu.wav"
+# Звуковые эффекты: файл, голосов (одновременных проигрываний), громкость, приоритет
+SOUND_EFFECTS = {
+    "jump": ("sounds/jump.wav", 2, 0.8, 1),
+    "coin": ("sounds/coin.wav", 3, 1.0, 2),
+    "lilypad": ("sounds/lilypad.wav", 2, 0.6, 0)
+}
 
 class MyGame(arcade.Window):
-    def __init__(self, width, height, title):
-        super().__init__(width, height, title)
-        
-        # Установка рабочей директории
-        file_path = os.path.dirname(os.path.abspath(__file__))
-        os.chdir(file_path)
-        
-        # Спрайтлисты
-        self.menu_background_list = arcade.SpriteList()
-        self.background_list = arcade.SpriteList()
-        self.back_decor_list = arcade.SpriteList()
-        self.player_list = arcade.SpriteList()
-        self.platforms_list = arcade.SpriteList()
-        self.portal_list = arcade.SpriteList()
-        self.spikes_list = arcade.SpriteList()
-        self.water_list = arcade.SpriteList()
-        self.lilypads_list = arcade.SpriteList()
-        self.coins_list = arcade.SpriteList()
-        self.end_list = arcade.SpriteList()
-        self.intro_player_list = arcade.SpriteList()
-
-        # Состояние монеток
-        self.coin_positions = {
-            1: [(300, 400), (600, 500), (900, 250)],
-            2: [(350, 300), (700, 400), (950, 350)],
-            3: [(400, 200), (750, 300), (1000, 250)]
-        }
-        self.collected_coins = {1: set(), 2: set(), 3: set()}
-        
-        # Звуки
-        self.game_music = None
-        self.music_player = None
-        self.jump_sound = None
-        self.coin_sound = None
-        self.lilypad_sound = None
-        
-        # Текстуры
+    """Окно игры: шаги симуляции, ввод и загрузка; рисуют сцены (scenes.py)"""
+    def __init__(self, width, height, title, record_path=None):
+        # Замер запуска (GAME_STARTUP=файл.json)
+        self.startup = StartupTimer.from_environment(STARTED_AT)
+        self.startup.mark("imports")
+        super().__init__(width, height, title, update_rate=1 / RENDER_RATE, draw_rate=1 / RENDER_RATE)
+        self.startup.mark("window")
+
+        # Звуки: эффекты и музыка появляются в микшере по мере загрузки
+        self.mixer = Mixer()
+
+        # Кадры анимаций (все в атласе окна)
+        self.animations = Animations(self.ctx)
+
+        # Текстуры фонов
         self.preloaded_textures = {
-            'player_right': None,
-            'player_left': None,
             'backgrounds': {},
-            'menu_bg': None,
-            'lilypad': None,
-            'coin': None,
-            'portal': None
+            'menu_bg': None
         }
-        
-        # Направление игрока
-        self.player_facing_right = True
-        
-        # Статистика игрока
-        self.player_scale = 0.02
-        self.initial_scale = 0.02
-        self.min_scale = 0.005
-        self.max_scale = 0.02
-        self.death_count = 0
-        self.coins_collected = 0
-        self.total_coins = 3
-        
-        # Состояния игры
-        self.game_state = "MENU"  # MENU, INTRO, GAME, VICTORY
-        self.current_level = 1
-        self.animation_time = 0
-        self.fade_alpha = 0
-        self.intro_time = 0
-        self.victory_time = 0
-        
+
         # Управление
         self.held_keys = set()
-        self.physics_engine = None
+        self.jump_requested = False
+        self.start_requested = False
+
+        # Фиксированный шаг симуляции
+        self.tick_accumulator = 0
+        self.interpolation = 1.0
+
+        # Текстуры симуляции приходят из фоновой загрузки
+        self.sim = GameSimulation(load_textures=False)
+        
+        # Профилировщик кадров (F3 или GAME_PROFILE=файл.csv)
+        self.profiler = FrameProfiler.from_environment()
+        self.profiler_overlay = None  # создается при первом включении (шрифт не нужен для запуска)
+        self.sim.profiler = self.profiler
         
-        # Параметры кнопки/текста
-        self.button_x = SCREEN_WIDTH // 2
-        self.button_y = SCREEN_HEIGHT // 2
-        self.button_width = 300
-        self.button_height = 100
-        self.button_angle = 0
+        # Запись ввода для повтора (python replay.py); модуль нужен только при записи
+        self.record_path = record_path
+        self.recorder = None
+        if record_path:
+            from replay import ReplayRecorder
+            self.recorder = ReplayRecorder(TICK_RATE)
         
-        self.setup_menu()
+        # Сохранение прогресса; при записи повтора игра всегда начинается заново
+        self.saved = None if record_path else load_save(SAVE_PATH)
+        self.save_writer = SaveWriter(SAVE_PATH)
+        self.assets = AssetLoader(self.ctx)
+
+        # Сцена на каждое состояние симуляции
+        self.scenes = SceneManager(self, {
+            "MENU": MenuScene(self),
+            "INTRO": IntroScene(self),
+            "GAME": GameScene(self),
+            "VICTORY": VictoryScene(self)
+        })
         self.preload_resources()
-        self.start_music()
+        self.process_events()
+
 
     def preload_resources(self):
-        """Предзагрузка всех необходимых ресурсов"""
+        """Постановка ресурсов в фоновую загрузку: меню, затем первый уровень, затем остальное"""
         print("\n=== LOADING RESOURCES ===")
-        
+
         # Создаем папки если их нет
         os.makedirs("images", exist_ok=True)
         os.makedirs("sounds", exist_ok=True)
         os.makedirs("maps", exist_ok=True)
 
-        # Загрузка звуков
-        try:
-            if os.path.exists("sounds/menu.wav"):
-                self.game_music = arcade.load_sound("sounds/menu.wav")
-            if os.path.exists("sounds/jump.wav"):
-                self.jump_sound = arcade.load_sound("sounds/jump.wav")
-            if os.path.exists("sounds/coin.wav"):
-                self.coin_sound = arcade.load_sound("sounds/coin.wav")
-            if os.path.exists("sounds/lilypad.wav"):
-                self.lilypad_sound = arcade.load_sound("sounds/lilypad.wav")
-        except Exception as e:
-            print(f"Ошибка загрузки звуков: {e}")
-
-        # Загрузка текстур
-        try:
-            if os.path.exists("images/big2.png"):
-                self.preloaded_textures['player_right'] = arcade.load_texture("images/big2.png")
-            if os.path.exists("images/big2z.png"):
-                self.preloaded_textures['player_left'] = arcade.load_texture("images/big2z.png")
-            if os.path.exists("images/lilypad.png"):
-                self.preloaded_textures['lilypad'] = arcade.load_texture("images/lilypad.png")
-            if os.path.exists("images/coin.png"):
-                self.preloaded_textures['coin'] = arcade.load_texture("images/coin.png")
-            if os.path.exists("images/portal.png"):
-                self.preloaded_textures['portal'] = arcade.load_texture("images/portal.png")
-            if os.path.exists("images/menu.png"):
-                self.preloaded_textures['menu_bg'] = arcade.load_texture("images/menu.png")
-            
-            for level in [1, 2, 3]:
-                path = f"images/loc{level}.png"
-                if os.path.exists(path):
-                    self.preloaded_textures['backgrounds'][level] = arcade.load_texture(path)
-        except Exception as e:
-            print(f"Ошибка загрузки текстур: {e}")
-
-    def create_lilypads(self):
-        """Создание платформ-лилий для второго уровня"""
-        if not self.preloaded_textures['lilypad']:
-            print("Текстура лилии не загружена!")
-            return
-            
-        lily_positions = [
-            (480, 250),
-            (600, 250),
-            (900, 300)
-        ]
-        
-        for x, y in lily_positions:
-            lilypad = Lilypad(self.preloaded_textures['lilypad'], LILYPAD_SCALE)
-            lilypad.center_x = x
-            lilypad.center_y = y
-            lilypad.original_y = y
-            self.lilypads_list.append(lilypad)
-        
-        # Добавляем кувшинки в список платформ для физического движка
-        self.platforms_list.extend(self.lilypads_list)
-
-    def create_portal(self, x, y):
-        """Создание портала на уровне"""
-        if not self.preloaded_textures['portal']:
-            print("Текстура портала не загружена!")
-            return
-            
-        portal = arcade.Sprite()
-        portal.texture = self.preloaded_textures['portal']
-        portal.center_x = x
-        portal.center_y = y
-        portal.scale = PORTAL_SCALE
-        self.portal_list.append(portal)
-
-    def create_coins(self, reset_coins=False):
-        """Создание монеток для уровня"""
-        if not self.preloaded_textures['coin']:
-            print("Текстура монетки не загружена!")
-            return
-            
-        self.coins_list.clear()
-        
-        if reset_coins:
-            self.collected_coins[self.current_level] = set()
-            self.coins_collected = 0
-        
-        for i, (x, y) in enumerate(self.coin_positions[self.current_level]):
-            if i not in self.collected_coins[self.current_level]:
-                coin = arcade.Sprite()
-                coin.texture = self.preloaded_textures['coin']
-                coin.center_x = x
-                coin.center_y = y
-                coin.scale = COIN_SCALE
-                coin.index = i
-                self.coins_list.append(coin)
+        assets = self.assets
+
+        # Меню
+        assets.add("images/menu.png", self.on_menu_background_loaded, priority=PRIORITY_MENU)
+        assets.add(MUSIC_PATH, self.on_music_loaded, decode_music, PRIORITY_MENU)
+
+        # Первый уровень
+        assets.add(PLAYER_ATLAS, self.on_player_atlas_loaded, read_player_atlas, PRIORITY_LEVEL_1)
+        assets.add(ANIMATION_ATLAS, self.animations.load, read_animation_atlas, PRIORITY_LEVEL_1)
+        for name, (path, *_) in SOUND_EFFECTS.items():
+            priority = PRIORITY_REST if name == 'lilypad' else PRIORITY_LEVEL_1
+            assets.add(path, partial(self.on_sound_loaded, name), decode_effect, priority)
+
+        # Фоны и текстуры объектов
+        for level in find_levels():
+            priority = PRIORITY_LEVEL_1 if level == 1 else PRIORITY_REST
+            assets.add(f"images/loc{level}.png", partial(self.on_level_background_loaded, level), priority=priority)
+        for name, path in TEXTURE_FILES.items():
+            priority = PRIORITY_LEVEL_1 if name == 'coin' else PRIORITY_REST
+            assets.add(path, partial(self.on_sim_texture_loaded, name), priority=priority)
+
+        assets.start()
+
+    def on_menu_background_loaded(self, texture):
+        self.preloaded_textures['menu_bg'] = texture
+
+    def on_music_loaded(self, source):
+        self.mixer.set_music(source)
+        self.start_music()
+
+    def on_sound_loaded(self, name, source):
+        _, voices, volume, priority = SOUND_EFFECTS[name]
+        self.mixer.add_effect(name, source, voices, volume, priority)
+
+    def on_level_background_loaded(self, level, texture):
+        self.preloaded_textures['backgrounds'][level] = texture
+
+    def on_sim_texture_loaded(self, name, texture):
+        self.sim.textures[name] = texture
+
+    def on_player_atlas_loaded(self, atlas):
+        self.sim.set_player_atlas(*atlas)
+        for frames in self.sim.player_frames.values():
+            for _, right, left in frames:
+                self.ctx.default_atlas.add(right)
+                self.ctx.default_atlas.add(left)
 
     def start_music(self):
         """Запуск музыки"""
-        if self.game_music and not self.music_player:
-            self.music_player = arcade.play_sound(self.game_music, loop=True)
-        elif self.music_player and not self.game_music:
-            arcade.stop_sound(self.music_player)
-            self.music_player = None
-
-    def setup_menu(self):
-        """Инициализация меню"""
-        self.game_state = "MENU"
-        self.menu_background_list.clear()
-        self.intro_player_list.clear()
-        
-        # Сброс параметров
-        self.player_scale = self.initial_scale
-        self.death_count = 0
-        self.coins_collected = 0
-        self.collected_coins = {1: set(), 2: set(), 3: set()}
-        self.current_level = 1
-        self.fade_alpha = 0
-        
-        # Загрузка фона меню
-        if self.preloaded_textures['menu_bg']:
-            bg = arcade.Sprite()
-            bg.texture = self.preloaded_textures['menu_bg']
-            bg.width = SCREEN_WIDTH
-            bg.height = SCREEN_HEIGHT
-            bg.center_x = SCREEN_WIDTH // 2
-            bg.center_y = SCREEN_HEIGHT // 2
-            self.menu_background_list.append(bg)
-        else:
-            self.background_color = arcade.color.BLACK
-        
-        self.start_music()
+        self.mixer.play_music()
 
-    def show_intro(self):
-        """Показать вступительную сцену"""
-        self.game_state = "INTRO"
-        self.intro_time = time.time()
-        self.fade_alpha = 0
-        
-        # Создаем спрайт игрока для интро
-        if self.preloaded_textures['player_right']:
-            player = arcade.Sprite()
-            player.texture = self.preloaded_textures['player_right']
-            player.scale = 0.1
-            player.center_x = SCREEN_WIDTH // 2
-            player.center_y = SCREEN_HEIGHT // 2
-            self.intro_player_list.append(player)
-
-    def show_victory(self):
-        """Показать сцену победы"""
-        self.game_state = "VICTORY"
-        self.victory_time = time.time()
-        self.fade_alpha = 0
-
-    def load_level(self, level_num, reset_coins=False):
-        """Загрузка уровня"""
-        self.game_state = "GAME"
-        self.current_level = level_num
-        
-        # Очистка списков
-        self.background_list.clear()
-        self.back_decor_list.clear()
-        self.player_list.clear()
-        self.platforms_list.clear()
-        self.portal_list.clear()
-        self.spikes_list.clear()
-        self.water_list.clear()
-        self.lilypads_list.clear()
-        self.coins_list.clear()
-        self.end_list.clear()
-
-        # Загрузка фона
-        if level_num in self.preloaded_textures['backgrounds'] and self.preloaded_textures['backgrounds'][level_num]:
-            bg = arcade.Sprite()
-            bg.texture = self.preloaded_textures['backgrounds'][level_num]
-            bg.width = SCREEN_WIDTH
-            bg.height = SCREEN_HEIGHT
-            bg.center_x = SCREEN_WIDTH // 2
-            bg.center_y = SCREEN_HEIGHT // 2
-            self.background_list.append(bg)
-        else:
-            self.background_color = arcade.color.SKY_BLUE
-
-        # Загрузка карты
-        map_path = f"maps/map{level_num}.json"
-        if os.path.exists(map_path):
-            try:
-                layer_options = {
-                    "Platforms": {"use_spatial_hash": True},
-                    "platforms": {"use_spatial_hash": True},
-                    "Spikes": {"use_spatial_hash": True},
-                    "spikes": {"use_spatial_hash": True},
-                    "Back": {"use_spatial_hash": False},
-                    "back": {"use_spatial_hash": False},
-                    "Portal": {"use_spatial_hash": True} if level_num in [1, 2] else {},
-                    "portal": {"use_spatial_hash": True} if level_num in [1, 2] else {},
-                    "Water": {"use_spatial_hash": True} if level_num == 2 else {},
-                    "water": {"use_spatial_hash": True} if level_num == 2 else {},
-                    "End": {"use_spatial_hash": True} if level_num == 3 else {},
-                    "end": {"use_spatial_hash": True} if level_num == 3 else {}
-                }
-                
-                tilemap = arcade.load_tilemap(map_path, scaling=1.0, layer_options=layer_options)
-                
-                for layer in tilemap.sprite_lists:
-                    lower_layer = layer.lower()
-                    if "platform" in lower_layer:
-                        self.platforms_list.extend(tilemap.sprite_lists[layer])
-                    elif "back" in lower_layer:
-                        self.back_decor_list.extend(tilemap.sprite_lists[layer])
-                    elif "spike" in lower_layer:
-                        self.spikes_list.extend(tilemap.sprite_lists[layer])
-                    elif "portal" in lower_layer and level_num in [1, 2]:
-                        self.portal_list.extend(tilemap.sprite_lists[layer])
-                    elif "water" in lower_layer and level_num == 2:
-                        self.water_list.extend(tilemap.sprite_lists[layer])
-                    elif "end" in lower_layer and level_num == 3:
-                        self.end_list.extend(tilemap.sprite_lists[layer])
-            except Exception as e:
-                print(f"Ошибка загрузки карты: {e}")
-
-        # Создание лилий для второго уровня
-        if level_num == 2:
-            self.create_lilypads()
-            
-        # Создание портала на втором уровне
-        if level_num == 2 and not self.portal_list:
-            self.create_portal(1100, 400)
-
-        # Создание монеток
-        self.create_coins(reset_coins)
-
-        # Создание игрока
-        if self.preloaded_textures['player_right']:
-            player = arcade.Sprite()
-            player.texture = self.preloaded_textures['player_right']
-            player.scale = self.player_scale
-            
-            # Стартовые позиции
-            if level_num == 1:
-                player.center_x = 50
-                player.center_y = 130
-            elif level_num == 2:
-                player.center_x = 50
-                player.center_y = 380
-            else:
-                player.center_x = 50
-                player.center_y = 100
-                
-            self.player_list.append(player)
-            self.player_facing_right = True
-        else:
-            player = arcade.SpriteCircle(30, arcade.color.BLUE)
-            player.center_x = 100
-            player.center_y = 400
-            self.player_list.append(player)
-
-        # Физический движок
-        if self.player_list and (self.platforms_list or self.lilypads_list):
-            self.physics_engine = arcade.PhysicsEnginePlatformer(
-                self.player_list[0],
-                platforms=self.platforms_list,
-                gravity_constant=GRAVITY
-            )
-
-    def update_player_texture(self):
-        """Обновление текстуры игрока"""
-        if not self.player_list:
-            return
-            
-        player = self.player_list[0]
-        
-        if self.player_facing_right:
-            if self.preloaded_textures['player_right']:
-                player.texture = self.preloaded_textures['player_right']
-        else:
-            if self.preloaded_textures['player_left']:
-                player.texture = self.preloaded_textures['player_left']
+    def process_events(self):
+        """Реакция звука, частиц и сохранения на события симуляции, смена сцены по ее состоянию"""
+        game_scene = self.scenes.get("GAME")
+        for event in self.sim.pop_events():
+            kind = event[0]
+            game_scene.handle_event(event)
+            if kind in SOUND_EFFECTS:
+                self.mixer.play(kind)
+            if kind in AUTOSAVE_EVENTS:
+                self.autosave()
+            elif kind in ("game_over", "victory"):
+                self.save_writer.clear()
+                self.saved = None
+            elif kind == "menu":
+                self.start_music()
+        if self.sim.game_state == "GAME" and self.sim.tick % AUTOSAVE_TICKS == 0:
+            self.autosave()
+        self.scenes.show(self.sim.game_state)
 
-    def on_draw(self):
-        """Отрисовка игры"""
-        self.clear()
-        
-        if self.game_state == "MENU":
-            self.menu_background_list.draw()
-            
-            # Отрисовка кнопки
-            points = [
-                (self.button_x - self.button_width/2, self.button_y - self.button_height/2),
-                (self.button_x + self.button_width/2, self.button_y - self.button_height/2),
-                (self.button_x + self.button_width/2, self.button_y + self.button_height/2),
-                (self.button_x - self.button_width/2, self.button_y + self.button_height/2)
-            ]
-            
-            rotated_points = []
-            for point in points:
-                x, y = point
-                x -= self.button_x
-                y -= self.button_y
-                new_x = x * math.cos(math.radians(self.button_angle)) - y * math.sin(math.radians(self.button_angle))
-                new_y = x * math.sin(math.radians(self.button_angle)) + y * math.cos(math.radians(self.button_angle))
-                new_x += self.button_x
-                new_y += self.button_y
-                rotated_points.append((new_x, new_y))
-            
-            arcade.draw_polygon_filled(rotated_points, (144, 238, 144, 180))
-            
-            arcade.draw_text(
-                "Играть", self.button_x, self.button_y,
-                arcade.color.WHITE, 40,
-                anchor_x="center", anchor_y="center",
-                bold=True
-            )
-            
-        elif self.game_state == "INTRO":
-            arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT, arcade.color.BLACK)
-            
-            self.intro_player_list.draw()
-            
-            arcade.draw_text(
-                "Я должна собрать рассыпанные амулеты\nи отнести их домой,\nчтобы предотвратить страшное",
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 100,
-                arcade.color.WHITE, 24,
-                anchor_x="center", anchor_y="center",
-                align="center",
-                bold=True
-            )
-            
-            if self.fade_alpha > 0:
-                arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT, (0, 0, 0, self.fade_alpha))
-            
-        elif self.game_state == "GAME":
-            self.background_list.draw()
-            self.back_decor_list.draw()
-            self.spikes_list.draw()
-            
-            if self.current_level == 2:
-                self.water_list.draw()
-                self.lilypads_list.draw()  # Отрисовка кувшинок через стандартный спрайтлист
-            
-            self.portal_list.draw()
-            self.end_list.draw()
-            self.coins_list.draw()
-            self.player_list.draw()
-            self.platforms_list.draw()  # Платформы рисуются поверх всего
-            
-            # Статистика
-            arcade.draw_text(
-                f"Уровень: {self.current_level}", 10, SCREEN_HEIGHT - 30, 
-                arcade.color.WHITE, 16
-            )
-            arcade.draw_text(
-                f"Размер: {self.player_scale:.3f}", 10, SCREEN_HEIGHT - 60, 
-                arcade.color.WHITE, 16
-            )
-            arcade.draw_text(
-                f"Смерти: {self.death_count}/3", 10, SCREEN_HEIGHT - 90, 
-                arcade.color.WHITE, 16
-            )
-            arcade.draw_text(
-                f"Монетки: {len(self.collected_coins[self.current_level])}/{self.total_coins}", 
-                10, SCREEN_HEIGHT - 120, arcade.color.WHITE, 16
-            )
-        
-        elif self.game_state == "VICTORY":
-            arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT, arcade.color.BLACK)
-            
-            arcade.draw_text(
-                "Победа, вы спасли мир!",
-                SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
-                arcade.color.WHITE, 40,
-                anchor_x="center", anchor_y="center",
-                bold=True
-            )
-            
-            if self.fade_alpha > 0:
-                arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT, (0, 0, 0, self.fade_alpha))
+    def can_start(self):
+        """Можно ли начать новую игру: нужны только ресурсы первого уровня"""
+        return self.assets.is_ready(PRIORITY_LEVEL_1)
+
+    def can_continue(self):
+        """Можно ли продолжить: сохранение может быть на любом уровне, поэтому нужны все ресурсы"""
+        return self.saved is not None and self.assets.is_done
+
+    def new_game(self):
+        """Кнопка меню "Играть" или "Новая игра": сохранение стирается"""
+        if self.saved:
+            self.save_writer.clear()
+            self.saved = None
+        # Старт проходит через маску ввода, чтобы попасть в запись
+        self.start_requested = True
+
+    def continue_game(self):
+        """Кнопка меню "Продолжить": продолжение с сохраненного места"""
+        self.saved.restore(self.sim)
+        self.process_events()
+
+    def autosave(self):
+        """Снимок прогресса в фоновую запись"""
+        if not self.recorder:
+            self.save_writer.save(GameSave.capture(self.sim))
+
+    def read_input(self):
+        """Маска ввода для очередного шага симуляции"""
+        input_mask = 0
+        if arcade.key.LEFT in self.held_keys:
+            input_mask |= INPUT_LEFT
+        if arcade.key.RIGHT in self.held_keys:
+            input_mask |= INPUT_RIGHT
+        if self.jump_requested:
+            input_mask |= INPUT_JUMP
+            self.jump_requested = False
+        if self.start_requested:
+            input_mask |= INPUT_START
+            self.start_requested = False
+        return input_mask
 
     def on_update(self, delta_time):
-        """Логика игры"""
-        if self.game_state == "MENU":
-            self.animation_time += delta_time
-            self.button_angle = math.sin(self.animation_time * 2) * 5
-        
-        elif self.game_state == "INTRO":
-            if time.time() - self.intro_time > 3:
-                self.fade_alpha += 2
-                if self.fade_alpha >= 255:
-                    self.load_level(1, reset_coins=True)
-        
-        elif self.game_state == "GAME" and self.player_list:
-            player = self.player_list[0]
-            
-            prev_facing = self.player_facing_right
-            player.change_x = 0
-            
-            if arcade.key.LEFT in self.held_keys:
-                player.change_x = -PLAYER_SPEED
-                self.player_facing_right = False
-            if arcade.key.RIGHT in self.held_keys:
-                player.change_x = PLAYER_SPEED
-                self.player_facing_right = True
-            
-            if prev_facing != self.player_facing_right:
-                self.update_player_texture()
-            
-            if player.left < 0:
-                player.left = 0
-            if player.right > SCREEN_WIDTH:
-                player.right = SCREEN_WIDTH
-            
-            if self.physics_engine:
-                self.physics_engine.update()
-                player.can_jump = self.physics_engine.can_jump()
-            
-            # Обновление кувшинок и проверка стояния на них
-            for lilypad in self.lilypads_list:
-                # Проверяем, стоит ли игрок на кувшинке
-                if (arcade.check_for_collision(player, lilypad) and 
-                    player.change_y == 0 and 
-                    player.bottom <= lilypad.top + 5 and
-                    lilypad.current_state != "disappearing" and
-                    lilypad.current_state != "reappearing"):
-                    
-                    lilypad.stand_time += delta_time
-                else:
-                    lilypad.stand_time = 0
-                    
-                lilypad.update()
-            
-            self.handle_collisions()
-        
-        elif self.game_state == "VICTORY":
-            if time.time() - self.victory_time > 3:
-                self.setup_menu()
-
-    def handle_collisions(self):
-        """Обработка столкновений"""
-        if not self.player_list:
-            return
-            
-        player = self.player_list[0]
-    
-        # Сбор монеток
-        coins_hit = arcade.check_for_collision_with_list(player, self.coins_list)
-        for coin in coins_hit:
-            coin.remove_from_sprite_lists()
-            self.collected_coins[self.current_level].add(coin.index)
-            self.coins_collected += 1
-            
-            if self.death_count > 0:
-                self.death_count -= 1
-            
-            self.player_scale = min(self.player_scale + 0.005, self.max_scale)
-            player.scale = self.player_scale
-            
-            if self.coin_sound:
-                arcade.play_sound(self.coin_sound)
-    
-        # Переход на уровень 2
-        if (self.current_level == 1 and 
-            len(self.collected_coins[1]) == self.total_coins and 
-            self.portal_list and 
-            arcade.check_for_collision_with_list(player, self.portal_list)):
-            self.load_level(2)
-            return
-            
-        # Переход на уровень 3
-        if (self.current_level == 2 and 
-            self.portal_list and 
-            arcade.check_for_collision_with_list(player, self.portal_list)):
-            self.load_level(3)
-            return
-                
-        # Столкновение с опасностями
-        if self.spikes_list and arcade.check_for_collision_with_list(player, self.spikes_list):
-            self.handle_hazard_collision()
-            return
-    
-        if self.current_level == 2 and self.water_list:
-            if arcade.check_for_collision_with_list(player, self.water_list):
-                self.handle_hazard_collision()
-                return
-        
-        # Проверка на завершение уровня
-        if self.current_level == 3 and self.end_list:
-            if arcade.check_for_collision_with_list(player, self.end_list):
-                self.show_victory()
-
-    def handle_hazard_collision(self):
-        """Обработка столкновения с опасностью"""
-        player = self.player_list[0]
-        self.death_count += 1
-        self.player_scale = max(self.player_scale - 0.005, self.min_scale)
-        player.scale = self.player_scale
-        
-        if self.death_count >= 3:
-            self.setup_menu()
-        else:
-            self.load_level(self.current_level, reset_coins=False)
-
-    def on_mouse_press(self, x, y, button, modifiers):
-        """Обработка клика мыши"""
-        if self.game_state == "MENU" and button == arcade.MOUSE_BUTTON_LEFT:
-            half_width = self.button_width / 2
-            half_height = self.button_height / 2
-            
-            rel_x = x - self.button_x
-            rel_y = y - self.button_y
-            
-            angle_rad = -math.radians(self.button_angle)
-            rotated_x = rel_x * math.cos(angle_rad) - rel_y * math.sin(angle_rad)
-            rotated_y = rel_x * math.sin(angle_rad) + rel_y * math.cos(angle_rad)
-            
-            if (-half_width < rotated_x < half_width and 
-                -half_height < rotated_y < half_height):
-                self.show_intro()
+        """Накопление времени и шаги симуляции с фиксированной частотой"""
+        with self.profiler.section("assets"):
+            self.assets.update()
+            self.warm_levels()
+        if not self.startup.done:
+            self.update_startup()
+
+        self.scenes.update(delta_time)
+
+        self.tick_accumulator += delta_time
+        steps = 0
+        while self.tick_accumulator >= TICK_TIME and steps < MAX_CATCHUP_STEPS:
+            input_mask = self.read_input()
+            with self.profiler.section("step"):
+                self.sim.step(input_mask)
+            if self.recorder:
+                self.recorder.record(input_mask, self.sim)
+            with self.profiler.section("events"):
+                self.process_events()
+            self.tick_accumulator -= TICK_TIME
+            steps += 1
+
+        # После долгой паузы не догоняем время, а просто замедляемся
+        if steps == MAX_CATCHUP_STEPS:
+            self.tick_accumulator = min(self.tick_accumulator, TICK_TIME)
+        self.interpolation = min(self.tick_accumulator / TICK_TIME, 1.0)
+
+    def update_startup(self):
+        """Отметки загрузки ресурсов по приоритетам; отчет - когда загружено все и кадр нарисован"""
+        startup = self.startup
+        for name, priority in (("assets_menu", PRIORITY_MENU), ("assets_level_1", PRIORITY_LEVEL_1)):
+            if self.assets.is_ready(priority):
+                startup.mark(name)
+        if self.assets.is_done:
+            startup.mark("assets_all")
+            if "first_frame" in startup.marks:
+                startup.finish(self.assets)
+
+    def warm_levels(self):
+        """Прогрев уровней, разобранных заранее (запекает сцена уровня)"""
+        self.scenes.get("GAME").warm_levels()
+
+    def on_draw(self):
+        """Окончание кадра: сцена уже нарисована, поверх нее профилировщик"""
+        if self.profiler.enabled:
+            if self.profiler_overlay is None:
+                self.profiler_overlay = ProfilerOverlay(self.profiler, 10, SCREEN_HEIGHT - 140)
+            self.default_camera.use()
+            self.profiler_overlay.update()
+            self.profiler_overlay.draw()
+        self.profiler.end_frame()
+        self.startup.mark("first_frame")
 
     def on_key_press(self, key, modifiers):
         """Обработка нажатия клавиш"""
         self.held_keys.add(key)
-        
-        # Прыжок при нажатии SPACE или стрелки вверх
-        if ((key == arcade.key.SPACE or key == arcade.key.UP) and 
-            self.game_state == "GAME" and 
-            self.player_list and 
-            hasattr(self.player_list[0], 'can_jump') and 
-            self.player_list[0].can_jump):
-            
-            self.player_list[0].change_y = JUMP_FORCE
-            self.player_list[0].can_jump = False
-            if self.jump_sound:
-                arcade.play_sound(self.jump_sound)
+
+        if key == arcade.key.F3:
+            self.profiler.toggle()
+
+        # Прыжок при нажатии SPACE или стрелки вверх (выполняется на ближайшем шаге)
+        if key == arcade.key.SPACE or key == arcade.key.UP:
+            self.jump_requested = True
 
     def on_key_release(self, key, modifiers):
         """Обработка отпускания клавиш"""
         if key in self.held_keys:
             self.held_keys.remove(key)
 
+    def on_close(self):
+        """Закрытие окна"""
+        self.assets.shutdown()
+        self.sim.level_cache.shutdown()
+        self.mixer.shutdown()
+        self.scenes.release_all()
+        if self.recorder:
+            self.recorder.save(self.record_path, self.sim)
+        self.save_writer.close()
+        self.profiler.dump()
+        super().on_close()
+
 if __name__ == "__main__":
-    game = MyGame(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
-    arcade.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument("--record", metavar="ФАЙЛ", help="записать ввод для python replay.py")
+    args = parser.parse_args()
+    record_path = os.path.join(LAUNCH_DIR, args.record) if args.record else None
+    game = MyGame(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, record_path)
+    arcade.run()
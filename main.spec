@@ -1,38 +1,108 @@
 # -*- mode: python ; coding: utf-8 -*-
+# Обычная сборка: pyinstaller main.spec
+# Сборка для быстрого запуска: pyinstaller main.spec -- --startup
+# С временем импорта для отчета (python benchmarks/startup_report.py --exe dist/main/main.exe):
+#   pyinstaller main.spec -- --startup --report
+import argparse
 
+parser = argparse.ArgumentParser()
+parser.add_argument("--startup", action="store_true", help="сборка для быстрого запуска")
+parser.add_argument("--report", action="store_true", help="печатать время импорта модулей (-X importtime)")
+options = parser.parse_args()
+
+# Модули, которых нет среди загруженных за всю игру (трасса импорта меню,
+# уровней, победы и оверлея профилировщика). _decimal и _elementtree в трассе
+# есть (их импортируют PIL и pytiled_parser уже при запуске): без них Python
+# взял бы медленные замены на чистом Python, поэтому они остаются.
+STARTUP_EXCLUDES = [
+    "setuptools", "pkg_resources", "_distutils_hack",  # вместе с вендорными пакетами setuptools
+    "ssl", "_ssl",  # и libssl
+    "asyncio", "_asyncio", "_overlapped",
+    "multiprocessing", "_multiprocessing",  # нужен только playtest.py
+    "uuid", "_uuid",
+    "email", "http", "xmlrpc", "unittest", "doctest", "pydoc", "tkinter", "sqlite3",
+]
+
+# Данные arcade, которые игра не открывает: шрифты Kenney и Liberation
+# (текст пишется системным шрифтом), картинки gui и шейдеры эффектов,
+# которых в игре нет
+STARTUP_UNUSED_DATA = (
+    "arcade/resources/system/fonts/",
+    "arcade/resources/system/gui_basic_assets/",
+    "arcade/resources/system/shaders/bloom/",
+    "arcade/resources/system/shaders/gui/",
+    "arcade/resources/system/shaders/lights/",
+    "arcade/resources/system/shaders/postprocessing/",
+    "arcade/resources/system/shaders/shadertoy/",
+)
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[('maps/*.lvl', 'maps')],  # собранные карты (python compile_maps.py)
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=STARTUP_EXCLUDES if options.startup else [],
     noarchive=False,
-    optimize=0,
+    # Байткод без assert и строк документации
+    optimize=2 if options.startup else 0,
 )
+if options.startup:
+    a.datas = [entry for entry in a.datas if not entry[0].replace("\\", "/").startswith(STARTUP_UNUSED_DATA)]
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='main',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=True,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+python_options = [('X importtime', None, 'OPTION')] if options.report else []
+
+if options.startup:
+    # Папка вместо одного файла: при каждом запуске ничего не распаковывается
+    # во временный каталог, а библиотеки не сжаты UPX и грузятся сразу
+    exe = EXE(
+        pyz,
+        a.scripts,
+        python_options,
+        exclude_binaries=True,
+        name='main',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='main',
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        python_options,
+        name='main',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
@@ -0,0 +1,261 @@
+"""Частицы: вспышки при сборе монеток, смерти, падении кувшинок и переходе через портал
+
+Частица после появления больше не трогается из Python: в буфере GPU
+записаны ее начальное положение, скорость, время появления и жизни, а
+положение, размер и цвет в любой момент вершинный шейдер считает из
+времени кадра. Буфер каждого вида заранее выделен на capacity частиц и
+заполняется по кругу (новые вспышки занимают места самых старых), поэтому
+в кадре нет ни обхода частиц, ни выделения памяти, а все частицы вида
+рисуются одним вызовом.
+
+Времена в буфере отсчитываются от эпохи вида, а не от начала игры: float32
+на GPU теряет точность на больших числах, и в долгой игре частицы дрожали
+бы. Эпоха сдвигается, когда живых частиц вида не осталось, и при гашении.
+"""
+import arcade
+import math
+import random
+from array import array
+
+# Виды частиц: сколько в одной вспышке, направление и разброс (градусы),
+# скорость и время жизни (от, до), размер (от, до) и во сколько раз он
+# меняется к концу жизни, цвет в начале и в конце (RGBA), ускорение
+# (пикселей в секунду за секунду), торможение (доля скорости в секунду), смешивание
+PARTICLE_EFFECTS = {
+    "coin": {
+        "count": 24, "direction": 90, "spread": 360, "speed": (60, 180), "life": (0.3, 0.6),
+        "size": (3, 6), "end_scale": 0.2, "start_color": (255, 230, 90, 255), "end_color": (255, 160, 30, 0),
+        "gravity": (0, -120), "drag": 3.0, "blend": "alpha"
+    },
+    "death": {
+        "count": 60, "direction": 90, "spread": 360, "speed": (80, 320), "life": (0.5, 1.0),
+        "size": (4, 9), "end_scale": 0.4, "start_color": (230, 40, 40, 255), "end_color": (120, 20, 20, 0),
+        "gravity": (0, -500), "drag": 1.5, "blend": "alpha"
+    },
+    "lilypad_fall": {
+        "count": 16, "direction": 90, "spread": 140, "speed": (30, 110), "life": (0.6, 1.1),
+        "size": (3, 6), "end_scale": 0.6, "start_color": (90, 190, 70, 255), "end_color": (40, 120, 60, 0),
+        "gravity": (0, -260), "drag": 2.0, "blend": "alpha"
+    },
+    "portal": {
+        "count": 40, "direction": 90, "spread": 360, "speed": (100, 240), "life": (0.4, 0.8),
+        "size": (3, 7), "end_scale": 0.1, "start_color": (200, 140, 255, 255), "end_color": (90, 60, 255, 0),
+        "gravity": (0, 0), "drag": 4.0, "blend": "alpha"
+    }
+}
+PARTICLE_CAPACITY = 2048  # частиц одного вида одновременно
+
+# Запись частицы: положение, скорость, (время появления, время жизни), размер
+PARTICLE_FORMAT = "2f 2f 2f 1f"
+PARTICLE_FLOATS = 7
+PARTICLE_ATTRIBUTES = ["in_origin", "in_velocity", "in_time", "in_size"]
+
+BLEND_FUNCTIONS = {
+    "alpha": (arcade.gl.Context.SRC_ALPHA, arcade.gl.Context.ONE_MINUS_SRC_ALPHA),
+    "add": (arcade.gl.Context.SRC_ALPHA, arcade.gl.Context.ONE)
+}
+
+PARTICLE_VS = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+uniform float time;  // от эпохи вида
+uniform vec2 gravity;
+uniform float drag;
+uniform float end_scale;
+
+in vec2 in_vert;
+in vec2 in_origin;
+in vec2 in_velocity;
+in vec2 in_time;
+in float in_size;
+
+out vec2 v_uv;
+out float v_age;
+
+void main() {
+    float age = time - in_time.x;
+    if (age < 0.0 || age >= in_time.y) {
+        // Частица еще не появилась или уже погасла: вершина за пределами экрана
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+        return;
+    }
+    // Путь с торможением, пропорциональным скорости, плюс постоянное ускорение
+    float travel = drag > 0.0 ? (1.0 - exp(-drag * age)) / drag : age;
+    vec2 position = in_origin + in_velocity * travel + 0.5 * gravity * age * age;
+
+    v_age = age / in_time.y;
+    v_uv = in_vert * 2.0 - 1.0;
+    float size = in_size * mix(1.0, end_scale, v_age);
+    gl_Position = window.projection * window.view * vec4(position + v_uv * size, 0.0, 1.0);
+}
+"""
+
+PARTICLE_FS = """
+#version 330
+
+uniform vec4 start_color;
+uniform vec4 end_color;
+
+in vec2 v_uv;
+in float v_age;
+out vec4 out_color;
+
+void main() {
+    // Круглая частица с мягким краем
+    float edge = 1.0 - smoothstep(0.5, 1.0, length(v_uv));
+    if (edge == 0.0) {
+        discard;
+    }
+    vec4 color = mix(start_color, end_color, v_age);
+    out_color = vec4(color.rgb, color.a * edge);
+}
+"""
+
+class ParticleEmitter:
+    """Частицы одного вида: круговой буфер на capacity частиц и шейдер с параметрами вида"""
+    def __init__(self, ctx, quad, effect, capacity=PARTICLE_CAPACITY):
+        self.ctx = ctx
+        self.effect = effect
+        self.capacity = capacity
+        self.data = array("f", bytes(capacity * PARTICLE_FLOATS * 4))
+        self.head = 0  # место следующей частицы
+        self.used = 0  # мест, в которые писали с начала эпохи (рисуются только они)
+        self.dirty = None  # (первое, последнее) место, которое нужно выгрузить
+        self.alive_until = -math.inf  # после этого времени живых частиц нет
+        self.epoch = 0.0  # от этого времени отсчитываются времена в буфере
+
+        # Пустые места помечены погасшими (жизнь 0)
+        self.buffer = ctx.buffer(data=self.data)
+        self.geometry = ctx.geometry(
+            [
+                arcade.gl.BufferDescription(quad, "2f", ["in_vert"]),
+                arcade.gl.BufferDescription(self.buffer, PARTICLE_FORMAT, PARTICLE_ATTRIBUTES, instanced=True)
+            ],
+            mode=ctx.TRIANGLE_STRIP
+        )
+        self.program = ctx.program(vertex_shader=PARTICLE_VS, fragment_shader=PARTICLE_FS)
+        self.program["gravity"] = effect["gravity"]
+        self.program["drag"] = effect["drag"]
+        self.program["end_scale"] = effect["end_scale"]
+        self.program["start_color"] = tuple(channel / 255 for channel in effect["start_color"])
+        self.program["end_color"] = tuple(channel / 255 for channel in effect["end_color"])
+        self.blend = BLEND_FUNCTIONS[effect["blend"]]
+
+    def memory_size(self):
+        return self.buffer.size
+
+    def delete(self):
+        self.geometry = None
+        self.buffer.delete()
+        self.program.delete()
+
+    def clear(self, time):
+        """Гашение всех частиц (смена уровня) и новая эпоха с time; буфер не переписывается
+
+        Рисуются только места, записанные в новой эпохе, а буфер с нее
+        заполняется с начала, поэтому старые записи не видны.
+        """
+        self.head = 0
+        self.used = 0
+        self.dirty = None
+        self.alive_until = -math.inf
+        self.epoch = time
+
+    def emit(self, x, y, time):
+        """Вспышка в точке (x, y); time - время появления в секундах"""
+        if time >= self.alive_until:
+            # Живых частиц нет: время снова отсчитывается от нуля
+            self.clear(time)
+        effect = self.effect
+        data = self.data
+        capacity = self.capacity
+        count = min(effect["count"], capacity)
+        direction = math.radians(effect["direction"])
+        spread = math.radians(effect["spread"])
+        min_speed, max_speed = effect["speed"]
+        min_life, max_life = effect["life"]
+        min_size, max_size = effect["size"]
+        uniform = random.uniform
+
+        spawn_time = time - self.epoch
+        head = self.head
+        for _ in range(count):
+            angle = direction + uniform(-0.5, 0.5) * spread
+            speed = uniform(min_speed, max_speed)
+            start = head * PARTICLE_FLOATS
+            data[start] = x
+            data[start + 1] = y
+            data[start + 2] = math.cos(angle) * speed
+            data[start + 3] = math.sin(angle) * speed
+            data[start + 4] = spawn_time
+            data[start + 5] = uniform(min_life, max_life)
+            data[start + 6] = uniform(min_size, max_size)
+            head = (head + 1) % capacity
+
+        # Выгрузка одним куском; если вспышка перешла через конец буфера - весь буфер
+        first = self.head
+        last = (head - 1) % capacity
+        if last < first:
+            first, last = 0, capacity - 1
+        if self.dirty:
+            first, last = min(first, self.dirty[0]), max(last, self.dirty[1])
+        self.dirty = (first, last)
+        self.head = head
+        self.used = min(self.used + count, capacity)
+        self.alive_until = max(self.alive_until, time + max_life)
+
+    def draw(self, time):
+        """Отрисовка живых частиц в текущую камеру одним вызовом"""
+        if time >= self.alive_until:
+            return
+        if self.dirty:
+            first, last = self.dirty
+            self.buffer.write(
+                memoryview(self.data)[first * PARTICLE_FLOATS:(last + 1) * PARTICLE_FLOATS],
+                offset=first * PARTICLE_FLOATS * 4
+            )
+            self.dirty = None
+
+        ctx = self.ctx
+        self.program["time"] = time - self.epoch
+        ctx.enable(ctx.BLEND)
+        ctx.blend_func = self.blend
+        self.geometry.render(self.program, instances=self.used)
+        ctx.blend_func = ctx.BLEND_DEFAULT
+
+class Particles:
+    """Все виды частиц сцены: вид -> ParticleEmitter"""
+    def __init__(self, ctx, effects=PARTICLE_EFFECTS, capacity=PARTICLE_CAPACITY):
+        self.quad = ctx.buffer(data=array("f", [0, 0, 1, 0, 0, 1, 1, 1]))
+        self.emitters = {
+            name: ParticleEmitter(ctx, self.quad, effect, capacity)
+            for name, effect in effects.items()
+        }
+
+    def __contains__(self, name):
+        return name in self.emitters
+
+    def emit(self, name, x, y, time):
+        self.emitters[name].emit(x, y, time)
+
+    def clear(self, time):
+        for emitter in self.emitters.values():
+            emitter.clear(time)
+
+    def memory_size(self):
+        return sum(emitter.memory_size() for emitter in self.emitters.values())
+
+    def delete(self):
+        for emitter in self.emitters.values():
+            emitter.delete()
+        self.emitters = {}
+        self.quad.delete()
+
+    def draw(self, time):
+        for emitter in self.emitters.values():
+            emitter.draw(time)
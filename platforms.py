@@ -0,0 +1,124 @@
+"""Платформы с таймерами (кувшинки): покачиваются, если на них стоять,
+потом исчезают и появляются снова
+
+Состояние всех платформ уровня лежит в параллельных массивах, таймеры
+считаются шагами симуляции, поэтому пауза их не двигает, а повтор
+ввода дает тот же результат.
+"""
+import math
+from array import array
+
+# Состояния платформы
+PLATFORM_NORMAL = 0
+PLATFORM_SHAKING = 1
+PLATFORM_DISAPPEARING = 2
+PLATFORM_REAPPEARING = 3
+
+SHAKE_FREQUENCY = 10  # радиан в секунду
+SHAKE_AMPLITUDE = 3  # пикселей
+
+class TimedPlatforms:
+    """Платформы одного вида
+
+    shake_after и fall_after - сколько секунд стоять на платформе до начала
+    покачивания и до исчезновения, fade_time - длительность исчезновения
+    и появления.
+    """
+    def __init__(self, tick_rate, shake_after=1.0, fall_after=2.0, fade_time=1.0):
+        self.tick_time = 1 / tick_rate
+        self.shake_ticks = round(shake_after * tick_rate)
+        self.fall_ticks = round(fall_after * tick_rate)
+        self.fade_ticks = round(fade_time * tick_rate)
+        self.clear()
+
+    def clear(self):
+        self.sprites = []
+        self.slots = {}  # спрайт -> номер
+        self.states = array("B")
+        self.stand = array("I")  # шагов подряд, которые на платформе стоят
+        self.timers = array("I")  # шагов в текущем состоянии исчезновения/появления
+        self.born = array("I")  # шаг создания (от него считается фаза покачивания)
+        self.original_y = array("f")
+        self.tick = 0
+        self.active = set()  # номера платформ не в состоянии NORMAL
+        self.standing = set()  # номера платформ, на которых стояли на прошлом шаге
+        self.fallen = []  # платформы, которые начали исчезать на последнем шаге
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def add(self, sprite):
+        self.slots[sprite] = len(self.sprites)
+        self.sprites.append(sprite)
+        self.states.append(PLATFORM_NORMAL)
+        self.stand.append(0)
+        self.timers.append(0)
+        self.born.append(self.tick)
+        self.original_y.append(sprite.center_y)
+
+    def is_solid(self, sprite):
+        """Можно ли на платформе стоять (не исчезает и не появляется)"""
+        return self.states[self.slots[sprite]] <= PLATFORM_SHAKING
+
+    def step(self, standing):
+        """Шаг платформ; standing - спрайты, на которых стоит игрок
+
+        Обходятся только платформы, на которых стоят или стояли на прошлом
+        шаге, и те, что трясутся, исчезают или появляются: у остальных
+        (NORMAL, никто не стоит) за шаг ничего не меняется.
+
+        Возвращает число платформ, которые на этом шаге начали трястись;
+        начавшие исчезать остаются в fallen до следующего шага.
+        """
+        sprites, states, stand, timers = self.sprites, self.states, self.stand, self.timers
+        active = self.active
+        standing_slots = {self.slots[sprite] for sprite in standing}
+        fade_ticks = self.fade_ticks
+        started = 0
+        self.fallen.clear()
+        self.tick += 1
+
+        # По порядку номеров, чтобы fallen и события не зависели от порядка множеств
+        for i in sorted(standing_slots | self.standing | active):
+            sprite = sprites[i]
+            stand[i] = stand[i] + 1 if i in standing_slots else 0
+            state = states[i]
+            if state == PLATFORM_NORMAL:
+                if stand[i] >= self.shake_ticks:
+                    states[i] = state = PLATFORM_SHAKING
+                    active.add(i)
+                    started += 1
+                else:
+                    continue
+
+            if state == PLATFORM_SHAKING:
+                if stand[i] >= self.fall_ticks:
+                    states[i] = PLATFORM_DISAPPEARING
+                    timers[i] = 0
+                    self.fallen.append(sprite)
+                else:
+                    sprite.center_y = self.original_y[i] + math.sin(
+                        (self.tick - self.born[i]) * self.tick_time * SHAKE_FREQUENCY
+                    ) * SHAKE_AMPLITUDE
+                continue
+
+            timers[i] += 1
+            if state == PLATFORM_DISAPPEARING:
+                if timers[i] >= fade_ticks:
+                    states[i] = PLATFORM_REAPPEARING
+                    timers[i] = 0
+                    stand[i] = 0
+                    sprite.alpha = 0
+                else:
+                    sprite.alpha = int(255 * (1 - timers[i] / fade_ticks))
+            else:
+                if timers[i] >= fade_ticks:
+                    states[i] = PLATFORM_NORMAL
+                    active.discard(i)
+                    sprite.alpha = 255
+                    sprite.center_y = self.original_y[i]
+                else:
+                    sprite.alpha = int(255 * timers[i] / fade_ticks)
+
+        self.standing = standing_slots
+        return started
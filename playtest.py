@@ -0,0 +1,278 @@
+"""Автоматическое прохождение уровней ботами
+
+Боты играют через ту же GameSimulation, что и окно (load_level, физика,
+кувшинки, столкновения), но без отрисовки, и каждый прогон идет в своем
+процессе пула. Для каждого уровня считается, как часто его удается пройти
+и за сколько, где игроки гибнут (шипы, вода, опасные зоны) и какие
+монетки вообще достижимы.
+
+Политики:
+  random - случайный игрок: держит направление случайное время и прыгает
+  search - поиск: запоминает, каким вводом быстрее всего достигается каждая
+           клетка карты (с учетом собранных монеток), и продолжает случайными
+           попытками из редко выбранных клеток, пока не пройдет уровень
+
+Запуск: python playtest.py [--levels 1 2] [--runs 32] [--policy search] [--out playtest.json]
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+LAUNCH_DIR = os.getcwd()
+
+RUNS = 32  # прогонов на уровень
+MAX_SECONDS = 120  # прогон случайного игрока длится не больше стольких секунд игры
+SEARCH_BUDGET = 150000  # шагов симуляции на один прогон поиска
+SEARCH_HORIZON = 180  # шагов случайной игры в попытке после повтора найденного ввода
+SEARCH_CELL = 32  # сторона клетки карты в поиске, пиксели
+SEARCH_COIN_WEIGHT = 4  # во сколько раз вероятнее продолжать из клетки с еще одной монеткой
+JUMP_CHANCE = 0.06  # вероятность нажать прыжок на шаге
+HEATMAP_CELL = 64  # сторона клетки карты смертей в пикселях
+HEATMAP_TOP = 5  # сколько самых смертельных мест печатать
+
+sim = None  # симуляция процесса пула
+
+def init_worker():
+    """Создание симуляции в процессе пула (окна и OpenGL нет)"""
+    global sim
+    os.environ["ARCADE_HEADLESS"] = "1"
+    os.chdir(ROOT_DIR)
+    sys.path.insert(0, ROOT_DIR)
+    from simulation import GameSimulation
+    sim = GameSimulation()
+
+class RandomPolicy:
+    """Случайный игрок: чаще идет вправо, иногда стоит или идет назад"""
+    def __init__(self, rng):
+        from simulation import INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP
+        self.rng = rng
+        self.moves = (INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP)
+        self.direction = 0
+        self.hold = 0
+
+    def __call__(self):
+        left, right, jump = self.moves
+        rng = self.rng
+        if self.hold <= 0:
+            roll = rng.random()
+            self.direction = right if roll < 0.6 else left if roll < 0.85 else 0
+            self.hold = rng.randint(5, 40)
+        self.hold -= 1
+        input_mask = self.direction
+        if rng.random() < JUMP_CHANCE:
+            input_mask |= jump
+        return input_mask
+
+class Attempt:
+    """Итог одной попытки: исход, шагов, смерти (причина, x, y), собранные монетки"""
+    def __init__(self):
+        self.outcome = None  # "done", "game_over" или None (вышло время)
+        self.ticks = 0
+        self.deaths = []
+        self.coins = set()
+
+def play(level_num, inputs, policy, max_ticks, stop_on_death=False, archive=None):
+    """Прогон уровня с начала: сначала ввод inputs, дальше policy (ее маски дописываются в inputs)
+
+    archive (клетка -> [ввод, сколько раз выбрана]) пополняется кратчайшим
+    вводом для каждой клетки, где побывал игрок.
+    """
+    # Каждый прогон - как новая игра: смерти и уменьшение героини прошлых прогонов не переносятся
+    sim.setup_menu()
+    sim.load_level(level_num, reset_coins=True)
+    sim.pop_events()
+    player = sim.player_list[0]
+    attempt = Attempt()
+
+    for tick in range(max_ticks):
+        if tick < len(inputs):
+            input_mask = inputs[tick]
+        else:
+            input_mask = policy()
+            inputs.append(input_mask)
+        sim.step(input_mask)
+        attempt.ticks = tick + 1
+
+        for event in sim.pop_events():
+            kind = event[0]
+            if kind == "coin":
+                attempt.coins.add(event[1])
+            elif kind == "death":
+                attempt.deaths.append(event[1:])
+                if stop_on_death:
+                    attempt.outcome = "death"
+            elif kind == "victory" or (kind == "level" and event[1] != level_num):
+                attempt.outcome = "done"
+            elif kind == "game_over":
+                attempt.outcome = "game_over"
+        if attempt.outcome:
+            break
+
+        if archive is not None:
+            cell = (
+                tuple(sorted(attempt.coins)),
+                int(player.center_x // SEARCH_CELL), int(player.center_y // SEARCH_CELL)
+            )
+            known = archive.get(cell)
+            if known is None or len(known[0]) > tick + 1:
+                archive[cell] = [inputs[:tick + 1], known[1] if known else 0]
+    return attempt
+
+def random_run(level_num, rng, max_ticks):
+    attempt = play(level_num, [], RandomPolicy(rng), max_ticks)
+    return attempt.outcome == "done", attempt.ticks, attempt.deaths, attempt.coins, 1
+
+def choose_cell(archive, rng):
+    """Клетка, из которой продолжать: больше монеток и реже выбиралась - вероятнее"""
+    cells = list(archive.values())
+    weights = [SEARCH_COIN_WEIGHT ** len(coins) / math.sqrt(1 + chosen) for (coins, _, _), (_, chosen) in archive.items()]
+    known = rng.choices(cells, weights)[0]
+    known[1] += 1
+    return known[0]
+
+def search_run(level_num, rng, max_ticks, budget=SEARCH_BUDGET):
+    """Поиск прохождения: попытка повторяет ввод до выбранной клетки и продолжает случайно"""
+    archive = {}
+    deaths = []
+    coins = set()
+    spent = attempts = 0
+    while spent < budget:
+        attempts += 1
+        inputs = list(choose_cell(archive, rng)) if archive else []
+        horizon = min(len(inputs) + SEARCH_HORIZON, max_ticks)
+        attempt = play(level_num, inputs, RandomPolicy(rng), horizon, stop_on_death=True, archive=archive)
+        spent += attempt.ticks
+        deaths += attempt.deaths
+        coins |= attempt.coins
+        if attempt.outcome == "done":
+            return True, attempt.ticks, deaths, coins, attempts
+    return False, 0, deaths, coins, attempts
+
+def run_task(task):
+    """Один прогон в процессе пула; результат - простые данные для передачи обратно"""
+    level_num, policy, seed, max_ticks = task
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    if policy == "search":
+        completed, ticks, deaths, coins, attempts = search_run(level_num, rng, max_ticks)
+    else:
+        completed, ticks, deaths, coins, attempts = random_run(level_num, rng, max_ticks)
+    return {
+        "level": level_num,
+        "completed": completed,
+        "ticks": ticks,
+        "deaths": deaths,
+        "coins": sorted(coins),
+        "attempts": attempts,
+        "total_coins": len(sim.level_cache.get(level_num).entities["coin"]),
+        "elapsed": time.perf_counter() - start
+    }
+
+def summarize(level_num, runs, tick_rate, coin_count):
+    """Сводка прогонов уровня"""
+    completed = [run["ticks"] / tick_rate for run in runs if run["completed"]]
+    causes = Counter(cause for run in runs for cause, _, _ in run["deaths"])
+    heatmap = defaultdict(Counter)
+    for run in runs:
+        for cause, x, y in run["deaths"]:
+            cell = (int(x // HEATMAP_CELL) * HEATMAP_CELL, int(y // HEATMAP_CELL) * HEATMAP_CELL)
+            heatmap[cause][cell] += 1
+    coin_runs = Counter(coin for run in runs for coin in run["coins"])
+    return {
+        "runs": len(runs),
+        "completed": len(completed),
+        "completion_rate": len(completed) / len(runs) if runs else 0,
+        "time_to_complete": {
+            "min": min(completed),
+            "median": statistics.median(completed),
+            "max": max(completed)
+        } if completed else None,
+        "attempts": sum(run["attempts"] for run in runs),
+        "deaths": dict(causes),
+        "death_heatmap": {
+            cause: [[x, y, count] for (x, y), count in cells.most_common()]
+            for cause, cells in heatmap.items()
+        },
+        "coins": {str(coin): coin_runs[coin] / len(runs) for coin in range(coin_count)},
+        "unreachable_coins": [coin for coin in range(coin_count) if not coin_runs[coin]]
+    }
+
+def print_summary(level_num, summary):
+    rate = summary["completion_rate"] * 100
+    line = f"Уровень {level_num}: пройден в {summary['completed']}/{summary['runs']} прогонов ({rate:.0f}%)"
+    if summary["time_to_complete"]:
+        times = summary["time_to_complete"]
+        line += f", время {times['min']:.1f} / {times['median']:.1f} / {times['max']:.1f} с (мин/медиана/макс)"
+    print(line)
+
+    deaths = ", ".join(f"{cause} {count}" for cause, count in sorted(summary["deaths"].items()))
+    print(f"  смертей: {sum(summary['deaths'].values())}" + (f" ({deaths})" if deaths else ""))
+    for cause, cells in sorted(summary["death_heatmap"].items()):
+        places = ", ".join(f"({x}, {y}) x{count}" for x, y, count in cells[:HEATMAP_TOP])
+        print(f"  {cause}: {places}")
+
+    coins = summary["coins"]
+    reached = len(coins) - len(summary["unreachable_coins"])
+    rates = ", ".join(f"{coin}: {share * 100:.0f}%" for coin, share in coins.items())
+    print(f"  монетки: достижимы {reached}/{len(coins)}" + (f" ({rates})" if rates else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description="Автоматическое прохождение уровней ботами")
+    parser.add_argument("--levels", type=int, nargs="*", help="номера уровней (по умолчанию все)")
+    parser.add_argument("--runs", type=int, default=RUNS, help="прогонов на уровень")
+    parser.add_argument("--policy", choices=("random", "search"), default="random", help="как играет бот")
+    parser.add_argument("--seconds", type=float, default=MAX_SECONDS, help="предел времени игры на прогон")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="процессов в пуле")
+    parser.add_argument("--seed", type=int, default=0, help="начальное зерно случайности")
+    parser.add_argument("--out", help="записать сводку в JSON")
+    args = parser.parse_args()
+
+    out_path = os.path.join(LAUNCH_DIR, args.out) if args.out else None
+    os.environ["ARCADE_HEADLESS"] = "1"
+    os.chdir(ROOT_DIR)
+    from simulation import TICK_RATE, find_levels
+
+    levels = args.levels or find_levels()
+    max_ticks = int(args.seconds * TICK_RATE)
+    tasks = [
+        (level_num, args.policy, args.seed * 1000003 + level_num * 10007 + run, max_ticks)
+        for level_num in levels for run in range(args.runs)
+    ]
+
+    # Процессы запускаются заново (spawn): в них не попадают потоки и состояние OpenGL родителя
+    start = time.perf_counter()
+    results = defaultdict(list)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.workers, initializer=init_worker) as pool:
+        for done, result in enumerate(pool.imap_unordered(run_task, tasks), 1):
+            results[result["level"]].append(result)
+            print(f"\rпрогонов: {done}/{len(tasks)}", end="", flush=True)
+    elapsed = time.perf_counter() - start
+    cpu_time = sum(run["elapsed"] for runs in results.values() for run in runs)
+    print(f"\r{len(tasks)} прогонов за {elapsed:.1f} с, {args.workers} процессов "
+          f"(время прогонов {cpu_time:.1f} с, ускорение x{cpu_time / elapsed:.1f})\n")
+
+    report = {"policy": args.policy, "runs": args.runs, "seconds": args.seconds, "levels": {}}
+    for level_num in levels:
+        runs = results[level_num]
+        coin_count = max((run["total_coins"] for run in runs), default=0)
+        summary = summarize(level_num, runs, TICK_RATE, coin_count)
+        report["levels"][str(level_num)] = summary
+        print_summary(level_num, summary)
+
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=1, ensure_ascii=False)
+        print(f"\nСводка: {out_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Профилировщик кадров: время фаз обновления и отрисовки
+
+Включается клавишей F3 или переменной окружения GAME_PROFILE (ее значение -
+файл, в который при выходе пишется покадровая трасса: .csv или .json).
+Пока профилировщик выключен, section() возвращает пустой контекст и
+почти ничего не стоит.
+
+Время отрисовки - это время процессора на отправку команд, а не работы GPU.
+"""
+import arcade
+import csv
+import json
+import os
+import pyglet
+from collections import deque
+from time import perf_counter
+
+PROFILE_ENV = "GAME_PROFILE"
+PROFILE_DEFAULT_PATH = "profile.csv"  # если профилировщик включен клавишей
+PROFILE_WINDOW = 600  # кадров в скользящем окне для перцентилей
+PROFILE_TRACE_FRAMES = 36000  # кадров в трассе (10 минут при 60 к/с)
+PROFILE_OVERLAY_REFRESH = 30  # кадров между обновлениями оверлея
+PROFILE_OVERLAY_LINES = 8  # самые дорогие фазы в оверлее
+PERCENTILES = (50, 95, 99)
+
+class NullSection:
+    """Контекст выключенного профилировщика"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SECTION = NullSection()
+
+class Section:
+    """Замер одной фазы; время фазы за кадр суммируется (шагов симуляции бывает несколько)"""
+    __slots__ = ("times", "name", "start")
+
+    def __init__(self, times, name):
+        self.times = times
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        times = self.times
+        times[self.name] = times.get(self.name, 0) + perf_counter() - self.start
+        return False
+
+def percentile(values, percent):
+    """Перцентиль по отсортированному списку (ближайший ранг)"""
+    if not values:
+        return 0
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+class FrameProfiler:
+    """Покадровые замеры фаз, скользящие перцентили и трасса для выгрузки"""
+    def __init__(self, enabled=False, trace_path=None):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.times = {}  # фаза -> секунды в текущем кадре
+        self.sections = {}
+        self.window = deque(maxlen=PROFILE_WINDOW)
+        self.trace = deque(maxlen=PROFILE_TRACE_FRAMES)
+        self.frame = 0
+        self.frame_start = None
+
+    @classmethod
+    def from_environment(cls):
+        trace_path = os.environ.get(PROFILE_ENV) or None
+        return cls(enabled=trace_path is not None, trace_path=trace_path)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.times.clear()
+        self.frame_start = None
+
+    def section(self, name):
+        """Контекст замера фазы: with profiler.section("physics"): ..."""
+        if not self.enabled:
+            return NULL_SECTION
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = Section(self.times, name)
+        return section
+
+    def end_frame(self):
+        """Закрытие кадра: время от прошлого вызова и замеры фаз уходят в окно и трассу"""
+        if not self.enabled:
+            return
+        now = perf_counter()
+        if self.frame_start is not None:
+            record = {name: seconds * 1000 for name, seconds in self.times.items()}
+            record["frame"] = (now - self.frame_start) * 1000
+            self.window.append(record)
+            self.trace.append((self.frame, record))
+            self.frame += 1
+        self.frame_start = now
+        self.times.clear()
+
+    def stats(self):
+        """Перцентили по фазам за окно: фаза -> (p50, p95, p99) в миллисекундах"""
+        values = {}
+        for record in self.window:
+            for name, ms in record.items():
+                values.setdefault(name, []).append(ms)
+        result = {}
+        for name, samples in values.items():
+            # Кадры, в которых фазы не было, считаются нулевыми
+            samples.extend([0] * (len(self.window) - len(samples)))
+            samples.sort()
+            result[name] = tuple(percentile(samples, p) for p in PERCENTILES)
+        return result
+
+    def dump(self, path=None):
+        """Выгрузка трассы: CSV (фаза - столбец) или JSON (список кадров)"""
+        path = path or self.trace_path or PROFILE_DEFAULT_PATH
+        if not self.trace:
+            return
+        names = sorted({name for _, record in self.trace for name in record} - {"frame"})
+        try:
+            with open(path, "w", encoding="utf-8", newline="") as file:
+                if path.endswith(".json"):
+                    json.dump([dict(record, index=index) for index, record in self.trace], file)
+                else:
+                    writer = csv.writer(file)
+                    writer.writerow(["index", "frame"] + names)
+                    for index, record in self.trace:
+                        writer.writerow(
+                            [index, f"{record['frame']:.3f}"] +
+                            [f"{record.get(name, 0):.3f}" for name in names]
+                        )
+        except OSError as e:
+            print(f"Ошибка записи профиля {path}: {e}")
+
+class ProfilerOverlay:
+    """Оверлей с перцентилями кадра и самых дорогих фаз"""
+    def __init__(self, profiler, x, top):
+        self.profiler = profiler
+        self.batch = pyglet.graphics.Batch()
+        self.lines = [
+            arcade.Text("", x, top - 18 * (i + 1), arcade.color.YELLOW, 12, font_name="monospace", batch=self.batch)
+            for i in range(PROFILE_OVERLAY_LINES + 1)
+        ]
+
+    def update(self):
+        if self.profiler.frame % PROFILE_OVERLAY_REFRESH:
+            return
+        stats = self.profiler.stats()
+        frame = stats.pop("frame", (0, 0, 0))
+        header = "кадр мс p50/p95/p99: {:.1f} / {:.1f} / {:.1f}".format(*frame)
+        phases = sorted(stats.items(), key=lambda item: item[1][1], reverse=True)
+        texts = [header] + [
+            "{:<14} {:6.2f} {:6.2f} {:6.2f}".format(name, *values)
+            for name, values in phases[:PROFILE_OVERLAY_LINES]
+        ]
+        for i, line in enumerate(self.lines):
+            line.text = texts[i] if i < len(texts) else ""
+
+    def draw(self):
+        self.batch.draw()
@@ -0,0 +1,145 @@
+"""Запись и повтор ввода
+
+Файл повтора хранит маски ввода по шагам симуляции (сериями одинаковых
+масок) и контрольные хеши состояния. Повтор прогоняет ввод через новую
+GameSimulation без отрисовки и сверяет хеши, поэтому записи игроков
+служат и регрессионным тестом, и замером скорости симуляции.
+
+Запись: python main.py --record запись.rpl
+Повтор: python replay.py запись.rpl [...]
+"""
+import hashlib
+import os
+import struct
+import sys
+import time
+from array import array
+
+REPLAY_MAGIC = b"RPL1"
+REPLAY_VERSION = 1
+REPLAY_CHECKPOINT_TICKS = 600  # хеш состояния каждые 10 секунд игры
+
+# magic, версия, шагов в секунду, всего шагов, серий ввода, контрольных точек
+REPLAY_HEADER = struct.Struct("<4sHHIII")
+REPLAY_RUN = struct.Struct("<BH")  # маска, сколько шагов подряд
+REPLAY_CHECKPOINT = struct.Struct("<I8s")  # шаг, хеш состояния
+
+GAME_STATES = ("MENU", "INTRO", "GAME", "VICTORY")
+
+def state_hash(sim):
+    """Хеш состояния, которое должно совпасть при повторе: уровень,
+    положение игрока, монетки, смерти"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(struct.pack(
+        "<IBHHHd", sim.tick, GAME_STATES.index(sim.game_state), sim.current_level,
+        sim.death_count, sim.coins_collected, sim.player_scale
+    ))
+    if sim.player_list:
+        player = sim.player_list[0]
+        digest.update(struct.pack("<dddd", player.center_x, player.center_y, player.change_x, player.change_y))
+    for level in sorted(sim.collected_coins):
+        coins = sorted(sim.collected_coins[level])
+        if not coins:
+            continue
+        digest.update(struct.pack(f"<HH{len(coins)}H", level, len(coins), *coins))
+    return digest.digest()
+
+class ReplayRecorder:
+    """Запись ввода, поданного в симуляцию с самого ее создания"""
+    def __init__(self, tick_rate):
+        self.tick_rate = tick_rate
+        self.runs = []  # [маска, шагов]
+        self.checkpoints = []
+        self.ticks = 0
+
+    def record(self, input_mask, sim):
+        """Вызывается после каждого sim.step(input_mask)"""
+        if self.runs and self.runs[-1][0] == input_mask and self.runs[-1][1] < 0xFFFF:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([input_mask, 1])
+        self.ticks += 1
+        if self.ticks % REPLAY_CHECKPOINT_TICKS == 0:
+            self.checkpoints.append((self.ticks, state_hash(sim)))
+
+    def save(self, path, sim):
+        """Сохранение записи с хешем конечного состояния"""
+        checkpoints = list(self.checkpoints)
+        if not checkpoints or checkpoints[-1][0] != self.ticks:
+            checkpoints.append((self.ticks, state_hash(sim)))
+
+        data = bytearray(REPLAY_HEADER.pack(
+            REPLAY_MAGIC, REPLAY_VERSION, self.tick_rate, self.ticks, len(self.runs), len(checkpoints)
+        ))
+        for input_mask, count in self.runs:
+            data += REPLAY_RUN.pack(input_mask, count)
+        for tick, digest in checkpoints:
+            data += REPLAY_CHECKPOINT.pack(tick, digest)
+
+        try:
+            with open(path, "wb") as file:
+                file.write(data)
+        except OSError as e:
+            print(f"Ошибка сохранения повтора {path}: {e}")
+
+class Replay:
+    """Прочитанная запись: маски ввода по шагам и контрольные хеши"""
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            data = file.read()
+
+        magic, version, self.tick_rate, ticks, run_count, checkpoint_count = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path}: не файл повтора версии {REPLAY_VERSION}")
+
+        self.inputs = array("B")
+        offset = REPLAY_HEADER.size
+        for input_mask, count in REPLAY_RUN.iter_unpack(data[offset:offset + run_count * REPLAY_RUN.size]):
+            self.inputs.extend([input_mask] * count)
+        offset += run_count * REPLAY_RUN.size
+        self.checkpoints = dict(
+            REPLAY_CHECKPOINT.iter_unpack(data[offset:offset + checkpoint_count * REPLAY_CHECKPOINT.size])
+        )
+        if len(self.inputs) != ticks:
+            raise ValueError(f"{path}: записано {len(self.inputs)} шагов вместо {ticks}")
+
+    def play(self, sim):
+        """Прогон ввода через симуляцию; возвращает шаги, на которых хеш не совпал"""
+        mismatches = []
+        checkpoints = self.checkpoints
+        for input_mask in self.inputs:
+            sim.step(input_mask)
+            if sim.tick in checkpoints and state_hash(sim) != checkpoints[sim.tick]:
+                mismatches.append(sim.tick)
+        return mismatches
+
+def play_replay(path):
+    """Повтор одной записи с замером времени; True, если состояние совпало"""
+    from simulation import GameSimulation, TICK_RATE
+
+    try:
+        replay = Replay(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Ошибка чтения повтора {path}: {e}")
+        return False
+    if replay.tick_rate != TICK_RATE:
+        print(f"{path}: записан при {replay.tick_rate} шагах в секунду, а игра делает {TICK_RATE}")
+        return False
+
+    sim = GameSimulation()
+    start = time.perf_counter()
+    mismatches = replay.play(sim)
+    elapsed = time.perf_counter() - start
+
+    ticks = len(replay.inputs)
+    speed = ticks / elapsed if elapsed else 0
+    status = "OK" if not mismatches else f"расхождение с шага {mismatches[0]}"
+    print(f"{path}: {ticks} шагов за {elapsed:.2f} с ({speed:.0f} шагов/с, "
+          f"{elapsed / max(ticks, 1) * 1000:.3f} мс/шаг) - {status}")
+    return not mismatches
+
+if __name__ == "__main__":
+    paths = [os.path.abspath(path) for path in sys.argv[1:]]
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    results = [play_replay(path) for path in paths]
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,239 @@
+"""Сохранение прогресса
+
+Файл сохранения - журнал записей: полный снимок состояния, за которым
+идут разностные записи (только изменившиеся поля и новые монетки).
+Каждая запись защищена crc32, поэтому недописанный хвост просто
+отбрасывается при чтении. Полный снимок пишется во временный файл и
+атомарно подменяет старый, разностные дописываются в конец; и то и
+другое делает фоновый поток, игра на диске не ждет.
+"""
+import os
+import queue
+import struct
+import threading
+import zlib
+from collections import defaultdict
+
+SAVE_MAGIC = b"SAV1"
+SAVE_VERSION = 1
+SAVE_COMPACT_RECORDS = 256  # после стольких разностных записей пишется полный снимок
+
+SAVE_HEADER = struct.Struct("<4sH")
+SAVE_RECORD = struct.Struct("<BH")  # вид записи, длина данных (за данными идет crc32)
+SAVE_CRC = struct.Struct("<I")
+RECORD_FULL = 0
+RECORD_DELTA = 1
+
+# Скалярные поля снимка: имя, формат; номер поля в разностной записи - индекс в списке
+SAVE_FIELDS = (
+    ("level", "H"),
+    ("death_count", "B"),
+    ("coins_collected", "H"),
+    ("player_scale", "f"),
+    ("x", "f"),
+    ("y", "f"),
+    ("facing_right", "?")
+)
+FIELD_LAYOUTS = [struct.Struct("<" + layout) for _, layout in SAVE_FIELDS]
+FULL_FIELDS = struct.Struct("<" + "".join(layout for _, layout in SAVE_FIELDS))
+FIELD_COIN = 255  # в разностной записи: уровень и номер собранной монетки
+COIN = struct.Struct("<HH")
+
+class GameSave:
+    """Снимок прогресса: поля SAVE_FIELDS и собранные монетки (уровень -> номера)"""
+    def __init__(self, values, collected):
+        self.values = values
+        self.collected = collected
+
+    @classmethod
+    def capture(cls, sim):
+        # Игрок продолжит с последней контрольной точки, а не с места в воздухе
+        x, y = sim.checkpoint or sim.level.spawn
+        values = (
+            sim.current_level, min(sim.death_count, 255), sim.coins_collected,
+            sim.player_scale, x, y, sim.player_facing_right
+        )
+        # Значения проходят через упаковку, чтобы сравнение с прочитанными было точным
+        values = FULL_FIELDS.unpack(FULL_FIELDS.pack(*values))
+        return cls(values, {level: frozenset(coins) for level, coins in sim.collected_coins.items() if coins})
+
+    def restore(self, sim):
+        """Возврат симуляции в сохраненное состояние (уровень берется из кэша, если он там)"""
+        level, death_count, coins_collected, player_scale, x, y, facing_right = self.values
+        sim.death_count = death_count
+        sim.coins_collected = coins_collected
+        sim.player_scale = player_scale
+        sim.collected_coins = defaultdict(set, {level_num: set(coins) for level_num, coins in self.collected.items()})
+        sim.load_level(level)
+        if sim.player_list:
+            player = sim.player_list[0]
+            player.position = (x, y)
+            sim.player_prev_position = player.position
+            sim.player_facing_right = facing_right
+            sim.update_player_texture()
+            sim.checkpoint = player.position
+            sim.stream_level()
+
+    def encode_full(self):
+        data = bytearray(FULL_FIELDS.pack(*self.values))
+        data += struct.pack("<H", len(self.collected))
+        for level, coins in sorted(self.collected.items()):
+            data += COIN.pack(level, len(coins))
+            data += struct.pack(f"<{len(coins)}H", *sorted(coins))
+        return bytes(data)
+
+    def encode_delta(self, previous):
+        """Разница с предыдущим снимком или None, если нужен полный (монетки пропали)"""
+        data = bytearray()
+        for field, (old, new) in enumerate(zip(previous.values, self.values)):
+            if old != new:
+                data.append(field)
+                data += FIELD_LAYOUTS[field].pack(new)
+        for level, coins in self.collected.items():
+            old_coins = previous.collected.get(level, frozenset())
+            for coin in sorted(coins - old_coins):
+                data.append(FIELD_COIN)
+                data += COIN.pack(level, coin)
+        for level, old_coins in previous.collected.items():
+            if not old_coins <= self.collected.get(level, frozenset()):
+                return None
+        return bytes(data)
+
+    @classmethod
+    def decode_full(cls, data):
+        values = FULL_FIELDS.unpack_from(data)
+        offset = FULL_FIELDS.size
+        (levels,) = struct.unpack_from("<H", data, offset)
+        offset += 2
+        collected = {}
+        for _ in range(levels):
+            level, count = COIN.unpack_from(data, offset)
+            offset += COIN.size
+            collected[level] = frozenset(struct.unpack_from(f"<{count}H", data, offset))
+            offset += count * 2
+        return cls(values, collected)
+
+    def apply_delta(self, data):
+        values = list(self.values)
+        collected = dict(self.collected)
+        offset = 0
+        while offset < len(data):
+            field = data[offset]
+            offset += 1
+            if field == FIELD_COIN:
+                level, coin = COIN.unpack_from(data, offset)
+                offset += COIN.size
+                collected[level] = collected.get(level, frozenset()) | {coin}
+            else:
+                layout = FIELD_LAYOUTS[field]
+                (values[field],) = layout.unpack_from(data, offset)
+                offset += layout.size
+        return GameSave(tuple(values), collected)
+
+def encode_record(kind, payload):
+    return SAVE_RECORD.pack(kind, len(payload)) + payload + SAVE_CRC.pack(zlib.crc32(payload))
+
+def load_save(path):
+    """Чтение сохранения: полный снимок плюс все целые разностные записи; None, если его нет"""
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"Ошибка чтения сохранения {path}: {e}")
+        return None
+
+    try:
+        magic, version = SAVE_HEADER.unpack_from(data)
+        if magic != SAVE_MAGIC or version != SAVE_VERSION:
+            print(f"Сохранение {path} другой версии, пропускаем")
+            return None
+
+        state = None
+        offset = SAVE_HEADER.size
+        while offset + SAVE_RECORD.size <= len(data):
+            kind, length = SAVE_RECORD.unpack_from(data, offset)
+            start = offset + SAVE_RECORD.size
+            end = start + length
+            if end + SAVE_CRC.size > len(data):
+                break
+            payload = data[start:end]
+            if SAVE_CRC.unpack_from(data, end)[0] != zlib.crc32(payload):
+                break
+            if kind == RECORD_FULL:
+                state = GameSave.decode_full(payload)
+            elif state is not None:
+                state = state.apply_delta(payload)
+            offset = end + SAVE_CRC.size
+        return state
+    except (struct.error, IndexError) as e:
+        print(f"Ошибка чтения сохранения {path}: {e}")
+        return None
+
+class SaveWriter:
+    """Автосохранение в фоновом потоке
+
+    save() только кодирует снимок (микросекунды) и ставит запись в очередь,
+    поток пишет записи на диск по порядку.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.queue = queue.Queue()
+        self.thread = None
+        self.last = None  # последний записанный снимок
+        self.records = 0  # разностных записей после полного снимка
+
+    def save(self, state):
+        delta = None
+        if self.last is not None and self.records < SAVE_COMPACT_RECORDS:
+            delta = state.encode_delta(self.last)
+            if delta == b"":
+                return
+        if delta is None:
+            self.put(("full", SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION) + encode_record(RECORD_FULL, state.encode_full())))
+            self.records = 0
+        else:
+            self.put(("append", encode_record(RECORD_DELTA, delta)))
+            self.records += 1
+        self.last = state
+
+    def clear(self):
+        """Удаление сохранения (новая игра)"""
+        self.last = None
+        self.put(("remove", None))
+
+    def put(self, item):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="save", daemon=True)
+            self.thread.start()
+        self.queue.put(item)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            mode, data = item
+            try:
+                if mode == "full":
+                    temp_path = self.path + ".tmp"
+                    with open(temp_path, "wb") as file:
+                        file.write(data)
+                        file.flush()
+                        os.fsync(file.fileno())
+                    os.replace(temp_path, self.path)
+                elif mode == "append":
+                    with open(self.path, "ab") as file:
+                        file.write(data)
+                elif os.path.exists(self.path):
+                    os.remove(self.path)
+            except OSError as e:
+                print(f"Ошибка записи сохранения {self.path}: {e}")
+
+    def close(self):
+        """Дописать очередь и остановить поток (при выходе)"""
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
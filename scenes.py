@@ -0,0 +1,637 @@
+"""Сцены игры: по одному arcade.View на состояние симуляции
+
+Окно держит сцены и переключает их по game_state симуляции поиском в
+словаре. Сцена строит свои ресурсы (спрайтлисты, надписи, камеру,
+запеченные слои) при первом показе и сохраняет их, пока неактивна. Если
+неактивные сцены вместе с активными занимают больше SCENE_MEMORY_BUDGET,
+ресурсы дольше всех не показанных сцен освобождаются и построятся заново
+при следующем показе. Затемнения рисует общий Transitions поверх любой
+сцены.
+"""
+import arcade
+import math
+import pyglet
+import time
+
+from animation import AnimatedSprites
+from compositor import StaticLayers
+from particles import Particles
+from simulation import SCREEN_WIDTH, SCREEN_HEIGHT, INTRO_PLAYER_SCALE, CHUNK_SIZE, COIN_SCALE, TICK_TIME
+
+SCENE_MEMORY_BUDGET = 64 * 1024 * 1024  # байт видеопамяти на ресурсы всех сцен
+FADE_IN_TIME = 0.5  # секунды проявления сцены после перехода из затемнения
+PREFETCH_BUDGET = 0.002  # секунды на прогрев чанков следующего уровня за кадр
+COIN_PHASE_STEP = 3  # сдвиг кадра вращения соседних монеток
+VICTORY_COINS = 12  # больше монеток на экране победы не помещается
+VICTORY_COIN_SPACING = 70
+MENU_BUTTON_WIDTH = 300
+MENU_WIDE_BUTTON_WIDTH = 420  # для надписей "Продолжить" и "Новая игра"
+MENU_BUTTON_HEIGHT = 100
+
+# Неподвижные слои, запекаемые вместе: под подвижными объектами, вода (с волной) и поверх всего
+STATIC_GROUPS = {
+    "below": ("back", "spikes", "portal", "end"),
+    "water": ("water",),
+    "above": ("platforms",)
+}
+
+def screen_sprite(texture):
+    """Спрайтлист с одним спрайтом во весь экран"""
+    sprite = arcade.Sprite()
+    sprite.texture = texture
+    sprite.width = SCREEN_WIDTH
+    sprite.height = SCREEN_HEIGHT
+    sprite.center_x = SCREEN_WIDTH // 2
+    sprite.center_y = SCREEN_HEIGHT // 2
+    sprite_list = arcade.SpriteList()
+    sprite_list.append(sprite)
+    return sprite_list
+
+class Hud:
+    """Статистика игрока: надписи перестраиваются только при изменении значений"""
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        self.level_text = arcade.Text("", 10, SCREEN_HEIGHT - 30, arcade.color.WHITE, 16, batch=self.batch)
+        self.scale_text = arcade.Text("", 10, SCREEN_HEIGHT - 60, arcade.color.WHITE, 16, batch=self.batch)
+        self.deaths_text = arcade.Text("", 10, SCREEN_HEIGHT - 90, arcade.color.WHITE, 16, batch=self.batch)
+        self.coins_text = arcade.Text("", 10, SCREEN_HEIGHT - 120, arcade.color.WHITE, 16, batch=self.batch)
+        self.values = {}
+
+    def set_value(self, text, key, value, template):
+        if self.values.get(key) != value:
+            self.values[key] = value
+            text.text = template.format(*value) if isinstance(value, tuple) else template.format(value)
+
+    def update(self, sim):
+        self.set_value(self.level_text, "level", sim.current_level, "Уровень: {}")
+        self.set_value(self.scale_text, "scale", round(sim.player_scale, 3), "Размер: {:.3f}")
+        self.set_value(self.deaths_text, "deaths", sim.death_count, "Смерти: {}/3")
+        self.set_value(
+            self.coins_text, "coins",
+            (len(sim.collected_coins[sim.current_level]), sim.total_coins), "Монетки: {}/{}"
+        )
+
+    def draw(self):
+        self.batch.draw()
+
+class Scene(arcade.View):
+    """Сцена: ресурсы строятся в load() при первом показе и живут до unload()"""
+    def __init__(self, game, background_color=arcade.color.BLACK):
+        super().__init__(game, background_color)
+        self.game = game
+        self.loaded = False
+        self.last_shown = 0  # номер перехода, на котором сцену показали последний раз
+
+    def load(self):
+        """Создание ресурсов сцены"""
+
+    def unload(self):
+        """Освобождение ресурсов сцены"""
+
+    def memory_size(self):
+        """Сколько байт видеопамяти освободит unload()"""
+        return 0
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+            self.loaded = True
+
+    def release(self):
+        if self.loaded:
+            self.unload()
+            self.loaded = False
+
+    def fade_alpha(self):
+        """Затемнение, которого требует сама сцена (0 - нет)"""
+        return 0
+
+    def on_show_view(self):
+        self.ensure_loaded()
+
+    def on_draw(self):
+        game = self.game
+        with game.profiler.section("draw"):
+            self.clear()
+            game.default_camera.use()
+            self.draw()
+            game.scenes.transitions.draw(self.fade_alpha())
+
+    def draw(self):
+        """Отрисовка содержимого сцены"""
+
+class MenuButton:
+    """Кнопка меню, покачивающаяся на угол angle; неактивная (ресурсы не загружены) серая"""
+    def __init__(self, text, x, y, width=MENU_BUTTON_WIDTH, height=MENU_BUTTON_HEIGHT):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.text = arcade.Text(
+            text, x, y,
+            arcade.color.WHITE, 40,
+            anchor_x="center", anchor_y="center",
+            bold=True
+        )
+
+    def draw(self, angle, active):
+        points = [
+            (self.x - self.width/2, self.y - self.height/2),
+            (self.x + self.width/2, self.y - self.height/2),
+            (self.x + self.width/2, self.y + self.height/2),
+            (self.x - self.width/2, self.y + self.height/2)
+        ]
+
+        rotated_points = []
+        for point in points:
+            x, y = point
+            x -= self.x
+            y -= self.y
+            new_x = x * math.cos(math.radians(angle)) - y * math.sin(math.radians(angle))
+            new_y = x * math.sin(math.radians(angle)) + y * math.cos(math.radians(angle))
+            new_x += self.x
+            new_y += self.y
+            rotated_points.append((new_x, new_y))
+
+        if active:
+            arcade.draw_polygon_filled(rotated_points, (144, 238, 144, 180))
+        else:
+            arcade.draw_polygon_filled(rotated_points, (128, 128, 128, 180))
+
+        self.text.draw()
+
+    def contains(self, x, y, angle):
+        """Попадает ли точка в повернутую кнопку"""
+        half_width = self.width / 2
+        half_height = self.height / 2
+
+        rel_x = x - self.x
+        rel_y = y - self.y
+
+        angle_rad = -math.radians(angle)
+        rotated_x = rel_x * math.cos(angle_rad) - rel_y * math.sin(angle_rad)
+        rotated_y = rel_x * math.sin(angle_rad) + rel_y * math.cos(angle_rad)
+
+        return -half_width < rotated_x < half_width and -half_height < rotated_y < half_height
+
+class MenuScene(Scene):
+    """Меню: фон, качающиеся кнопки и полоса загрузки
+
+    Без сохранения кнопка одна - "Играть"; с сохранением - "Продолжить" и
+    "Новая игра" (она стирает сохранение).
+    """
+    def __init__(self, game):
+        super().__init__(game)
+        self.button_angle = 0
+        self.animation_time = 0
+
+    def load(self):
+        self.background_list = None
+        center_x = SCREEN_WIDTH // 2
+        center_y = SCREEN_HEIGHT // 2
+        offset = MENU_BUTTON_HEIGHT * 0.6
+        self.play_button = MenuButton("Играть", center_x, center_y)
+        self.continue_button = MenuButton("Продолжить", center_x, center_y + offset, MENU_WIDE_BUTTON_WIDTH)
+        self.new_game_button = MenuButton("Новая игра", center_x, center_y - offset, MENU_WIDE_BUTTON_WIDTH)
+
+    def unload(self):
+        self.background_list = None
+        self.play_button = None
+        self.continue_button = None
+        self.new_game_button = None
+
+    def buttons(self):
+        """Кнопки меню: (кнопка, можно ли нажать, действие)"""
+        game = self.game
+        if game.saved:
+            return [
+                (self.continue_button, game.can_continue(), game.continue_game),
+                (self.new_game_button, game.can_start(), game.new_game)
+            ]
+        return [(self.play_button, game.can_start(), game.new_game)]
+
+    def on_update(self, delta_time):
+        self.animation_time += delta_time
+        self.button_angle = math.sin(self.animation_time * 2) * 5
+
+    def draw(self):
+        game = self.game
+        # Фон появляется, когда текстура приходит из фоновой загрузки
+        if self.background_list is None and game.preloaded_textures['menu_bg']:
+            self.background_list = screen_sprite(game.preloaded_textures['menu_bg'])
+        if self.background_list:
+            self.background_list.draw()
+
+        # Пока не загружены ресурсы для старта, кнопка неактивна
+        for button, active, _ in self.buttons():
+            button.draw(self.button_angle, active)
+
+        if not game.assets.is_done:
+            self.draw_loading_progress()
+
+    def draw_loading_progress(self):
+        """Полоса прогресса фоновой загрузки"""
+        left = SCREEN_WIDTH // 2 - 200
+        bottom = 60
+        arcade.draw_lrbt_rectangle_filled(left, left + 400, bottom, bottom + 12, (0, 0, 0, 150))
+        arcade.draw_lrbt_rectangle_filled(
+            left, left + 400 * self.game.assets.progress, bottom, bottom + 12, (144, 238, 144, 220)
+        )
+
+    def on_mouse_press(self, x, y, button, modifiers):
+        """Обработка клика мыши"""
+        if button != arcade.MOUSE_BUTTON_LEFT:
+            return
+        for menu_button, active, action in self.buttons():
+            if active and menu_button.contains(x, y, self.button_angle):
+                action()
+                return
+
+class IntroScene(Scene):
+    """Вступление: героиня и текст, в конце затемнение из симуляции"""
+    def load(self):
+        self.player_list = None
+        self.animated = None
+        self.intro_text = arcade.Text(
+            "Я должна собрать рассыпанные амулеты\nи отнести их домой,\nчтобы предотвратить страшное",
+            SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 100,
+            arcade.color.WHITE, 24,
+            anchor_x="center", anchor_y="center",
+            align="center",
+            bold=True
+        )
+
+    def unload(self):
+        self.player_list = None
+        self.animated = None
+        self.intro_text = None
+
+    def fade_alpha(self):
+        return self.game.sim.fade_alpha
+
+    def draw(self):
+        sim = self.game.sim
+        animations = self.game.animations
+        # Героиня дышит, если собран атлас анимаций; набор создается один раз
+        if self.animated is None and animations.ready:
+            clip = animations.find("intro", "idle", INTRO_PLAYER_SCALE)
+            if clip:
+                self.animated = AnimatedSprites(animations, 1)
+                self.animated.add(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, clip, INTRO_PLAYER_SCALE)
+        if self.animated is not None:
+            self.animated.draw(sim.tick * TICK_TIME)
+        else:
+            # Иначе неподвижный спрайт, когда загружен атлас игрока
+            if self.player_list is None and sim.player_frames.get("intro"):
+                player = arcade.Sprite()
+                player.texture, player.scale = sim.get_player_frame("intro", INTRO_PLAYER_SCALE)
+                player.center_x = SCREEN_WIDTH // 2
+                player.center_y = SCREEN_HEIGHT // 2
+                self.player_list = arcade.SpriteList()
+                self.player_list.append(player)
+            if self.player_list:
+                self.player_list.draw()
+
+        self.intro_text.draw()
+
+class GameScene(Scene):
+    """Уровень: фон, запеченные слои, объекты симуляции и статистика"""
+    def __init__(self, game):
+        super().__init__(game, arcade.color.SKY_BLUE)
+
+    def load(self):
+        self.backgrounds = {}  # уровень -> спрайтлист фона
+        self.camera = arcade.Camera2D()
+        self.static_layers = StaticLayers(self.game.ctx, STATIC_GROUPS, CHUNK_SIZE)
+        self.hud = Hud()
+        # Монетки и игрок одним набором анимированных спрайтов
+        self.animated = None
+        self.entities_key = None  # уровень и версия сущностей, по которым построен набор
+        self.player_slot = None
+        self.player_clip = None
+        self.player_phase = 0
+        self.particles = Particles(self.game.ctx)
+
+    def unload(self):
+        self.static_layers.delete()
+        self.static_layers = None
+        self.particles.delete()
+        self.particles = None
+        self.backgrounds = None
+        self.camera = None
+        self.hud = None
+        self.animated = None
+        self.entities_key = None
+
+    def memory_size(self):
+        return self.static_layers.memory_size() + self.particles.memory_size()
+
+    def handle_event(self, event):
+        """Вспышка частиц на событие симуляции (последние два поля события - точка)"""
+        if not self.loaded:
+            return
+        kind = event[0]
+        time = self.game.sim.tick * TICK_TIME
+        if kind in ("level", "menu"):
+            # Частицы прежнего уровня на новом не видны
+            self.particles.clear(time)
+        elif kind in self.particles:
+            self.particles.emit(kind, event[-2], event[-1], time)
+
+    def get_background(self, level_num):
+        """Фон уровня; строится один раз, когда текстура загружена"""
+        background = self.backgrounds.get(level_num)
+        if background is None:
+            texture = self.game.preloaded_textures['backgrounds'].get(level_num)
+            if texture:
+                background = self.backgrounds[level_num] = screen_sprite(texture)
+        return background
+
+    def get_player_draw_position(self):
+        """Положение игрока с интерполяцией между шагами симуляции"""
+        sim = self.game.sim
+        player = sim.player_list[0]
+        if sim.player_prev_position is None:
+            return player.position
+
+        prev_x, prev_y = sim.player_prev_position
+        interpolation = self.game.interpolation
+        return (
+            prev_x + (player.center_x - prev_x) * interpolation,
+            prev_y + (player.center_y - prev_y) * interpolation
+        )
+
+    def update_camera(self):
+        """Камера следует за игроком, не выходя за границы уровня"""
+        sim = self.game.sim
+        level = sim.level
+        if sim.player_list:
+            x, y = self.get_player_draw_position()
+        else:
+            x, y = self.window.width / 2, self.window.height / 2
+        self.camera.position, keys = self.camera_view(level, x, y)
+
+        # Видимые чанки запекаются до включения камеры
+        self.static_layers.update(level, keys)
+
+    def camera_view(self, level, x, y):
+        """Положение камеры, следящей за точкой, и видимые ею чанки"""
+        half_width = self.window.width / 2
+        half_height = self.window.height / 2
+        # Уровень меньше окна прижат к левому нижнему углу, как при отрисовке в координатах экрана
+        x = max(min(x, level.width - half_width), half_width)
+        y = max(min(y, level.height - half_height), half_height)
+
+        first_x = int((x - half_width) // CHUNK_SIZE)
+        last_x = int((x + half_width) // CHUNK_SIZE)
+        first_y = int((y - half_height) // CHUNK_SIZE)
+        last_y = int((y + half_height) // CHUNK_SIZE)
+        keys = [(cx, cy) for cx in range(first_x, last_x + 1) for cy in range(first_y, last_y + 1)]
+        return (x, y), keys
+
+    def warm_levels(self, budget=PREFETCH_BUDGET):
+        """Прогрев уровней, разобранных заранее
+
+        За кадр создаются списки спрайтов нескольких чанков у точки появления
+        (их текстуры сразу попадают в атлас), а когда все чанки готовы,
+        запекаются чанки, которые камера увидит первыми (если сцена уровня не
+        выгружена). Переход через портал не ждет ни разбора карты, ни GPU.
+        """
+        start = time.perf_counter()
+        for level in self.game.sim.level_cache.update():
+            _, keys = self.camera_view(level, *level.spawn)
+            while time.perf_counter() - start < budget:
+                key = level.warm()
+                if key is None:
+                    if not self.loaded or not self.static_layers.prefetch(level, keys):
+                        break
+                    continue
+                for kind, chunks in level.chunks.items():
+                    sprite_list = chunks.get(key)
+                    if sprite_list is None or kind == "walls":
+                        continue
+                    sprite_list.initialize()
+                    for texture in {sprite.texture for sprite in sprite_list}:
+                        self.game.ctx.default_atlas.add(texture)
+
+    def player_animation(self):
+        """Клип игрока по его движению: стоит, идет, взлетает или падает"""
+        player = self.game.sim.player_list[0]
+        if not getattr(player, 'can_jump', True):
+            return "jump" if player.change_y > 0 else "fall"
+        return "walk" if player.change_x else "idle"
+
+    def update_animations(self, time):
+        """Обновление набора анимированных спрайтов; False, если анимаций нет и рисовать по-старому"""
+        animations = self.game.animations
+        if not animations.ready:
+            return False
+        sim = self.game.sim
+        if self.animated is None:
+            self.animated = AnimatedSprites(animations)
+        animated = self.animated
+
+        # Монетки неподвижны: набор перестраивается, только когда их собирают или создают заново
+        key = (sim.level, sim.entities_version)
+        if key != self.entities_key:
+            self.entities_key = key
+            animated.clear()
+            clip = animations.find("coin", "spin", COIN_SCALE)
+            if clip:
+                for coin in sim.coins_list:
+                    animated.add(coin.center_x, coin.center_y, clip, COIN_SCALE, coin.index * COIN_PHASE_STEP)
+            self.player_slot = None
+
+        if not sim.player_list:
+            return True
+        clip = animations.find("player", self.player_animation(), sim.player_scale, sim.player_facing_right)
+        if clip is None:
+            return True
+        # Новый клип начинается с первого кадра
+        if clip is not self.player_clip:
+            self.player_clip = clip
+            self.player_phase = -time * clip.fps
+        x, y = self.get_player_draw_position()
+        if self.player_slot is None:
+            self.player_slot = animated.add(x, y, clip, sim.player_scale, self.player_phase)
+        else:
+            animated.set(self.player_slot, x, y, clip, sim.player_scale, self.player_phase)
+        return True
+
+    def draw_player(self):
+        """Отрисовка игрока с интерполяцией между шагами симуляции"""
+        sim = self.game.sim
+        if not sim.player_list:
+            return
+
+        player = sim.player_list[0]
+        current_position = player.position
+        player.position = self.get_player_draw_position()
+        with self.game.profiler.section("draw_player"):
+            sim.player_list.draw()
+        player.position = current_position
+
+    def draw(self):
+        game = self.game
+        sim = game.sim
+        profiler = game.profiler
+
+        # Фон неподвижен относительно экрана
+        with profiler.section("draw_background"):
+            background = self.get_background(sim.current_level)
+            if background:
+                background.draw()
+
+        with profiler.section("camera"):
+            self.update_camera()
+        self.camera.use()
+        time = sim.tick * TICK_TIME
+        with profiler.section("draw_static"):
+            self.static_layers.draw("below")
+            self.static_layers.draw("water", time)
+
+        with profiler.section("draw_lilypads"):
+            sim.lilypads_list.draw()
+        with profiler.section("draw_portals"):
+            sim.portal_list.draw()
+        with profiler.section("draw_animated"):
+            animated = self.update_animations(time)
+            if animated:
+                self.animated.draw(time)
+        if not animated:
+            with profiler.section("draw_coins"):
+                sim.coins_list.draw()
+        if not animated or self.player_slot is None:
+            self.draw_player()
+
+        # Платформы рисуются поверх объектов, частицы - поверх всего
+        with profiler.section("draw_static"):
+            self.static_layers.draw("above")
+        with profiler.section("draw_particles"):
+            self.particles.draw(time)
+
+        # Статистика
+        game.default_camera.use()
+        with profiler.section("draw_hud"):
+            self.hud.update(sim)
+            self.hud.draw()
+
+class VictoryScene(Scene):
+    """Победа: надпись и собранные монетки на черном фоне"""
+    def load(self):
+        self.animated = None
+        self.coin_count = None
+        self.victory_text = arcade.Text(
+            "Победа, вы спасли мир!",
+            SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
+            arcade.color.WHITE, 40,
+            anchor_x="center", anchor_y="center",
+            bold=True
+        )
+
+    def unload(self):
+        self.victory_text = None
+        self.animated = None
+
+    def fade_alpha(self):
+        return self.game.sim.fade_alpha
+
+    def draw(self):
+        self.victory_text.draw()
+
+        # Собранные монетки вращаются волной под надписью
+        sim = self.game.sim
+        animations = self.game.animations
+        clip = animations.find("coin", "spin", COIN_SCALE) if animations.ready else None
+        if clip is None:
+            return
+        count = min(sim.coins_collected, VICTORY_COINS)
+        if count != self.coin_count:
+            self.coin_count = count
+            if self.animated is None:
+                self.animated = AnimatedSprites(animations, VICTORY_COINS)
+            self.animated.clear()
+            left = SCREEN_WIDTH // 2 - (count - 1) * VICTORY_COIN_SPACING / 2
+            for i in range(count):
+                self.animated.add(left + i * VICTORY_COIN_SPACING, SCREEN_HEIGHT // 2 - 90, clip, phase=-i)
+        if self.animated is not None:
+            self.animated.draw(sim.tick * TICK_TIME)
+
+class Transitions:
+    """Затемнения поверх сцен
+
+    Сцена сама задает затемнение (конец вступления), а после перехода из
+    затемненной сцены новая проявляется из черного за FADE_IN_TIME.
+    """
+    def __init__(self):
+        self.fade_in = 0  # альфа, с которой проявляется текущая сцена
+        self.elapsed = 0
+
+    def begin(self, alpha):
+        """Переход: новая сцена начинает с затемнения, на котором закончилась старая"""
+        self.fade_in = min(alpha, 255)
+        self.elapsed = 0
+
+    def update(self, delta_time):
+        if self.fade_in:
+            self.elapsed += delta_time
+            if self.elapsed >= FADE_IN_TIME:
+                self.fade_in = 0
+
+    def draw(self, alpha=0):
+        if self.fade_in:
+            alpha = max(alpha, self.fade_in * (1 - self.elapsed / FADE_IN_TIME))
+        if alpha > 0:
+            arcade.draw_lrbt_rectangle_filled(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT, (0, 0, 0, int(alpha)))
+
+class SceneManager:
+    """Сцены окна: показана одна, остальные приостановлены и держат ресурсы, пока хватает бюджета"""
+    def __init__(self, window, scenes, memory_budget=SCENE_MEMORY_BUDGET):
+        self.window = window
+        self.scenes = scenes  # имя (game_state) -> сцена
+        self.memory_budget = memory_budget
+        self.current = None
+        self.transitions = Transitions()
+        self.switches = 0
+
+    def get(self, name):
+        return self.scenes[name]
+
+    def show(self, name):
+        """Смена показанной сцены; повторный показ той же сцены ничего не делает"""
+        scene = self.scenes[name]
+        previous = self.current
+        if scene is previous:
+            return
+        self.transitions.begin(previous.fade_alpha() if previous else 0)
+        self.switches += 1
+        scene.last_shown = self.switches
+        self.current = scene
+        self.window.show_view(scene)
+        self.evict()
+
+    def update(self, delta_time):
+        self.transitions.update(delta_time)
+
+    def evict(self):
+        """Освобождение давно не показанных сцен, пока ресурсы превышают бюджет"""
+        loaded = [scene for scene in self.scenes.values() if scene.loaded]
+        total = sum(scene.memory_size() for scene in loaded)
+        if total <= self.memory_budget:
+            return
+        suspended = sorted(
+            (scene for scene in loaded if scene is not self.current and scene.memory_size()),
+            key=lambda scene: scene.last_shown
+        )
+        for scene in suspended:
+            if total <= self.memory_budget:
+                break
+            total -= scene.memory_size()
+            scene.release()
+        # Объекты OpenGL, на которые больше нет ссылок, удаляются только здесь
+        self.window.ctx.gc()
+
+    def release_all(self):
+        """Освобождение ресурсов всех сцен (при закрытии окна)"""
+        for scene in self.scenes.values():
+            scene.release()
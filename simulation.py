@@ -0,0 +1,952 @@
+import arcade
+import glob
+import json
+import os
+import re
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from PIL import Image
+from platforms import TimedPlatforms
+from profiler import FrameProfiler
+from tilemap import LEVEL_EXTENSION, open_tilemap
+from triggers import (
+    TriggerIndex, TRIGGER_COIN, TRIGGER_PORTAL, TRIGGER_HAZARD, TRIGGER_GOAL, TRIGGER_LILYPAD,
+    TRIGGER_CHECKPOINT, TRIGGER_SPIKES, TRIGGER_WATER
+)
+
+# Константы
+SCREEN_WIDTH = 1280
+SCREEN_HEIGHT = 768
+PLAYER_SPEED = 5
+JUMP_FORCE = 21
+GRAVITY = 0.9
+PLAYER_SCALE = 0.02
+COIN_SCALE = 0.05
+LILYPAD_SCALE = 0.1
+PORTAL_SCALE = 0.5
+LEVEL_CACHE_SIZE = 3
+INTRO_PLAYER_SCALE = 0.1
+SOLID_TILE_TOLERANCE = 1  # допустимый прозрачный край тайла в пикселях
+CHUNK_SIZE = 512  # сторона чанка неподвижных слоев в пикселях
+STREAM_RADIUS = 3  # радиус подгружаемых чанков вокруг игрока
+STREAM_KEEP_RADIUS = 4  # чанки дальше этого радиуса выгружаются
+STREAM_CHUNKS_PER_TICK = 4  # сколько дальних чанков подгружать за шаг
+
+# Частота симуляции не зависит от частоты отрисовки
+TICK_RATE = 60
+TICK_TIME = 1 / TICK_RATE
+
+# Ввод одного шага симуляции - битовая маска
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4  # нажатие прыжка (срабатывает один раз)
+INPUT_START = 8  # кнопка "Играть" в меню
+
+# Атлас кадров игрока (собирается build_assets.py)
+PLAYER_ATLAS = "images/player_atlas.png"
+PLAYER_ATLAS_INFO = "images/player_atlas.json"
+PLAYER_SOURCE = "images/big2.png"
+
+# Текстуры игровых объектов
+TEXTURE_FILES = {
+    'lilypad': "images/lilypad.png",
+    'coin': "images/coin.png",
+    'portal': "images/portal.png"
+}
+
+# Виды слоев уровня: рисуемые и участвующие в столкновениях
+DRAW_KINDS = ("back", "spikes", "water", "portal", "end", "platforms")
+COLLISION_KINDS = ("walls",)
+# Тайлы этих слоев попадают в триггеры уровня
+TILE_TRIGGERS = {
+    "spikes": TRIGGER_SPIKES,
+    "water": TRIGGER_WATER,
+    "portal": TRIGGER_PORTAL,
+    "end": TRIGGER_GOAL
+}
+# Опасности и причина смерти в событии "death"
+HAZARD_TRIGGERS = {
+    TRIGGER_SPIKES: "spikes",
+    TRIGGER_WATER: "water",
+    TRIGGER_HAZARD: "hazard"
+}
+LILYPAD_TRIGGER_PADDING = 4  # кувшинка покачивается на 3 пикселя
+CHECKPOINT_SIZE = (32, 64)  # зона контрольной точки, заданной на карте точкой
+
+DEFAULT_SPAWN = (50, 100)  # если на карте нет точки появления
+
+def read_player_atlas(path=PLAYER_ATLAS, info_path=PLAYER_ATLAS_INFO):
+    """Чтение атласа игрока с диска: изображение и описание кадров
+    
+    Если атлас не собран, возвращается исходное изображение без описания.
+    """
+    try:
+        with open(info_path, encoding="utf-8") as file:
+            info = json.load(file)
+        image = Image.open(path).convert("RGBA")
+    except FileNotFoundError:
+        info = None
+        image = Image.open(PLAYER_SOURCE).convert("RGBA")
+    return image, info
+
+def is_solid_tile(tile, tile_width, tile_height):
+    """Занимает ли хитбокс тайла всю клетку (с точностью до SOLID_TILE_TOLERANCE пикселей)"""
+    col = int(tile.center_x // tile_width)
+    row = int(tile.center_y // tile_height)
+    return (abs(tile.left - col * tile_width) <= SOLID_TILE_TOLERANCE and
+            abs(tile.right - (col + 1) * tile_width) <= SOLID_TILE_TOLERANCE and
+            abs(tile.bottom - row * tile_height) <= SOLID_TILE_TOLERANCE and
+            abs(tile.top - (row + 1) * tile_height) <= SOLID_TILE_TOLERANCE)
+
+def merge_solid_cells(rows):
+    """Слияние сплошных клеток {строка: {столбцы}} в прямоугольники
+    
+    Возвращает список (первый столбец, последний столбец, первая строка, последняя строка).
+    """
+    # Горизонтальные отрезки в каждой строке, затем склейка одинаковых отрезков по вертикали
+    rects = []
+    open_runs = {}
+    for row in sorted(rows):
+        runs = []
+        cols = sorted(rows[row])
+        start = prev = cols[0]
+        for col in cols[1:]:
+            if col != prev + 1:
+                runs.append((start, prev))
+                start = col
+            prev = col
+        runs.append((start, prev))
+        
+        next_runs = {}
+        for run in runs:
+            first_row, last_row = open_runs.pop(run, (row, row - 1))
+            if last_row != row - 1:
+                rects.append((*run, first_row, last_row))
+                first_row = row
+            next_runs[run] = (first_row, row)
+        
+        # Отрезки, которые не продолжились в этой строке, закрываются
+        rects.extend((*run, first_row, last_row) for run, (first_row, last_row) in open_runs.items())
+        open_runs = next_runs
+    rects.extend((*run, first_row, last_row) for run, (first_row, last_row) in open_runs.items())
+    return rects
+
+def make_walls(rects, loose_tiles, tile_width, tile_height):
+    """Список физики: невидимые прямоугольники из клеток и несплошные тайлы как есть"""
+    walls = arcade.SpriteList(use_spatial_hash=True)
+    walls.extend(loose_tiles)
+    
+    for first_col, last_col, first_row, last_row in rects:
+        width = (last_col - first_col + 1) * tile_width
+        height = (last_row - first_row + 1) * tile_height
+        wall = arcade.SpriteSolidColor(
+            width, height,
+            center_x=first_col * tile_width + width / 2,
+            center_y=first_row * tile_height + height / 2,
+            color=arcade.color.WHITE
+        )
+        wall.visible = False
+        walls.append(wall)
+    
+    return walls
+
+def merge_solid_tiles(tiles, tile_width, tile_height):
+    """Слияние соседних сплошных тайлов в крупные прямоугольники для физики
+    
+    Несплошные тайлы (склоны, тонкие уступы) попадают в список как есть.
+    """
+    loose_tiles = []
+    rows = {}
+    
+    for tile in tiles:
+        if is_solid_tile(tile, tile_width, tile_height):
+            rows.setdefault(int(tile.center_y // tile_height), set()).add(int(tile.center_x // tile_width))
+        else:
+            loose_tiles.append(tile)
+    
+    return make_walls(merge_solid_cells(rows), loose_tiles, tile_width, tile_height)
+
+def find_levels():
+    """Номера уровней, для которых есть карта (JSON или собранная)"""
+    levels = set()
+    for path in glob.glob("maps/map*.json") + glob.glob("maps/map*.lvl"):
+        match = re.fullmatch(r"map(\d+)", os.path.splitext(os.path.basename(path))[0])
+        if match:
+            levels.add(int(match.group(1)))
+    return sorted(levels)
+
+def layer_kind(name):
+    """Вид слоя карты по его названию (None - слой не используется)"""
+    name = name.lower()
+    if "platform" in name:
+        return "platforms"
+    elif "back" in name:
+        return "back"
+    elif "spike" in name:
+        return "spikes"
+    elif "portal" in name:
+        return "portal"
+    elif "water" in name:
+        return "water"
+    elif "end" in name:
+        return "end"
+    # Остальные слои не рисуются; среди них старые слои монеток coinN - их не
+    # рисовала и прежняя загрузка, а монетки для игры берутся из слоя сущностей
+    return None
+
+class LevelData:
+    """Слои уровня: тайлы карты подгружаются чанками вокруг игрока
+    
+    Карта хранится компактными массивами номеров тайлов, а спрайты
+    и прямоугольники физики существуют только для загруженных чанков.
+    """
+    def __init__(self, level_num, tilemap=None):
+        self.level_num = level_num
+        self.tilemap = tilemap
+        self.width = SCREEN_WIDTH
+        self.height = SCREEN_HEIGHT
+        self.layers = []  # (вид, слой карты)
+        self.kinds = set()  # виды слоев, в которых есть тайлы
+        self.properties = {}
+        self.entities = defaultdict(list)  # вид сущности -> объекты карты
+        self.spawn = DEFAULT_SPAWN
+        
+        # Загруженные чанки: вид -> {ключ чанка: SpriteList}
+        self.chunks = {kind: {} for kind in DRAW_KINDS + ("walls",)}
+        self.loaded = set()
+        self.queue = []
+        self.center = None
+        self.version = 0  # меняется при каждой загрузке и выгрузке чанка
+        
+        # Заготовки для уровня, разобранного заранее: тайлы чанков и чанки для прогрева
+        self.prepared = {}  # ключ чанка -> {вид: спрайты}
+        self.warm_queue = []
+        
+        # Списки столкновений из чанков рядом с игроком
+        self.nearby = {kind: [] for kind in COLLISION_KINDS}
+        
+        # Тайлы-триггеры загруженных чанков и сущности уровня
+        self.triggers = TriggerIndex()
+        
+        if tilemap:
+            self.width = tilemap.width
+            self.height = tilemap.height
+            for layer in tilemap.layers:
+                kind = layer_kind(layer.name)
+                if kind and not layer.is_empty:
+                    self.layers.append((kind, layer))
+                    self.kinds.add(kind)
+            
+            self.properties = tilemap.properties
+            for map_object in tilemap.objects:
+                self.entities[map_object.kind].append(map_object)
+            if self.entities["spawn"]:
+                self.spawn = (self.entities["spawn"][0].x, self.entities["spawn"][0].y)
+
+    def read_tiles(self, key):
+        """Спрайты тайлов чанка по видам слоев (без OpenGL, можно в фоновом потоке)"""
+        tiles = {}
+        for kind, layer in self.layers:
+            sprites = self.tilemap.get_sprites(layer, key)
+            if sprites:
+                tiles.setdefault(kind, []).extend(sprites)
+        return tiles
+
+    def chunks_around(self, center, radius):
+        """Чанки карты в квадрате вокруг центра: список (удаленность, ключ) от ближних к дальним"""
+        cx, cy = center
+        count_x, count_y = self.tilemap.chunk_count
+        wanted = [
+            (max(abs(dx), abs(dy)), (cx + dx, cy + dy))
+            for dx in range(-radius, radius + 1)
+            for dy in range(-radius, radius + 1)
+            if 0 <= cx + dx < count_x and 0 <= cy + dy < count_y
+        ]
+        wanted.sort()
+        return wanted
+
+    def prepare(self, x, y):
+        """Заготовка тайлов вокруг точки появления до того, как уровень понадобится
+        
+        Вызывается в фоновом потоке: здесь читаются тайлы и создаются текстуры
+        и спрайты, а списки спрайтов чанков потом по одному создает warm().
+        """
+        if self.tilemap is None:
+            return
+        
+        wanted = self.chunks_around((int(x // CHUNK_SIZE), int(y // CHUNK_SIZE)), STREAM_RADIUS)
+        for _, key in wanted:
+            self.prepared[key] = self.read_tiles(key)
+        self.warm_queue = [key for _, key in wanted]
+
+    def warm(self):
+        """Загрузка очередного чанка у точки появления; ключ или None, если все готово"""
+        while self.warm_queue:
+            key = self.warm_queue.pop(0)
+            if key not in self.loaded:
+                self.load_chunk(key)
+                return key
+        return None
+
+    def load_chunk(self, key):
+        """Создание спрайтов и прямоугольников физики одного чанка"""
+        tiles = self.prepared.pop(key, None)
+        if tiles is None:
+            tiles = self.read_tiles(key)
+        
+        for kind, sprites in tiles.items():
+            sprite_list = arcade.SpriteList()
+            sprite_list.extend(sprites)
+            self.chunks[kind][key] = sprite_list
+            
+            if kind in TILE_TRIGGERS:
+                for tile in sprites:
+                    self.triggers.add(TILE_TRIGGERS[kind], tile, key)
+        
+        # Физика работает с укрупненными прямоугольниками, тайлы только рисуются
+        if "platforms" in tiles:
+            tilemap = self.tilemap
+            if tilemap.wall_rects is not None:
+                # Собранная карта: прямоугольники готовы, отдельно идут только несплошные тайлы
+                loose = [tile for tile in tiles["platforms"] if tile.texture not in tilemap.solid_textures]
+                walls = make_walls(tilemap.wall_rects.get(key, []), loose, tilemap.tile_width, tilemap.tile_height)
+            else:
+                walls = merge_solid_tiles(tiles["platforms"], tilemap.tile_width, tilemap.tile_height)
+            self.chunks["walls"][key] = walls
+        
+        self.loaded.add(key)
+        self.version += 1
+
+    def unload_chunk(self, key):
+        for chunks in self.chunks.values():
+            chunks.pop(key, None)
+        self.triggers.remove_group(key)
+        self.loaded.discard(key)
+        self.version += 1
+
+    def stream(self, x, y, budget=STREAM_CHUNKS_PER_TICK):
+        """Подгрузка чанков вокруг точки и выгрузка дальних
+        
+        Чанки, соседние с точкой, загружаются сразу, остальные - не больше
+        budget за вызов. Возвращает True, если изменились списки столкновений.
+        """
+        if self.tilemap is None:
+            return False
+        
+        center = (int(x // CHUNK_SIZE), int(y // CHUNK_SIZE))
+        changed = center != self.center
+        if changed:
+            self.center = center
+            cx, cy = center
+            
+            for key in list(self.loaded):
+                if max(abs(key[0] - cx), abs(key[1] - cy)) > STREAM_KEEP_RADIUS:
+                    self.unload_chunk(key)
+            
+            # Очередь по удаленности от игрока
+            wanted = self.chunks_around(center, STREAM_RADIUS)
+            for distance, key in wanted:
+                if distance <= 1 and key not in self.loaded:
+                    self.load_chunk(key)
+            self.queue = [key for _, key in wanted if key not in self.loaded]
+            
+            ring = [(cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+            for kind, lists in self.nearby.items():
+                chunks = self.chunks[kind]
+                lists[:] = [chunks[key] for key in ring if key in chunks]
+        
+        while self.queue and budget > 0:
+            key = self.queue.pop(0)
+            if key not in self.loaded:
+                self.load_chunk(key)
+                budget -= 1
+        
+        return changed
+
+class LevelCache:
+    """Кэш разобранных уровней с вытеснением давно не использованных
+    
+    Следующий уровень можно заказать заранее (prefetch): карта разбирается
+    в фоновом потоке, а get() потом только забирает готовый результат.
+    """
+    def __init__(self, loader, max_levels=LEVEL_CACHE_SIZE):
+        self.loader = loader
+        self.max_levels = max_levels
+        self.levels = OrderedDict()
+        self.executor = None
+        self.pending = {}  # номер уровня -> future разбора
+        self.warming = []  # разобранные заранее уровни, которые еще не понадобились
+
+    def get(self, level_num):
+        """Получить уровень из кэша, при промахе - дождаться фонового разбора или разобрать карту"""
+        level = self.levels.get(level_num)
+        if level is not None:
+            self.levels.move_to_end(level_num)
+            if level in self.warming:
+                self.warming.remove(level)
+            return level
+
+        future = self.pending.pop(level_num, None)
+        if future is not None:
+            level = self.result(level_num, future)
+        if level is None:
+            level = self.loader(level_num)
+        self.store(level_num, level)
+        return level
+
+    def store(self, level_num, level):
+        self.levels[level_num] = level
+
+        # Вытесняем самый давно использованный уровень
+        while len(self.levels) > self.max_levels:
+            self.levels.popitem(last=False)
+
+    def prepare_level(self, level_num):
+        """Разбор карты и заготовка чанков у точки появления (в фоновом потоке)"""
+        level = self.loader(level_num)
+        level.prepare(*level.spawn)
+        return level
+
+    def result(self, level_num, future):
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Ошибка подготовки уровня {level_num}: {e}")
+            return None
+
+    def prefetch(self, level_num):
+        """Заказать фоновый разбор уровня, если его еще нет в кэше"""
+        if level_num in self.levels or level_num in self.pending:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="levels")
+        self.pending[level_num] = self.executor.submit(self.prepare_level, level_num)
+
+    def update(self):
+        """Прием уровней, разобранных в фоне (из главного потока)
+        
+        Возвращает разобранные заранее уровни, которые можно прогревать,
+        пока их не забрал get().
+        """
+        for level_num, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[level_num]
+                level = self.result(level_num, future)
+                if level is not None:
+                    self.store(level_num, level)
+                    self.warming.append(level)
+        
+        self.warming = [level for level in self.warming if self.levels.get(level.level_num) is level]
+        return self.warming
+
+    def clear(self):
+        """Очистка кэша; уже начатый фоновый разбор дожидается завершения"""
+        for future in self.pending.values():
+            future.cancel()
+        wait(self.pending.values())
+        self.pending.clear()
+        self.warming = []
+        self.levels.clear()
+
+    def shutdown(self):
+        """Остановка фонового разбора (при закрытии окна)"""
+        self.clear()
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+class GameSimulation:
+    """Игровая логика без окна и OpenGL: состояния, уровни, физика, столкновения
+    
+    Симуляция продвигается только вызовами step() с маской ввода, поэтому
+    одинаковый поток ввода всегда дает одинаковый результат.
+    """
+    def __init__(self, load_textures=True):
+        # Спрайтлисты
+        self.player_list = arcade.SpriteList()
+        # Кувшинки - платформы физики; без хеша arcade ищет столкновения через GPU с ожиданием результата
+        self.lilypads_list = arcade.SpriteList(use_spatial_hash=True)
+        self.lilypads = TimedPlatforms(TICK_RATE)  # состояние и таймеры кувшинок
+        
+        # Сущности из объектов карты, по которым ищутся столкновения
+        self.coins_list = arcade.SpriteList()
+        self.portal_list = arcade.SpriteList()
+        self.hazards_list = arcade.SpriteList()
+        self.checkpoints_list = arcade.SpriteList()
+
+        # Собранные монетки: уровень -> номера монеток
+        self.collected_coins = defaultdict(set)
+        
+        # Текстуры, от которых зависят хитбоксы
+        self.textures = {
+            'lilypad': None,
+            'coin': None,
+            'portal': None
+        }
+        # Кадры игрока: имя -> [(масштаб кадра, вправо, влево)]
+        self.player_frames = {}
+        if load_textures:
+            self.load_textures()
+        
+        # Направление игрока
+        self.player_facing_right = True
+        self.player_prev_position = None
+        self.checkpoint = None  # где игрок появится после смерти
+        
+        # Статистика игрока
+        self.player_scale = 0.02
+        self.initial_scale = 0.02
+        self.min_scale = 0.005
+        self.max_scale = 0.02
+        self.death_count = 0
+        self.coins_collected = 0
+        self.total_coins = 0
+        
+        # Номера уровней с картами: каталог карт читается один раз, а не при каждом переходе
+        self.level_numbers = frozenset(find_levels())
+
+        # Состояния игры
+        self.game_state = "MENU"  # MENU, INTRO, GAME, VICTORY
+        self.current_level = 1
+        self.fade_alpha = 0
+        self.intro_ticks = 0
+        self.victory_ticks = 0
+        self.tick = 0
+        self.entities_version = 0  # растет, когда меняется набор монеток и прочих сущностей
+        
+        # События для отрисовки и звука (забираются через pop_events)
+        self.events = []
+        
+        # Замеры фаз шага (окно подставляет свой профилировщик)
+        self.profiler = FrameProfiler()
+        
+        self.physics_engine = None
+        self.level = LevelData(0)
+        self.level_cache = LevelCache(self.parse_level)
+        
+        self.setup_menu()
+
+    def load_textures(self):
+        """Синхронная загрузка текстур игровых объектов (при запуске без окна)"""
+        try:
+            for name, path in TEXTURE_FILES.items():
+                if os.path.exists(path):
+                    self.textures[name] = arcade.load_texture(path)
+            self.set_player_atlas(*read_player_atlas())
+        except Exception as e:
+            print(f"Ошибка загрузки текстур: {e}")
+
+    def set_player_atlas(self, image, info):
+        """Нарезка кадров игрока, уменьшенных заранее до экранного размера
+        
+        Кадр, смотрящий влево, получается отражением текстуры, а не из отдельного файла.
+        """
+        frames = {}
+        if info is None:
+            # Атлас не собран - используем исходное изображение
+            texture = arcade.Texture(image)
+            frames = {"player": [(1.0, texture)], "intro": [(1.0, texture)]}
+        else:
+            sheet = arcade.SpriteSheet.from_image(image)
+            for frame in info["frames"]:
+                # Хитбокс оригинала, приведенный к размеру кадра
+                hit_box = [(x * frame["scale"], y * frame["scale"]) for x, y in info["hit_box"]]
+                texture = arcade.Texture(sheet.get_image(arcade.LBWH(*frame["rect"])), hit_box_points=hit_box)
+                frames.setdefault(frame["name"], []).append((frame["scale"], texture))
+        
+        self.player_frames = {
+            name: [(scale, texture, texture.flip_left_right()) for scale, texture in textures]
+            for name, textures in frames.items()
+        }
+
+    def get_player_frame(self, name, scale, facing_right=True):
+        """Текстура игрока, ближайшая к нужному масштабу, и масштаб спрайта для нее"""
+        frame_scale, right, left = min(self.player_frames[name], key=lambda frame: abs(frame[0] - scale))
+        return (right if facing_right else left), scale / frame_scale
+
+    def pop_events(self):
+        """Забрать накопленные события"""
+        events = self.events
+        self.events = []
+        return events
+
+    def run(self, inputs):
+        """Прогон симуляции по заранее записанному потоку ввода"""
+        for input_mask in inputs:
+            self.step(input_mask)
+        return self
+
+    def spawn_entities(self, reset_coins=False):
+        """Создание сущностей уровня из объектов карты за один проход
+        
+        Монетки, кувшинки, порталы и опасные зоны создаются заново (так же
+        сбрасываются таймеры кувшинок), списки сразу получают нужную емкость.
+        """
+        entities = self.level.entities
+        if reset_coins:
+            self.collected_coins[self.current_level] = set()
+            self.coins_collected = 0
+        collected = self.collected_coins[self.current_level]
+        self.total_coins = len(entities["coin"])
+        
+        coins = []
+        if entities["coin"] and self.has_texture('coin', "монетки"):
+            for i, coin_object in enumerate(entities["coin"]):
+                if i not in collected:
+                    coin = arcade.Sprite()
+                    coin.texture = self.textures['coin']
+                    coin.center_x = coin_object.x
+                    coin.center_y = coin_object.y
+                    coin.scale = COIN_SCALE
+                    coin.index = i
+                    coins.append(coin)
+        
+        lilypads = []
+        if entities["lilypad"] and self.has_texture('lilypad', "лилии"):
+            for lilypad_object in entities["lilypad"]:
+                lilypad = arcade.Sprite(self.textures['lilypad'], LILYPAD_SCALE)
+                lilypad.center_x = lilypad_object.x
+                lilypad.center_y = lilypad_object.y
+                lilypads.append(lilypad)
+        
+        portals = []
+        if entities["portal"] and self.has_texture('portal', "портала"):
+            for portal_object in entities["portal"]:
+                portal = arcade.Sprite()
+                portal.texture = self.textures['portal']
+                portal.center_x = portal_object.x
+                portal.center_y = portal_object.y
+                portal.scale = PORTAL_SCALE
+                portals.append(portal)
+        
+        # Опасные зоны и контрольные точки - невидимые прямоугольники
+        hazards = []
+        for hazard_object in entities["hazard"]:
+            hazard = arcade.SpriteSolidColor(
+                max(hazard_object.width, 1), max(hazard_object.height, 1),
+                center_x=hazard_object.x, center_y=hazard_object.y, color=arcade.color.RED
+            )
+            hazard.visible = False
+            hazards.append(hazard)
+        
+        checkpoints = []
+        for checkpoint_object in entities["checkpoint"]:
+            checkpoint = arcade.SpriteSolidColor(
+                checkpoint_object.width or CHECKPOINT_SIZE[0], checkpoint_object.height or CHECKPOINT_SIZE[1],
+                center_x=checkpoint_object.x, center_y=checkpoint_object.y, color=arcade.color.GREEN
+            )
+            checkpoint.visible = False
+            checkpoints.append(checkpoint)
+        
+        for sprite_list, sprites in (
+            (self.coins_list, coins),
+            (self.lilypads_list, lilypads),
+            (self.portal_list, portals),
+            (self.hazards_list, hazards),
+            (self.checkpoints_list, checkpoints)
+        ):
+            sprite_list.clear(capacity=len(sprites))
+            sprite_list.extend(sprites)
+        
+        self.lilypads.clear()
+        for lilypad in lilypads:
+            self.lilypads.add(lilypad)
+        self.entities_version += 1
+        
+        triggers = self.level.triggers
+        triggers.remove_group("entities")
+        for kind, sprites in (
+            (TRIGGER_COIN, coins),
+            (TRIGGER_LILYPAD, lilypads),
+            (TRIGGER_PORTAL, portals),
+            (TRIGGER_HAZARD, hazards),
+            (TRIGGER_CHECKPOINT, checkpoints)
+        ):
+            padding = LILYPAD_TRIGGER_PADDING if kind == TRIGGER_LILYPAD else 0
+            for sprite in sprites:
+                triggers.add(kind, sprite, "entities", padding)
+
+    def has_texture(self, name, title):
+        if not self.textures[name]:
+            print(f"Текстура {title} не загружена!")
+            return False
+        return True
+
+    def setup_menu(self):
+        """Переход в меню со сбросом прогресса"""
+        self.game_state = "MENU"
+        
+        # Сброс параметров
+        self.player_scale = self.initial_scale
+        self.death_count = 0
+        self.coins_collected = 0
+        self.collected_coins = defaultdict(set)
+        self.current_level = 1
+        self.fade_alpha = 0
+        
+        self.events.append(("menu",))
+
+    def show_intro(self):
+        """Показать вступительную сцену"""
+        self.game_state = "INTRO"
+        self.intro_ticks = 0
+        self.fade_alpha = 0
+        self.events.append(("intro",))
+
+    def show_victory(self):
+        """Показать сцену победы"""
+        self.game_state = "VICTORY"
+        self.victory_ticks = 0
+        self.fade_alpha = 0
+        self.events.append(("victory",))
+
+    def parse_level(self, level_num):
+        """Чтение карты уровня (вызывается кэшем); спрайты создаются позже по чанкам"""
+        map_path = f"maps/map{level_num}.json"
+        # В собранной игре лежат только .lvl, без JSON
+        if os.path.exists(map_path) or os.path.exists(f"maps/map{level_num}{LEVEL_EXTENSION}"):
+            try:
+                return LevelData(level_num, open_tilemap(map_path, CHUNK_SIZE))
+            except Exception as e:
+                print(f"Ошибка загрузки карты: {e}")
+                
+        return LevelData(level_num)
+
+    def load_level(self, level_num, reset_coins=False):
+        """Загрузка уровня"""
+        with self.profiler.section("load_level"):
+            self.game_state = "GAME"
+            self.current_level = level_num
+        
+            self.player_list.clear()
+
+            # Карту берем из кэша, тайлы подгружаются вокруг игрока
+            self.level = self.level_cache.get(level_num)
+            self.level.warm_queue = []
+
+            # Монетки, кувшинки и прочие сущности из объектов карты
+            self.spawn_entities(reset_coins)
+
+            # Создание игрока
+            if self.player_frames.get("player"):
+                player = arcade.Sprite()
+                self.player_list.append(player)
+                self.player_facing_right = True
+                self.update_player_texture()
+                player.position = self.level.spawn
+            else:
+                player = arcade.SpriteCircle(30, arcade.color.BLUE)
+                player.center_x = 100
+                player.center_y = 400
+                self.player_list.append(player)
+            self.player_prev_position = player.position
+            self.checkpoint = player.position
+            self.level.center = None
+            self.level.stream(player.center_x, player.center_y)
+
+            # Физический движок (стены меняются при подгрузке чанков)
+            self.physics_engine = None
+            if self.player_list and ("platforms" in self.level.kinds or self.lilypads_list):
+                self.physics_engine = arcade.PhysicsEnginePlatformer(
+                    self.player_list[0],
+                    platforms=self.lilypads_list,
+                    gravity_constant=GRAVITY,
+                    walls=self.level.nearby["walls"]
+                )
+            
+            self.events.append(("level", level_num))
+            
+            # Следующий уровень разбирается в фоне, пока играется этот
+            if level_num + 1 in self.level_numbers:
+                self.level_cache.prefetch(level_num + 1)
+
+    def restart_level(self):
+        """Перезапуск текущего уровня после смерти без повторной загрузки карты"""
+        if not self.player_list:
+            self.load_level(self.current_level, reset_coins=False)
+            return
+            
+        # Сброс игрока
+        player = self.player_list[0]
+        player.change_x = 0
+        player.change_y = 0
+        player.position = self.checkpoint
+        self.player_facing_right = True
+        self.player_prev_position = player.position
+        self.update_player_texture()
+        self.stream_level()
+
+        # Сброс монеток и лилий (таймеры лилий создаются заново)
+        self.spawn_entities()
+            
+        self.events.append(("restart",))
+
+    def stream_level(self):
+        """Подгрузка чанков карты вокруг игрока"""
+        player = self.player_list[0]
+        if self.level.stream(player.center_x, player.center_y) and self.physics_engine:
+            self.physics_engine.walls[:] = self.level.nearby["walls"]
+
+    def update_player_texture(self):
+        """Обновление текстуры игрока под направление и текущий размер"""
+        if not self.player_list:
+            return
+            
+        player = self.player_list[0]
+        
+        if self.player_frames.get("player"):
+            player.texture, player.scale = self.get_player_frame(
+                "player", self.player_scale, self.player_facing_right
+            )
+            # Спрайт сам не меняет хитбокс при смене текстуры
+            player.sync_hit_box_to_texture()
+        else:
+            player.scale = self.player_scale
+
+    def step(self, input_mask=0):
+        """Один шаг симуляции длиной TICK_TIME"""
+        self.tick += 1
+        
+        if self.game_state == "MENU":
+            if input_mask & INPUT_START:
+                self.show_intro()
+        
+        elif self.game_state == "INTRO":
+            self.intro_ticks += 1
+            if self.intro_ticks > 3 * TICK_RATE:
+                self.fade_alpha += 2
+                if self.fade_alpha >= 255:
+                    self.load_level(1, reset_coins=True)
+        
+        elif self.game_state == "GAME" and self.player_list:
+            player = self.player_list[0]
+            self.player_prev_position = player.position
+            
+            # Прыжок
+            if (input_mask & INPUT_JUMP and
+                getattr(player, 'can_jump', False)):
+                player.change_y = JUMP_FORCE
+                player.can_jump = False
+                self.events.append(("jump",))
+            
+            prev_facing = self.player_facing_right
+            player.change_x = 0
+            
+            if input_mask & INPUT_LEFT:
+                player.change_x = -PLAYER_SPEED
+                self.player_facing_right = False
+            if input_mask & INPUT_RIGHT:
+                player.change_x = PLAYER_SPEED
+                self.player_facing_right = True
+            
+            if prev_facing != self.player_facing_right:
+                self.update_player_texture()
+            
+            if player.left < 0:
+                player.left = 0
+            if player.right > self.level.width:
+                player.right = self.level.width
+            
+            profiler = self.profiler
+            with profiler.section("stream"):
+                self.stream_level()
+            
+            if self.physics_engine:
+                with profiler.section("physics"):
+                    self.physics_engine.update()
+                    player.can_jump = self.physics_engine.can_jump()
+            
+            # Один запрос к триггерам уровня на шаг
+            with profiler.section("triggers"):
+                touched = self.level.triggers.query(player)
+            
+            # Кувшинки, на которых стоит игрок, и шаг их таймеров
+            with profiler.section("lilypads"):
+                standing = [
+                    lilypad for kind, lilypad in touched
+                    if kind == TRIGGER_LILYPAD and
+                    player.change_y == 0 and
+                    player.bottom <= lilypad.top + 5 and
+                    self.lilypads.is_solid(lilypad)
+                ]
+                if self.lilypads.step(standing):
+                    self.events.append(("lilypad",))
+                for lilypad in self.lilypads.fallen:
+                    self.events.append(("lilypad_fall", lilypad.center_x, lilypad.center_y))
+            
+            with profiler.section("collisions"):
+                self.handle_collisions(touched)
+        
+        elif self.game_state == "VICTORY":
+            self.victory_ticks += 1
+            if self.victory_ticks > 3 * TICK_RATE:
+                self.setup_menu()
+
+    def handle_collisions(self, touched):
+        """Обработка столкновений с триггерами, которых касается игрок"""
+        if not self.player_list:
+            return
+        
+        touched_kinds = {kind for kind, _ in touched}
+    
+        # Сбор монеток
+        for kind, coin in touched:
+            if kind != TRIGGER_COIN:
+                continue
+            coin.remove_from_sprite_lists()
+            self.level.triggers.remove(coin)
+            self.entities_version += 1
+            self.collected_coins[self.current_level].add(coin.index)
+            self.coins_collected += 1
+            
+            if self.death_count > 0:
+                self.death_count -= 1
+            
+            self.player_scale = min(self.player_scale + 0.005, self.max_scale)
+            self.update_player_texture()
+            
+            self.events.append(("coin", coin.index, coin.center_x, coin.center_y))
+    
+        # Переход на следующий уровень (на некоторых картах - только со всеми монетками)
+        if (TRIGGER_PORTAL in touched_kinds and
+            (not self.level.properties.get("portal_needs_coins") or
+             len(self.collected_coins[self.current_level]) == self.total_coins)):
+            if self.current_level + 1 in self.level_numbers:
+                self.load_level(self.current_level + 1)
+                # Вспышка там, где игрок появился на новом уровне
+                if self.player_list:
+                    player = self.player_list[0]
+                    self.events.append(("portal", player.center_x, player.center_y))
+            else:
+                self.show_victory()
+            return
+                
+        # Столкновение с опасностями (шипы, вода, опасные зоны)
+        for kind, cause in HAZARD_TRIGGERS.items():
+            if kind in touched_kinds:
+                self.handle_hazard_collision(cause)
+                return
+        
+        # Контрольная точка: после смерти игрок появится здесь
+        for kind, checkpoint in touched:
+            if kind == TRIGGER_CHECKPOINT and self.checkpoint != checkpoint.position:
+                self.checkpoint = checkpoint.position
+                self.events.append(("checkpoint",))
+        
+        # Проверка на завершение уровня
+        if TRIGGER_GOAL in touched_kinds:
+            self.show_victory()
+
+    def handle_hazard_collision(self, cause="hazard"):
+        """Обработка столкновения с опасностью"""
+        player = self.player_list[0]
+        self.events.append(("death", cause, player.center_x, player.center_y))
+        self.death_count += 1
+        self.player_scale = max(self.player_scale - 0.005, self.min_scale)
+        self.update_player_texture()
+        
+        if self.death_count >= 3:
+            self.events.append(("game_over",))
+            self.setup_menu()
+        else:
+            self.restart_level()
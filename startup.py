@@ -0,0 +1,56 @@
+"""Замер запуска: сколько проходит от старта main.py до первого кадра меню
+и до загрузки ресурсов каждого приоритета
+
+Включается переменной окружения GAME_STARTUP (ее значение - JSON-файл
+отчета). Отчет пишется один раз, когда нарисован первый кадр и загружены
+все ресурсы; в нем отметки времени, время декодирования и готовности
+каждого ресурса и число загруженных модулей. Время импорта модулей и
+проверку бюджета добавляет benchmarks/startup_report.py, который и
+запускает игру с этой переменной.
+"""
+import json
+import os
+import sys
+import time
+
+STARTUP_ENV = "GAME_STARTUP"
+
+class StartupTimer:
+    """Отметки времени запуска; started_at - perf_counter() в начале main.py"""
+    def __init__(self, started_at, report_path=None):
+        self.started_at = started_at
+        # Момент старта по часам, чтобы внешний замер мог добавить время до main.py
+        self.started_epoch = time.time() - (time.perf_counter() - started_at)
+        self.report_path = report_path
+        self.marks = {}
+        self.done = report_path is None
+
+    @classmethod
+    def from_environment(cls, started_at):
+        return cls(started_at, os.environ.get(STARTUP_ENV) or None)
+
+    def mark(self, name):
+        """Отметка, если ее еще не было (повторы не сдвигают первое время)"""
+        if not self.done and name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.started_at
+
+    def finish(self, assets):
+        """Запись отчета; assets - AssetLoader с замерами ресурсов"""
+        if self.done:
+            return
+        self.done = True
+        report = {
+            "started_epoch": self.started_epoch,
+            "marks": self.marks,
+            "assets": [
+                {"path": path, "priority": priority, "decode": decode, "ready": ready - self.started_at}
+                for path, priority, decode, ready in assets.timings
+            ],
+            "modules": len(sys.modules),
+            "frozen": getattr(sys, "frozen", False)
+        }
+        try:
+            with open(self.report_path, "w", encoding="utf-8") as file:
+                json.dump(report, file, indent=1, ensure_ascii=False)
+        except OSError as e:
+            print(f"Ошибка записи отчета о запуске {self.report_path}: {e}")
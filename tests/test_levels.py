@@ -0,0 +1,22 @@
+import os
+import shutil
+
+from simulation import DEFAULT_SPAWN, GameSimulation
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_level_loads_from_compiled_map_without_json(tmp_path, monkeypatch):
+    # Как в собранной игре: рядом только maps/*.lvl
+    os.mkdir(tmp_path / "maps")
+    shutil.copy(os.path.join(ROOT_DIR, "maps", "map1.lvl"), tmp_path / "maps")
+    monkeypatch.chdir(tmp_path)
+
+    sim = GameSimulation(load_textures=False)
+    level = sim.parse_level(1)
+
+    assert sim.level_numbers == {1}
+    assert level.tilemap is not None
+    assert level.layers
+    assert level.entities["coin"]
+    assert level.spawn != DEFAULT_SPAWN
@@ -0,0 +1,26 @@
+import os
+
+import playtest
+from simulation import GameSimulation
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_runs_start_at_initial_scale(monkeypatch):
+    monkeypatch.chdir(ROOT_DIR)
+    sim = GameSimulation()
+    monkeypatch.setattr(playtest, "sim", sim)
+    scales = []
+
+    def dying_policy():
+        # Масштаб перед каждым шагом, затем смерть
+        scales.append(sim.player_scale)
+        sim.handle_hazard_collision()
+        return 0
+
+    for _ in range(2):
+        attempt = playtest.play(1, [], dying_policy, max_ticks=2)
+        assert len(attempt.deaths) == 2
+
+    assert scales[0] == scales[2] == sim.initial_scale
+    assert scales[1] < sim.initial_scale
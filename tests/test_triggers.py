@@ -0,0 +1,37 @@
+import arcade
+import pytest
+
+from triggers import TRIGGER_CELL_SIZE, TRIGGER_COIN, TriggerIndex
+
+
+def make_sprite(left, bottom, width, height):
+    sprite = arcade.SpriteSolidColor(width, height, color=arcade.color.WHITE)
+    sprite.left = left
+    sprite.bottom = bottom
+    return sprite
+
+
+@pytest.mark.parametrize("right", [TRIGGER_CELL_SIZE - 1e-6, TRIGGER_CELL_SIZE + 1e-6, TRIGGER_CELL_SIZE - 1e-3])
+def test_remove_box_on_cell_boundary(right):
+    # Правый край округляется в float32 к границе клетки
+    index = TriggerIndex()
+    sprite = make_sprite(right - 32, 0, 32, 32)
+    sprite.right = right
+    index.add(TRIGGER_COIN, sprite)
+
+    index.remove(sprite)
+
+    assert len(index) == 0
+    assert not index.cells
+
+
+def test_query_after_slot_reuse():
+    index = TriggerIndex()
+    first = make_sprite(0, 0, 32, 32)
+    second = make_sprite(200, 0, 32, 32)
+    index.add(TRIGGER_COIN, first)
+    index.remove(first)
+    index.add(TRIGGER_COIN, second)
+
+    assert index.query(make_sprite(0, 0, 32, 32)) == []
+    assert index.query(make_sprite(190, 0, 32, 32)) == [(TRIGGER_COIN, second)]
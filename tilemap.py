@@ -0,0 +1,465 @@
+"""Потоковое чтение карт Tiled
+
+Слои хранятся компактными массивами номеров тайлов, а спрайты создаются
+только для запрошенных чанков. Карта читается либо из JSON Tiled (обычные
+и бесконечные карты, данные слоев массивом или base64 со сжатием zlib/gzip),
+либо из файла .lvl, собранного compile_maps.py.
+"""
+import arcade
+import base64
+import gzip
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from xml.etree import ElementTree
+from PIL import Image
+from pytiled_parser.parsers.json.tileset import parse as parse_json_tileset
+from pytiled_parser.parsers.tmx.tileset import parse as parse_tmx_tileset
+
+# Старшие биты номера тайла - отражения
+FLIPPED_HORIZONTALLY = 0x80000000
+FLIPPED_VERTICALLY = 0x40000000
+FLIPPED_DIAGONALLY = 0x20000000
+GID_MASK = 0x0FFFFFFF
+
+# Собранный формат карты (см. compile_maps.py)
+LEVEL_EXTENSION = ".lvl"
+LEVEL_MAGIC = b"LVL1"
+LEVEL_VERSION = 2
+LEVEL_HEADER = struct.Struct("<4sHHHHIiiii")  # метка, версия, тайл, чанк, CRC32 исходника, границы
+LEVEL_TILE = struct.Struct("<IHHBH")  # номер тайла, размер, сплошной ли, число точек хитбокса
+LEVEL_PIECE = struct.Struct("<iiIIB")  # столбец, строка, ширина, высота, байт на номер тайла
+LEVEL_RECT = struct.Struct("<iiii")
+LEVEL_OBJECT = struct.Struct("<ffff")  # центр и размер объекта в координатах мира
+
+# Типы свойств карты в собранном файле
+PROPERTY_TYPES = {
+    "bool": lambda value: value == "true",
+    "int": int,
+    "float": float,
+    "string": str
+}
+
+def decode_layer_data(data, encoding=None, compression=None):
+    """Данные слоя или чанка Tiled в массив номеров тайлов (uint32)"""
+    if encoding != "base64":
+        return array("I", data)
+
+    raw = base64.b64decode(data)
+    if compression == "zlib":
+        raw = zlib.decompress(raw)
+    elif compression == "gzip":
+        raw = gzip.decompress(raw)
+    elif compression:
+        raise ValueError(f"неподдерживаемое сжатие слоя: {compression}")
+
+    gids = array("I")
+    gids.frombytes(raw)
+    if sys.byteorder == "big":
+        gids.byteswap()  # Tiled всегда пишет little-endian
+    return gids
+
+def iter_layers(raw_layers):
+    """Слои карты в порядке отрисовки, включая вложенные в группы"""
+    for raw_layer in raw_layers:
+        if raw_layer["type"] == "group":
+            yield from iter_layers(raw_layer.get("layers", []))
+        else:
+            yield raw_layer
+
+def read_properties(raw):
+    """Пользовательские свойства Tiled в словарь"""
+    return {prop["name"]: prop["value"] for prop in raw.get("properties", [])}
+
+def file_crc32(path):
+    with open(path, "rb") as file:
+        return zlib.crc32(file.read())
+
+def open_tilemap(path, chunk_size):
+    """Открыть карту: собранный .lvl, если он собран из текущего JSON, иначе сам JSON"""
+    compiled_path = os.path.splitext(path)[0] + LEVEL_EXTENSION
+    if os.path.exists(compiled_path):
+        try:
+            tilemap = CompiledTileMap(compiled_path, chunk_size)
+            if not os.path.exists(path) or tilemap.source_crc == file_crc32(path):
+                return tilemap
+            print(f"{compiled_path} устарел, карта читается из {path} (пересоберите: python compile_maps.py)")
+        except (ValueError, struct.error) as e:
+            print(f"Ошибка чтения {compiled_path}: {e}")
+    return StreamedTileMap(path, chunk_size)
+
+class TilesetInfo:
+    """Параметры набора тайлов, нужные для нарезки текстур"""
+    def __init__(self, firstgid, tile_width, tile_height, columns, margin, spacing, image, tile_images):
+        self.firstgid = firstgid
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.columns = columns
+        self.margin = margin
+        self.spacing = spacing
+        self.image = image  # путь к общей картинке набора (или None)
+        self.tile_images = tile_images  # номер тайла -> путь к отдельной картинке
+
+class MapObject:
+    """Объект карты (монетка, точка появления, ...): центр и размер в координатах мира"""
+    def __init__(self, kind, name, x, y, width=0, height=0):
+        self.kind = kind
+        self.name = name
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+class TileLayer:
+    """Тайловый слой: куски данных (весь слой или чанки Tiled) с индексом по чанкам игры"""
+    def __init__(self, name):
+        self.name = name
+        self.pieces = []  # (первый столбец, первая строка, ширина, высота, номера тайлов)
+        self.index = {}  # ключ чанка игры -> куски, которые его задевают
+
+    @property
+    def is_empty(self):
+        return not any(any(gids) for *_, gids in self.pieces)
+
+class StreamedTileMap:
+    """Карта Tiled, из которой спрайты создаются по чанкам
+
+    Координаты мира как у arcade.load_tilemap: ось y направлена вверх,
+    нижний левый угол карты в точке (0, 0), смещения слоев из Tiled не учитываются.
+
+    Объекты берутся из слоев объектов (тип объекта - вид сущности) и из тайловых
+    слоев со свойством entity: каждый тайл такого слоя становится объектом.
+    """
+    def __init__(self, path, chunk_size):
+        with open(path, encoding="utf-8") as file:
+            raw = json.load(file)
+        self.directory = os.path.dirname(path)
+        self.tile_width = raw["tilewidth"]
+        self.tile_height = raw["tileheight"]
+        self.chunk_size = chunk_size
+        self.wall_rects = None  # готовые прямоугольники физики по чанкам (только у собранной карты)
+        self.solid_textures = set()  # текстуры сплошных тайлов (известны только у собранной карты)
+        self.images = {}
+        self.textures = {}
+
+        self.tilesets = {}
+        for raw_tileset in raw["tilesets"]:
+            tileset = self.read_tileset(raw_tileset)
+            self.tilesets[tileset.firstgid] = tileset
+        self.firstgids = sorted(self.tilesets)
+
+        self.properties = read_properties(raw)
+        self.layers = []
+        sources = []  # источники объектов в порядке слоев
+        for raw_layer in iter_layers(raw["layers"]):
+            if raw_layer["type"] == "objectgroup":
+                sources.append((None, raw_layer["objects"]))
+                continue
+            elif raw_layer["type"] != "tilelayer":
+                continue
+            
+            layer = TileLayer(raw_layer["name"])
+            encoding = raw_layer.get("encoding")
+            compression = raw_layer.get("compression")
+            if "chunks" in raw_layer:
+                for chunk in raw_layer["chunks"]:
+                    layer.pieces.append((
+                        chunk["x"], chunk["y"], chunk["width"], chunk["height"],
+                        decode_layer_data(chunk["data"], encoding, compression)
+                    ))
+            else:
+                layer.pieces.append((
+                    raw_layer.get("startx", 0), raw_layer.get("starty", 0),
+                    raw_layer["width"], raw_layer["height"],
+                    decode_layer_data(raw_layer["data"], encoding, compression)
+                ))
+            
+            kind = read_properties(raw_layer).get("entity")
+            if kind:
+                sources.append((kind, layer))
+            else:
+                self.layers.append(layer)
+
+        # Границы карты в тайлах (у бесконечной карты - по заполненным чанкам)
+        if raw.get("infinite"):
+            pieces = [piece for layer in self.layers for piece in layer.pieces] or [(0, 0, 1, 1, None)]
+            self.set_bounds(
+                min(x for x, _, _, _, _ in pieces),
+                min(y for _, y, _, _, _ in pieces),
+                max(x + width - 1 for x, _, width, _, _ in pieces),
+                max(y + height - 1 for _, y, _, height, _ in pieces)
+            )
+        else:
+            self.set_bounds(0, 0, raw["width"] - 1, raw["height"] - 1)
+        self.build_index()
+
+        self.objects = []
+        for kind, source in sources:
+            if kind is None:
+                self.objects.extend(self.read_object(raw_object) for raw_object in source)
+            else:
+                self.objects.extend(self.read_tile_objects(kind, source))
+
+    def read_object(self, raw_object):
+        """Объект Tiled (ось y вниз от верха карты) в координаты мира"""
+        kind = raw_object.get("type") or raw_object.get("class", "")
+        width = raw_object.get("width", 0)
+        height = raw_object.get("height", 0)
+        left = raw_object["x"] - self.first_col * self.tile_width
+        y = (self.last_row + 1) * self.tile_height - raw_object["y"]
+        if "gid" in raw_object:
+            # У тайла-объекта точка привязки - нижний левый угол
+            return MapObject(kind, raw_object.get("name", ""), left + width / 2, y + height / 2, width, height)
+        return MapObject(kind, raw_object.get("name", ""), left + width / 2, y - height / 2, width, height)
+
+    def read_tile_objects(self, kind, layer):
+        """Объекты из тайлов слоя: по одному на каждый тайл, в центре клетки"""
+        objects = []
+        for x, y, width, height, gids in layer.pieces:
+            for i, gid in enumerate(gids):
+                if gid:
+                    col, row = x + i % width, y + i // width
+                    objects.append(MapObject(
+                        kind, "",
+                        (col - self.first_col + 0.5) * self.tile_width,
+                        (self.last_row - row + 0.5) * self.tile_height,
+                        self.tile_width, self.tile_height
+                    ))
+        return objects
+
+    def read_tileset(self, raw_tileset):
+        """Разбор встроенного или внешнего (.tsx/.json) набора тайлов"""
+        firstgid = raw_tileset["firstgid"]
+        if "source" not in raw_tileset:
+            tileset = parse_json_tileset(raw_tileset, firstgid, "utf-8", Path(self.directory))
+        else:
+            path = os.path.join(self.directory, raw_tileset["source"])
+            external_path = Path(os.path.dirname(path))
+            with open(path, encoding="utf-8") as file:
+                if path.endswith(".json"):
+                    tileset = parse_json_tileset(json.load(file), firstgid, "utf-8", external_path)
+                else:
+                    tileset = parse_tmx_tileset(ElementTree.parse(file).getroot(), firstgid, "utf-8", external_path)
+
+        return TilesetInfo(
+            firstgid, tileset.tile_width, tileset.tile_height, tileset.columns,
+            tileset.margin, tileset.spacing,
+            str(tileset.image) if tileset.image else None,
+            {tile_id: str(tile.image) for tile_id, tile in (tileset.tiles or {}).items() if tile.image}
+        )
+
+    def set_bounds(self, first_col, first_row, last_col, last_row):
+        self.first_col, self.first_row = first_col, first_row
+        self.last_col, self.last_row = last_col, last_row
+        self.width = (last_col - first_col + 1) * self.tile_width
+        self.height = (last_row - first_row + 1) * self.tile_height
+        self.chunk_cols = max(1, self.chunk_size // self.tile_width)
+        self.chunk_rows = max(1, self.chunk_size // self.tile_height)
+
+    def build_index(self):
+        """Какие куски слоев задевают каждый чанк игры"""
+        for layer in self.layers:
+            for piece in layer.pieces:
+                x, y, width, height, _ = piece
+                first_cx, first_cy = self.chunk_key(x, y + height - 1)
+                last_cx, last_cy = self.chunk_key(x + width - 1, y)
+                for cx in range(first_cx, last_cx + 1):
+                    for cy in range(first_cy, last_cy + 1):
+                        layer.index.setdefault((cx, cy), []).append(piece)
+
+    @property
+    def chunk_count(self):
+        """Число чанков по горизонтали и вертикали"""
+        last_cx, last_cy = self.chunk_key(self.last_col, self.first_row)
+        return last_cx + 1, last_cy + 1
+
+    def chunk_key(self, col, row):
+        """Чанк игры, в который попадает тайл (столбец и строка Tiled)"""
+        return (
+            (col - self.first_col) // self.chunk_cols,
+            (self.last_row - row) // self.chunk_rows
+        )
+
+    def load_image(self, path):
+        image = self.images.get(path)
+        if image is None:
+            with Image.open(path) as file:
+                image = file.convert("RGBA")
+            self.images[path] = image
+        return image
+
+    def get_tile_image(self, tile_gid):
+        """Картинка тайла без отражений"""
+        tileset = self.tilesets[self.firstgids[bisect_right(self.firstgids, tile_gid) - 1]]
+        tile_id = tile_gid - tileset.firstgid
+
+        if tile_id in tileset.tile_images:
+            # Набор из отдельных изображений
+            return self.load_image(tileset.tile_images[tile_id])
+
+        col = tile_id % tileset.columns
+        row = tile_id // tileset.columns
+        x = tileset.margin + col * (tileset.tile_width + tileset.spacing)
+        y = tileset.margin + row * (tileset.tile_height + tileset.spacing)
+        return self.load_image(tileset.image).crop((x, y, x + tileset.tile_width, y + tileset.tile_height))
+
+    def make_tile_texture(self, tile_gid):
+        return arcade.Texture(self.get_tile_image(tile_gid))
+
+    def get_texture(self, gid):
+        """Текстура тайла по номеру с учетом отражений (с кэшированием)"""
+        texture = self.textures.get(gid)
+        if texture is not None:
+            return texture
+
+        texture = self.make_tile_texture(gid & GID_MASK)
+        if gid & FLIPPED_DIAGONALLY:
+            texture = texture.flip_diagonally()
+        if gid & FLIPPED_HORIZONTALLY:
+            texture = texture.flip_horizontally()
+        if gid & FLIPPED_VERTICALLY:
+            texture = texture.flip_vertically()
+        self.textures[gid] = texture
+        return texture
+
+    def get_sprites(self, layer, key):
+        """Спрайты тайлов слоя, попадающих в чанк игры"""
+        sprites = []
+        pieces = layer.index.get(key)
+        if not pieces:
+            return sprites
+
+        cx, cy = key
+        first_col = self.first_col + cx * self.chunk_cols
+        last_col = first_col + self.chunk_cols - 1
+        last_row = self.last_row - cy * self.chunk_rows
+        first_row = last_row - self.chunk_rows + 1
+
+        for x, y, width, height, gids in pieces:
+            col_start = max(first_col, x)
+            col_end = min(last_col, x + width - 1)
+            # Строки сверху вниз, как их выкладывает arcade.load_tilemap
+            for row in range(max(first_row, y), min(last_row, y + height - 1) + 1):
+                start = (row - y) * width - x
+                for col, gid in enumerate(gids[start + col_start:start + col_end + 1], col_start):
+                    if not gid:
+                        continue
+                    sprite = arcade.Sprite(self.get_texture(gid))
+                    sprite.center_x = (col - self.first_col) * self.tile_width + sprite.width / 2
+                    sprite.center_y = (self.last_row - row) * self.tile_height + sprite.height / 2
+                    sprites.append(sprite)
+        return sprites
+
+class LevelReader:
+    """Последовательное чтение собранного файла уровня из буфера"""
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.offset = 0
+
+    def read(self, layout):
+        values = layout.unpack_from(self.buffer, self.offset)
+        self.offset += layout.size
+        return values
+
+    def read_string(self):
+        length, = self.read(struct.Struct("<H"))
+        text = bytes(self.buffer[self.offset:self.offset + length]).decode("utf-8")
+        self.offset += length
+        return text
+
+    def read_array(self, typecode, count):
+        """Массив чисел прямо из буфера, без копирования (на little-endian машинах)"""
+        size = struct.calcsize(typecode)
+        self.offset += -self.offset % 4  # массивы выровнены по 4 байта
+        view = self.buffer[self.offset:self.offset + count * size]
+        self.offset += count * size
+        if sys.byteorder == "big":
+            values = array(typecode, bytes(view))
+            values.byteswap()
+            return values
+        return view.cast(typecode)
+
+class CompiledTileMap(StreamedTileMap):
+    """Карта, собранная compile_maps.py
+
+    Файл отображается в память, номера тайлов берутся прямо из него.
+    Картинки используемых тайлов лежат в самом файле вместе с хитбоксами,
+    поэтому наборы тайлов не разбираются, а прямоугольники физики уже посчитаны.
+    """
+    def __init__(self, path, chunk_size):
+        with open(path, "rb") as file:
+            self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        reader = LevelReader(memoryview(self.mapping))
+
+        (magic, version, self.tile_width, self.tile_height, compiled_chunk_size,
+         self.source_crc, *bounds) = reader.read(LEVEL_HEADER)
+        if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+            raise ValueError(f"неизвестный формат {magic!r} версии {version}")
+        self.chunk_size = chunk_size
+        self.textures = {}
+        self.set_bounds(*bounds)
+
+        # Таблица тайлов: пиксели, хитбоксы и признак сплошного тайла уже готовы
+        self.tiles = {}
+        self.solid_textures = set()
+        tile_count, = reader.read(struct.Struct("<I"))
+        for _ in range(tile_count):
+            tile_gid, width, height, solid, point_count = reader.read(LEVEL_TILE)
+            points = reader.read_array("f", point_count * 2)
+            pixels = reader.read_array("B", width * height * 4)
+            self.tiles[tile_gid] = ((width, height), pixels, tuple(zip(points[0::2], points[1::2])), solid)
+
+        self.layers = []
+        layer_count, = reader.read(struct.Struct("<H"))
+        for _ in range(layer_count):
+            layer = TileLayer(reader.read_string())
+            piece_count, = reader.read(struct.Struct("<I"))
+            for _ in range(piece_count):
+                x, y, width, height, gid_size = reader.read(LEVEL_PIECE)
+                gids = reader.read_array("H" if gid_size == 2 else "I", width * height)
+                layer.pieces.append((x, y, width, height, gids))
+            self.layers.append(layer)
+        self.build_index()
+
+        # Прямоугольники физики годятся, только если чанки той же величины
+        self.wall_rects = {}
+        chunk_count, = reader.read(struct.Struct("<I"))
+        for _ in range(chunk_count):
+            cx, cy, rect_count = reader.read(struct.Struct("<iiI"))
+            self.wall_rects[(cx, cy)] = [reader.read(LEVEL_RECT) for _ in range(rect_count)]
+        if compiled_chunk_size != chunk_size:
+            self.wall_rects = None
+
+        # Свойства карты хранятся строками с признаком типа
+        self.properties = {}
+        property_count, = reader.read(struct.Struct("<H"))
+        for _ in range(property_count):
+            name = reader.read_string()
+            kind = reader.read_string()
+            value = reader.read_string()
+            self.properties[name] = PROPERTY_TYPES.get(kind, str)(value)
+
+        self.objects = []
+        object_count, = reader.read(struct.Struct("<I"))
+        for _ in range(object_count):
+            kind = reader.read_string()
+            name = reader.read_string()
+            self.objects.append(MapObject(kind, name, *reader.read(LEVEL_OBJECT)))
+
+    def get_texture(self, gid):
+        texture = self.textures.get(gid)
+        if texture is None:
+            texture = super().get_texture(gid)
+            if self.tiles[gid & GID_MASK][3]:
+                self.solid_textures.add(texture)
+        return texture
+
+    def make_tile_texture(self, tile_gid):
+        size, pixels, hit_box, _ = self.tiles[tile_gid]
+        return arcade.Texture(Image.frombytes("RGBA", size, bytes(pixels)), hit_box_points=hit_box)
@@ -0,0 +1,129 @@
+"""Триггеры: все неподвижные и почти неподвижные объекты, которых игрок
+касается без физики (монетки, порталы, опасности, финиш, кувшинки)
+
+Объекты лежат в одной сетке, прямоугольники - в плоском массиве, поэтому
+за шаг симуляции достаточно одного запроса по хитбоксу игрока.
+"""
+import arcade
+from array import array
+from collections import defaultdict
+
+TRIGGER_CELL_SIZE = 128  # сторона клетки сетки в пикселях
+
+# Виды триггеров
+TRIGGER_COIN = 1
+TRIGGER_PORTAL = 2
+TRIGGER_HAZARD = 3
+TRIGGER_GOAL = 4
+TRIGGER_LILYPAD = 5
+TRIGGER_CHECKPOINT = 6
+TRIGGER_SPIKES = 7
+TRIGGER_WATER = 8
+
+class TriggerIndex:
+    """Сетка триггеров
+
+    Для каждого места хранятся вид, спрайт и прямоугольник (left, bottom,
+    right, top). Места удаленных триггеров переиспользуются.
+    """
+    def __init__(self, cell_size=TRIGGER_CELL_SIZE):
+        self.cell_size = cell_size
+        self.kinds = array("B")  # 0 - место свободно
+        self.boxes = array("f")
+        self.sprites = []
+        self.cells = defaultdict(list)  # клетка -> места
+        self.slots = {}  # спрайт -> место
+        self.groups = defaultdict(list)  # группа (чанк, сущности) -> спрайты
+        self.free = []
+
+    def __len__(self):
+        return len(self.slots)
+
+    def cell_range(self, left, bottom, right, top):
+        size = self.cell_size
+        return (
+            int(left // size), int(bottom // size),
+            int(right // size), int(top // size)
+        )
+
+    def add(self, kind, sprite, group=None, padding=0):
+        """Добавление триггера; padding расширяет прямоугольник для
+        спрайтов, которые немного двигаются на месте"""
+        box = (
+            sprite.left - padding, sprite.bottom - padding,
+            sprite.right + padding, sprite.top + padding
+        )
+        if self.free:
+            slot = self.free.pop()
+            self.kinds[slot] = kind
+            self.boxes[slot * 4:slot * 4 + 4] = array("f", box)
+            self.sprites[slot] = sprite
+        else:
+            slot = len(self.sprites)
+            self.kinds.append(kind)
+            self.boxes.extend(box)
+            self.sprites.append(sprite)
+
+        # Клетки - по уже округленному до float32 прямоугольнику, как в remove()
+        first_col, first_row, last_col, last_row = self.cell_range(*self.boxes[slot * 4:slot * 4 + 4])
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                self.cells[(col, row)].append(slot)
+
+        self.slots[sprite] = slot
+        self.groups[group].append(sprite)
+
+    def remove(self, sprite):
+        slot = self.slots.pop(sprite, None)
+        if slot is None:
+            return
+
+        boxes = self.boxes
+        first_col, first_row, last_col, last_row = self.cell_range(*boxes[slot * 4:slot * 4 + 4])
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                cell = self.cells[(col, row)]
+                cell.remove(slot)
+                if not cell:
+                    del self.cells[(col, row)]
+
+        self.kinds[slot] = 0
+        self.sprites[slot] = None
+        self.free.append(slot)
+
+    def remove_group(self, group):
+        for sprite in self.groups.pop(group, ()):
+            self.remove(sprite)
+
+    def query(self, sprite):
+        """Триггеры, которых касается спрайт: список (вид, спрайт) в порядке мест
+
+        Один запрос к сетке дает кандидатов из клеток под спрайтом. Затем
+        каждый кандидат по отдельности проверяется пересечением прямоугольников
+        (из плоского массива boxes, без обращения к спрайтам), и только
+        оставшиеся проходят точную проверку хитбоксов. Она нужна: хитбоксы
+        игрока и шипов - не прямоугольники, и одно пересечение рамок дало бы
+        лишние касания.
+        """
+        left, bottom, right, top = sprite.left, sprite.bottom, sprite.right, sprite.top
+        first_col, first_row, last_col, last_row = self.cell_range(left, bottom, right, top)
+        cells = self.cells
+        candidates = set()
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                slots = cells.get((col, row))
+                if slots:
+                    candidates.update(slots)
+        if not candidates:
+            return []
+
+        boxes = self.boxes
+        overlapping = sorted(
+            slot for slot in candidates
+            if boxes[slot * 4] <= right and boxes[slot * 4 + 2] >= left and
+            boxes[slot * 4 + 1] <= top and boxes[slot * 4 + 3] >= bottom
+        )
+        return [
+            (self.kinds[slot], self.sprites[slot]) for slot in overlapping
+            if arcade.check_for_collision(sprite, self.sprites[slot])
+        ]